@@ -2,27 +2,52 @@
 Enhanced Flask API server with auto model loading
 Run this file to start the prediction API server with all trained models
 """
-from flask import Flask, request, jsonify
+import time
+_START_TIME = time.time()
+
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
+import argparse
 import sys
 import os
 import glob
+import json
 
 # Add ml_training to path
 sys.path.append(os.path.dirname(__file__))
 
-from predict_service import StrokePredictionService
-from config import MODEL_DIRS
+from model_registry import ModelRegistry
+from predict_service import TIERS
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from memory_stats import process_memory
+from config import (
+    MODEL_DIRS, DECISION_THRESHOLD, MICRO_BATCH_MAX_ROWS, MICRO_BATCH_MAX_WAIT_MS,
+    PREDICTION_CACHE_SIZE, STREAM_CHUNK_ROWS
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Global models dictionary
+# Global models dictionary (metadata of every discovered model)
 MODELS = {}
 
+# Loaded prediction services (lazy, LRU-bounded) sharing one result cache
+REGISTRY = ModelRegistry(cache=PredictionCache() if PREDICTION_CACHE_SIZE else None)
+
+# Micro-batcher for /api/predict (None: each request is scored on its own)
+BATCHER = None
+
+def enable_micro_batching(max_rows=MICRO_BATCH_MAX_ROWS, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS):
+    """Score concurrent /api/predict calls per model in shared batches"""
+    global BATCHER
+    BATCHER = MicroBatcher(REGISTRY, max_rows, max_wait_ms)
+    print(f"📦 Micro-batching enabled: up to {max_rows} rows / {max_wait_ms} ms per batch")
+
 def auto_discover_models():
     """
-    Automatically discover and load all trained models
+    Automatically discover all trained models
+    Only metadata is registered; each model is loaded on first use
     """
     print("\n" + "="*70)
     print(" AUTO-DISCOVERING TRAINED MODELS")
@@ -113,43 +138,82 @@ def auto_discover_models():
             continue
         
         try:
-            service = StrokePredictionService(
-                model_dir=config['dir'],
-                model_suffix=config['suffix']
-            )
+            REGISTRY.register(config['id'], config['dir'], config['suffix'])
             
             MODELS[config['id']] = {
-                'service': service,
                 'name': config['name'],
                 'description': config['description'],
                 'dir': config['dir']
             }
             
-            print(f"✅ Loaded: {config['name']}")
+            print(f"✅ Registered: {config['name']}")
             loaded_count += 1
             
         except FileNotFoundError as e:
             print(f"⏭️  Skipping {config['name']}: Model files not found")
             failed_count += 1
         except Exception as e:
-            print(f"❌ Failed to load {config['name']}: {e}")
+            print(f"❌ Failed to register {config['name']}: {e}")
             failed_count += 1
     
     print("\n" + "="*70)
-    print(f"✅ Successfully loaded: {loaded_count} models")
+    print(f"✅ Successfully registered: {loaded_count} models (loaded on first use)")
     print(f"⏭️  Skipped/Failed: {failed_count} models")
     print("="*70)
     
     return loaded_count
 
 
+def parse_threshold(data):
+    """
+    Optional per-request decision threshold from a request body
+    Returns None when absent; raises ValueError when not in (0, 1)
+    """
+    threshold = data.pop('threshold', None)
+    if threshold is None:
+        return None
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid threshold: {threshold!r}')
+    if not 0 < threshold < 1:
+        raise ValueError(f'Threshold must be between 0 and 1, got {threshold}')
+    return threshold
+
+
+def parse_tier(data, model_ids):
+    """
+    Optional inference tier from a request body: 'full' (DSE, default),
+    'fast' (distilled student) or 'cascade' (student, escalating uncertain
+    rows to the DSE); raises ValueError when unknown or when a model has no
+    student
+    """
+    tier = data.pop('tier', None) or 'full'
+    if tier not in TIERS:
+        raise ValueError(f"Invalid tier: {tier!r} (choose from {list(TIERS)})")
+    missing = [m for m in model_ids if m in MODELS and tier not in REGISTRY.tiers(m)]
+    if missing:
+        raise ValueError(f"Tier '{tier}' is not available for {missing}: "
+                         f"train with main.py --distill")
+    return tier
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'models_loaded': len(MODELS),
-        'available_models': list(MODELS.keys())
+        'models_resident': [m for m in MODELS if REGISTRY.is_resident(m)],
+        'available_models': list(MODELS.keys()),
+        'worker': {'pid': os.getpid(), **process_memory()},
+        'micro_batching': BATCHER.stats if BATCHER else None,
+        'prediction_cache': REGISTRY.cache.summary() if REGISTRY.cache else None,
+        'cascade': {
+            model_id: service.cascade_summary()
+            for model_id, service in REGISTRY.resident_services().items()
+            if service.cascade_stats['calls']
+        }
     })
 
 
@@ -164,7 +228,8 @@ def list_models():
         models_list.append({
             'id': model_id,
             'name': model_info['name'],
-            'description': model_info['description']
+            'description': model_info['description'],
+            'tiers': REGISTRY.tiers(model_id)
         })
     
     return jsonify({
@@ -190,7 +255,9 @@ def predict():
         "avg_glucose_level": 228.69,
         "bmi": 36.6,
         "smoking_status": "formerly smoked",
-        "model_id": "drop_imbalanced"  // optional, defaults to first available
+        "model_id": "drop_imbalanced",  // optional, defaults to first available
+        "threshold": 0.5,               // optional decision threshold
+        "tier": "fast"                  // optional: "full" (DSE, default), "fast" (student) or "cascade"
     }
     """
     try:
@@ -198,6 +265,11 @@ def predict():
         
         # Get model ID (default to first available)
         model_id = data.pop('model_id', list(MODELS.keys())[0] if MODELS else None)
+        try:
+            threshold = parse_threshold(data)
+            tier = parse_tier(data, [model_id])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not MODELS:
             return jsonify({
@@ -226,8 +298,10 @@ def predict():
         
         # Make prediction
         model_info = MODELS[model_id]
-        service = model_info['service']
-        result = service.predict(data)
+        if BATCHER is not None:
+            result = BATCHER.predict(model_id, data, threshold, tier)
+        else:
+            result = REGISTRY.get(model_id).predict(data, threshold, tier)
         
         # Add model info to result
         result['model_id'] = model_id
@@ -252,13 +326,20 @@ def predict_batch():
             {patient_data_2},
             ...
         ],
-        "model_id": "drop_imbalanced"  // optional
+        "model_id": "drop_imbalanced",  // optional
+        "threshold": 0.5,               // optional decision threshold
+        "tier": "fast"                  // optional: "full" (default), "fast" or "cascade"
     }
     """
     try:
         data = request.json
         patients = data.get('patients', [])
         model_id = data.get('model_id', list(MODELS.keys())[0] if MODELS else None)
+        try:
+            threshold = parse_threshold(data)
+            tier = parse_tier(data, [model_id])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not MODELS:
             return jsonify({
@@ -275,8 +356,8 @@ def predict_batch():
         
         # Make predictions
         model_info = MODELS[model_id]
-        service = model_info['service']
-        results = service.predict_batch(patients)
+        service = REGISTRY.get(model_id)
+        results = service.predict_batch(patients, threshold, tier)
         
         return jsonify({
             'model_id': model_id,
@@ -289,6 +370,70 @@ def predict_batch():
         return jsonify({'error': str(e)}), 500
 
 
+def _ndjson_results(service, lines, threshold, tier=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Score NDJSON patient lines chunk by chunk, yielding one NDJSON result line
+    per record as soon as its chunk is done (memory bounded by chunk_rows)
+    """
+    chunk, index = [], 0
+    
+    def flush():
+        results = service.predict_batch([record for _, record in chunk], threshold, tier)
+        for (i, _), result in zip(chunk, results):
+            yield json.dumps({'index': i, **result}) + '\n'
+        chunk.clear()
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            # Emitted in order: earlier records of the chunk go first
+            yield from flush()
+            yield json.dumps({'index': index, 'error': f'Invalid JSON: {e}'}) + '\n'
+        else:
+            chunk.append((index, record))
+            if len(chunk) >= chunk_rows:
+                yield from flush()
+        index += 1
+    if chunk:
+        yield from flush()
+
+
+@app.route('/api/predict-stream', methods=['POST'])
+def predict_stream():
+    """
+    Streaming batch predictions
+    
+    Request body: newline-delimited JSON, one patient object per line
+    Query parameters: model_id, threshold, tier (all optional)
+    Response: application/x-ndjson, one result per input line in order,
+              {"index": n, ...prediction} or {"index": n, "error": "..."}
+    """
+    if not MODELS:
+        return jsonify({'error': 'No models available'}), 503
+    
+    model_id = request.args.get('model_id', list(MODELS.keys())[0])
+    if model_id not in MODELS:
+        return jsonify({'error': f'Model not found: {model_id}'}), 400
+    try:
+        args = dict(request.args)
+        threshold = parse_threshold(args)
+        tier = parse_tier(args, [model_id])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    service = REGISTRY.get(model_id)
+    lines = request.stream
+    return Response(
+        stream_with_context(_ndjson_results(service, lines, threshold, tier)),
+        mimetype='application/x-ndjson',
+        headers={'X-Model-Id': model_id}
+    )
+
+
 @app.route('/api/compare', methods=['POST'])
 def compare_models():
     """
@@ -297,13 +442,20 @@ def compare_models():
     Request body (JSON):
     {
         "patient_data": {patient info},
-        "model_ids": ["drop_imbalanced", "mean_smote", ...]  // optional, defaults to all
+        "model_ids": ["drop_imbalanced", "mean_smote", ...],  // optional, defaults to all
+        "threshold": 0.5,                                     // optional decision threshold
+        "tier": "fast"                                        // optional: "full" (default), "fast" or "cascade"
     }
     """
     try:
         data = request.json
         patient_data = data.get('patient_data')
         model_ids = data.get('model_ids', list(MODELS.keys()))
+        try:
+            threshold = parse_threshold(data)
+            tier = parse_tier(data, model_ids)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not patient_data:
             return jsonify({'error': 'No patient data provided'}), 400
@@ -318,8 +470,8 @@ def compare_models():
         comparisons = []
         for model_id in model_ids:
             model_info = MODELS[model_id]
-            service = model_info['service']
-            result = service.predict(patient_data)
+            service = REGISTRY.get(model_id)
+            result = service.predict(patient_data, threshold, tier)
             
             comparisons.append({
                 'model_id': model_id,
@@ -332,11 +484,13 @@ def compare_models():
         
         # Calculate consensus
         avg_probability = sum(c['probability'] for c in comparisons) / len(comparisons)
-        consensus_prediction = 1 if avg_probability >= 0.5 else 0
+        consensus_threshold = DECISION_THRESHOLD if threshold is None else threshold
+        consensus_prediction = 1 if avg_probability > consensus_threshold else 0
         
         return jsonify({
             'patient_data': patient_data,
             'models_compared': len(comparisons),
+            'tier': tier,
             'comparisons': comparisons,
             'consensus': {
                 'prediction': consensus_prediction,
@@ -350,6 +504,23 @@ def compare_models():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stroke prediction API server')
+    parser.add_argument(
+        '--preload',
+        action='store_true',
+        help='Load models concurrently at startup instead of on first use'
+    )
+    parser.add_argument(
+        '--micro-batch',
+        action='store_true',
+        help='Batch concurrent /api/predict calls per model'
+    )
+    parser.add_argument('--batch-rows', type=int, default=MICRO_BATCH_MAX_ROWS,
+                        help=f'Max rows per micro-batch (default: {MICRO_BATCH_MAX_ROWS})')
+    parser.add_argument('--batch-wait-ms', type=float, default=MICRO_BATCH_MAX_WAIT_MS,
+                        help=f'Max added latency per micro-batch (default: {MICRO_BATCH_MAX_WAIT_MS} ms)')
+    args = parser.parse_args()
+    
     print("="*70)
     print(" STROKE PREDICTION API SERVER - ENHANCED VERSION")
     print("="*70)
@@ -366,7 +537,12 @@ if __name__ == '__main__':
         print("   python main.py")
         sys.exit(1)
     
-    print(f"\n✅ Loaded {loaded_count} models successfully!")
+    print(f"\n✅ Registered {loaded_count} models successfully!")
+    if args.preload:
+        REGISTRY.preload(list(MODELS))
+    if args.micro_batch:
+        enable_micro_batching(args.batch_rows, args.batch_wait_ms)
+    print(f"⏱️  Ready in {time.time() - _START_TIME:.2f}s")
     print("\nStarting Flask server...")
     print("API will be available at: http://localhost:5000")
     print("\n📚 Available Endpoints:")
@@ -374,7 +550,9 @@ if __name__ == '__main__':
     print("  GET  /api/models          - List available models")
     print("  POST /api/predict         - Single prediction")
     print("  POST /api/predict-batch   - Batch predictions")
+    print("  POST /api/predict-stream  - Streaming NDJSON predictions")
     print("  POST /api/compare         - Compare multiple models")
+    print("\n💡 Development server only; for production use: python serve.py --workers N")
     print("\n" + "="*70)
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,160 @@
+"""
+Memory-mappable model artifact format
+An artifact is a pickle whose large NumPy arrays are kept next to it as
+uncompressed .npy files (<name>.arrays/NNNN.npy) and loaded with
+mmap_mode='r', so every process that loads it (API workers, scoring jobs)
+reads those arrays from one shared page-cache copy instead of its own heap
+copy. Artifacts without large arrays (and the 'joblib' format) are plain
+pickles with no arrays folder, loaded by joblib
+Libraries an artifact references are imported while it is unpickled, one
+import at a time per process: threads loading artifacts concurrently would
+otherwise race on a library's first (circular) import
+"""
+import argparse
+import glob
+import importlib
+import os
+import pickle
+import shutil
+import sys
+import threading
+import joblib
+import numpy as np
+from config import ARTIFACT_FORMAT, ARTIFACT_MMAP_MIN_BYTES
+
+
+# Serializes the first import of the modules named in artifacts
+_IMPORT_LOCK = threading.Lock()
+
+
+def arrays_dir(path):
+    """Folder holding the .npy files of an artifact"""
+    return os.path.splitext(path)[0] + '.arrays'
+
+
+class _ArrayPickler(pickle.Pickler):
+    """Pickler that writes large numeric arrays to separate .npy files"""
+
+    def __init__(self, file, folder, min_bytes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.folder = folder
+        self.min_bytes = min_bytes
+        self.names = {}
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+        entry = self.names.get(id(obj))
+        if entry is None:
+            # The array is kept alive so its id isn't reused by a temporary
+            # array of a later __reduce__ (e.g. sklearn trees build them per call)
+            entry = self.names[id(obj)] = (f'{len(self.names):04d}.npy', obj)
+            os.makedirs(self.folder, exist_ok=True)
+            np.save(os.path.join(self.folder, entry[0]), obj, allow_pickle=False)
+        return ('npy', entry[0])
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """Unpickler that maps the .npy files back in (read-only when mmap_mode='r')"""
+
+    def __init__(self, file, folder, mmap_mode):
+        super().__init__(file)
+        self.folder = folder
+        self.mmap_mode = mmap_mode
+
+    def find_class(self, module, name):
+        if module not in sys.modules:
+            with _IMPORT_LOCK:
+                importlib.import_module(module)
+        return super().find_class(module, name)
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != 'npy':
+            raise pickle.UnpicklingError(f'Unknown persistent id: {pid!r}')
+        array = np.load(os.path.join(self.folder, name), mmap_mode=self.mmap_mode, allow_pickle=False)
+        # Plain ndarray view of the mapping (np.memmap results are slower to use)
+        return array.view(np.ndarray) if isinstance(array, np.memmap) else array
+
+
+def save_artifact(obj, path, fmt=None, min_bytes=ARTIFACT_MMAP_MIN_BYTES):
+    """
+    Save obj as 'mmap' (pickle + .npy files, default config.ARTIFACT_FORMAT)
+    or 'joblib' (single pickle)
+    Returns: list of the written file paths
+    """
+    fmt = fmt or ARTIFACT_FORMAT
+    folder = arrays_dir(path)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+    if fmt == 'joblib':
+        joblib.dump(obj, path)
+        return [path]
+    if fmt != 'mmap':
+        raise ValueError(f"Unknown artifact format: {fmt!r}")
+
+    with open(path, 'wb') as f:
+        pickler = _ArrayPickler(f, folder, min_bytes)
+        pickler.dump(obj)
+    return [path] + sorted(os.path.join(folder, name) for name, _ in pickler.names.values())
+
+
+def load_artifact(path, mmap_mode='r'):
+    """Load an artifact in either format (arrays memory-mapped when mmap_mode is set)"""
+    folder = arrays_dir(path)
+    if not os.path.isdir(folder):
+        # joblib's unpickler can't be hooked: its imports are serialized whole
+        with _IMPORT_LOCK:
+            return joblib.load(path)
+    with open(path, 'rb') as f:
+        return _ArrayUnpickler(f, folder, mmap_mode).load()
+
+
+def convert_model_dir(folder_name, fmt=None):
+    """
+    Rewrite a trained model folder (DSE, scaler, encoder, columns, tree
+    engine and a current student) in another artifact format and refresh
+    its manifest, no retraining
+    """
+    import pandas as pd
+    from model_utils import save_model_artifacts
+    from manifest import read_manifest, update_manifest
+    from hashing import file_sha256
+    from distillation import student_is_current, student_path, record_student
+
+    models = glob.glob(os.path.join(folder_name, 'dse_stroke_prediction_*.pkl'))
+    if not models:
+        raise FileNotFoundError(f"No trained model in '{folder_name}'")
+    suffix = os.path.basename(models[0])[len('dse_stroke_prediction_'):-len('.pkl')]
+    dse_model, scaler, encoder, columns = [
+        load_artifact(os.path.join(folder_name, f'{prefix}_{suffix}.pkl'), mmap_mode=None)
+        for prefix in ('dse_stroke_prediction', 'scaler', 'encoder', 'model_columns')
+    ]
+    has_student = student_is_current(folder_name, suffix)
+
+    saved = save_model_artifacts(dse_model, scaler, encoder, pd.DataFrame(columns=columns),
+                                 folder_name, suffix, fmt)
+    if read_manifest(folder_name) is not None:
+        update_manifest(folder_name, 'artifacts', {
+            os.path.relpath(path, folder_name): file_sha256(path) for path in saved
+        })
+    if has_student:
+        # Same DSE in a new format: the student stays current for it
+        path = student_path(folder_name, suffix)
+        saved += save_artifact(load_artifact(path, mmap_mode=None), path, fmt)
+        record_student(folder_name, suffix, read_manifest(folder_name)['student']['report'])
+    return saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert trained model folders to another artifact format')
+    parser.add_argument('folders', nargs='+', help='Model folders (e.g. models/mean_smote)')
+    parser.add_argument('--format', choices=['mmap', 'joblib'], default=ARTIFACT_FORMAT,
+                        help=f'Target format (default: {ARTIFACT_FORMAT})')
+    args = parser.parse_args()
+    for folder_name in args.folders:
+        convert_model_dir(folder_name, args.format)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Step checkpoints for the per-variant training pipeline
+Each completed step's output is written atomically to disk so an interrupted
+run (e.g. on a preemptible machine) can continue with main.py --resume
+"""
+import json
+import os
+import shutil
+import joblib
+from config import CHECKPOINT_DIR, RESUME_ENV_VAR
+
+
+STATE_FILENAME = 'state.json'
+
+
+def is_resume():
+    """True when the STROKE_RESUME environment switch is set"""
+    return os.environ.get(RESUME_ENV_VAR, '0').lower() in ('1', 'true', 'yes')
+
+
+def _atomic_dump(obj, path):
+    """joblib.dump to a temporary file, fsync it, then rename into place"""
+    tmp_path = f'{path}.tmp'
+    joblib.dump(obj, tmp_path)
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class VariantCheckpoint:
+    """
+    Checkpoints of one variant's training steps
+    Checkpoints are only reused when resuming and when the training
+    fingerprint (data, config, model definitions) is unchanged
+    """
+
+    def __init__(self, variant, fingerprint, resume=False, checkpoint_dir=CHECKPOINT_DIR):
+        self.variant = variant
+        self.fingerprint = fingerprint
+        self.directory = os.path.join(checkpoint_dir, variant)
+        self.state = {'fingerprint': fingerprint, 'completed': []}
+
+        previous = self._read_state()
+        if resume and previous and previous.get('fingerprint') == fingerprint:
+            self.state = previous
+            if previous['completed']:
+                print(f"⏯️  Resuming {variant} after step(s): {', '.join(previous['completed'])}")
+        else:
+            if resume and previous:
+                print(f"⚠️  Checkpoints for {variant} are stale (data/config changed), starting over")
+            shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_state()
+
+    def _state_path(self):
+        return os.path.join(self.directory, STATE_FILENAME)
+
+    def _read_state(self):
+        if not os.path.exists(self._state_path()):
+            return None
+        with open(self._state_path()) as f:
+            return json.load(f)
+
+    def _write_state(self):
+        tmp_path = f'{self._state_path()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self._state_path())
+
+    def _step_path(self, step):
+        return os.path.join(self.directory, f'{step}.pkl')
+
+    def completed(self, step):
+        return step in self.state['completed']
+
+    def save(self, step, obj):
+        """Write a step's output, then mark the step completed"""
+        _atomic_dump(obj, self._step_path(step))
+        if step not in self.state['completed']:
+            self.state['completed'].append(step)
+        self._write_state()
+
+    def load(self, step):
+        return joblib.load(self._step_path(step))
+
+    def clear(self):
+        """Delete the variant's checkpoints (once its artifacts are saved)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run(self, step, func):
+        """Return the checkpointed output of a step, or run it and checkpoint it"""
+        if self.completed(step):
+            print(f"♻️  Step '{step}' restored from checkpoint")
+            return self.load(step)
+        result = func()
+        self.save(step, result)
+        return result
@@ -11,6 +11,29 @@ K_FOLD = 5
 # Train-test split ratio
 TEST_SIZE = 0.3
 
+# Dataset source (Kaggle) and local columnar snapshot cache
+KAGGLE_DATASET = 'fedesoriano/stroke-prediction-dataset'
+DATASET_FILENAME = 'healthcare-dataset-stroke-data.csv'
+DATA_CACHE_DIR = 'data_cache'
+
+# Environment switches for the dataset store
+# STROKE_OFFLINE=1 never touches the network (uses the latest local snapshot)
+# STROKE_DATASET_CSV=<path> imports a local CSV instead of downloading it
+OFFLINE_ENV_VAR = 'STROKE_OFFLINE'
+DATASET_CSV_ENV_VAR = 'STROKE_DATASET_CSV'
+
+# Thread budget for each estimator / search (n_jobs); -1 uses all cores.
+# main.py --jobs N sets STROKE_N_JOBS in each worker to its share of the cores
+N_JOBS = -1
+N_JOBS_ENV_VAR = 'STROKE_N_JOBS'
+
+# Expected raw dataset schema
+RAW_COLUMNS = [
+    'id', 'gender', 'age', 'hypertension', 'heart_disease', 'ever_married',
+    'work_type', 'Residence_type', 'avg_glucose_level', 'bmi',
+    'smoking_status', 'stroke'
+]
+
 # Important features based on paper
 IMPORTANT_FEATURES = [
     'age', 'bmi', 'avg_glucose_level', 
@@ -58,6 +81,42 @@ PARAM_GRIDS = {
     }
 }
 
+# Hyperparameter tuning mode: 'random' (RandomizedSearchCV over PARAM_GRIDS)
+# or 'halving' (budget-aware successive halving); STROKE_TUNING_MODE overrides
+TUNING_MODE = 'random'
+TUNING_MODE_ENV_VAR = 'STROKE_TUNING_MODE'
+
+# Successive halving: candidates sampled from PARAM_GRIDS, keep 1/FACTOR per rung
+HALVING_CANDIDATES = 27
+HALVING_FACTOR = 3
+
+# Resource grown at each rung: 'n_estimators' (taken out of the grid, up to its
+# largest grid value) or 'n_samples' (training rows)
+HALVING_RESOURCE = {
+    'Random Forest': 'n_estimators',
+    'XGBoost': 'n_estimators',
+    'LightGBM': 'n_estimators',
+    'Gradient Boosting': 'n_estimators',
+    'LR-AGD': 'n_samples'
+}
+HALVING_MIN_RESOURCE = {
+    'n_estimators': 30,
+    'n_samples': 0.1  # fraction of the training rows
+}
+
+# Per-model tuning budget (None = unlimited)
+TUNING_BUDGET = {
+    'max_seconds': 900,
+    'max_fits': 300
+}
+
+# SQLite database of tuning trials (reused across runs, see tuning_store.py)
+TUNING_DB_PATH = 'tuning_studies.sqlite'
+
+# Early stopping for boosting libraries during halving (10% holdout of each fold)
+EARLY_STOPPING_ROUNDS = 20
+EARLY_STOPPING_FRACTION = 0.1
+
 # Model output directories
 MODEL_DIRS = {
     'drop_imbalanced': 'models/drop_imbalanced',
@@ -71,3 +130,110 @@ MODEL_DIRS = {
     'agegroup_smote': 'models/agegroup_smote',
     'augmented_smote': 'models/augmented_smote'
 }
+
+# Training variants: (imputation strategy, class balancing)
+VARIANTS = {
+    'drop_imbalanced': ('drop', 'imbalanced'),
+    'mean_imbalanced': ('mean', 'imbalanced'),
+    'mice_imbalanced': ('mice', 'imbalanced'),
+    'agegroup_imbalanced': ('agegroup', 'imbalanced'),
+    'augmented_imbalanced': ('augmented', 'imbalanced'),
+    'drop_smote': ('drop', 'smote'),
+    'mean_smote': ('mean', 'smote'),
+    'mice_smote': ('mice', 'smote'),
+    'agegroup_smote': ('agegroup', 'smote'),
+    'augmented_smote': ('augmented', 'smote')
+}
+
+# On-disk cache for shared data preparation stages
+STAGE_CACHE_DIR = 'stage_cache'
+
+# Per-variant step checkpoints (STROKE_RESUME=1 / main.py --resume reuses them)
+CHECKPOINT_DIR = 'checkpoints'
+RESUME_ENV_VAR = 'STROKE_RESUME'
+
+# Variants whose artifact manifest matches are skipped unless forced
+FORCE_RETRAIN_ENV_VAR = 'STROKE_FORCE_RETRAIN'
+
+# Inference: predicted label is 1 when the stroke probability exceeds this
+DECISION_THRESHOLD = 0.5
+
+# Threads evaluating DSE base learners concurrently at inference
+INFERENCE_THREADS = 4
+
+# API model residency: at most this many models / bytes loaded at once
+# (least recently used models are evicted; 0 disables a limit)
+MAX_RESIDENT_MODELS = 4
+MAX_RESIDENT_BYTES = 2 * 1024**3
+
+# Threads loading models concurrently when the API preloads them
+PRELOAD_WORKERS = 4
+
+# Production server (serve.py): pre-fork gunicorn workers sharing preloaded models
+SERVER_BIND = '0.0.0.0:5000'
+SERVER_WORKERS = 4
+SERVER_THREADS = 1
+SERVER_TIMEOUT = 120
+# Residency limits of the pre-fork master (0: none, so every discovered model
+# is preloaded once and shared by all workers instead of loaded per worker)
+SERVER_MAX_RESIDENT_MODELS = 0
+SERVER_MAX_RESIDENT_BYTES = 0
+
+# Optional micro-batching of concurrent /api/predict calls (api_server.py /
+# serve.py --micro-batch): rows per model are gathered for up to this long
+MICRO_BATCH_MAX_ROWS = 32
+MICRO_BATCH_MAX_WAIT_MS = 5
+# Seconds a queued request waits for its batch before it is scored directly
+MICRO_BATCH_TIMEOUT = 10
+
+# API prediction cache: entries per process and seconds before they expire
+# (keyed by model, artifact version and preprocessed features; 0 disables)
+PREDICTION_CACHE_SIZE = 10000
+PREDICTION_CACHE_TTL = 3600
+
+# /api/predict-stream: NDJSON records scored per chunk of this many rows
+STREAM_CHUNK_ROWS = 256
+
+# score.py: rows per chunk when scoring files offline
+SCORE_CHUNK_ROWS = 50000
+
+# Packed NumPy evaluation of the DSE's tree models (tree_engine.py): models
+# are used only when they match their library within this tolerance
+TREE_ENGINE = True
+TREE_ENGINE_TOLERANCE = 1e-6
+# Batches larger than this use the libraries' own predict_proba
+TREE_ENGINE_MAX_ROWS = 512
+TREE_ENGINE_BLOCK_ROWS = 1024
+
+# Distilled student per variant (distillation.py; main.py --distill or
+# STROKE_DISTILL=1): a shallow gradient-boosted model fitted on the DSE's
+# probabilities over the training rows plus synthetic rows
+DISTILL_STUDENT = False
+DISTILL_ENV_VAR = 'STROKE_DISTILL'
+DISTILL_SYNTHETIC_FACTOR = 4   # synthetic rows per training row
+DISTILL_SWAP_PROB = 0.3        # chance a feature is taken from another row
+DISTILL_NOISE = 0.1            # numerical noise, in standard deviations
+DISTILL_ESTIMATORS = 200
+DISTILL_MAX_DEPTH = 3
+DISTILL_LEARNING_RATE = 0.1
+
+# Cascade tier ("tier": "cascade"): the distilled student answers unless its
+# stroke probability falls inside this band, then the full DSE is run
+CASCADE_BAND = (0.1, 0.9)
+
+# Latency-aware ensemble pruning (main.py --prune or STROKE_PRUNE=1): base
+# learners are dropped, most expensive first, while the DSE's out-of-fold
+# AUC and F1 stay within PRUNE_TOLERANCE of the full ensemble, until their
+# summed single-row inference cost fits PRUNE_LATENCY_BUDGET_MS
+PRUNE_ENSEMBLE = False
+PRUNE_ENV_VAR = 'STROKE_PRUNE'
+PRUNE_LATENCY_BUDGET_MS = 2.0
+PRUNE_TOLERANCE = 0.01
+PRUNE_LATENCY_ROWS = 30        # rows timed per learner (median is used)
+
+# Model artifact format (artifact_store.py): 'mmap' keeps NumPy arrays of at
+# least ARTIFACT_MMAP_MIN_BYTES as separate .npy files that every process
+# memory-maps from one page-cache copy; 'joblib' writes single pickles.
+# The compiled tree engine is saved as engine_<suffix>.pkl in this format
+ARTIFACT_FORMAT = 'mmap'
+ARTIFACT_MMAP_MIN_BYTES = 64 * 1024
@@ -7,16 +7,17 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.experimental import enable_iterative_imputer
 from sklearn.impute import IterativeImputer
 from imblearn.over_sampling import BorderlineSMOTE
-import kagglehub
+from dataset_store import get_dataset
 from config import *
 
 
-def load_dataset():
-    """Download and load the stroke prediction dataset from Kaggle"""
-    print("Downloading dataset from Kaggle...")
-    path = kagglehub.dataset_download("fedesoriano/stroke-prediction-dataset")
-    data = pd.read_csv(f"{path}/healthcare-dataset-stroke-data.csv")
-    print(f"Dataset loaded: {data.shape}")
+def load_dataset(offline=None):
+    """
+    Load the stroke prediction dataset through the local snapshot store
+    (the raw CSV is validated and parsed only once per content hash)
+    """
+    data, content_hash = get_dataset(offline=offline)
+    print(f"Dataset loaded: {data.shape} (snapshot {content_hash[:16]})")
     return data
 
 
@@ -33,8 +34,8 @@ def preprocess_basic(df):
     # Remove 'Other' gender
     df = df.drop(df[df['gender'] == 'Other'].index)
     
-    # Map ever_married
-    df['ever_married'] = df['ever_married'].map({'No': 0, 'Yes': 1})
+    # Map ever_married (snapshot stores it as categorical)
+    df['ever_married'] = df['ever_married'].astype(object).map({'No': 0, 'Yes': 1})
     
     # One-Hot Encoding for categorical features
     encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
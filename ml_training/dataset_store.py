@@ -0,0 +1,145 @@
+"""
+Local dataset store for stroke prediction
+Validates the raw Kaggle CSV once and keeps a typed, memory-mappable
+Feather snapshot keyed by the CSV content hash
+"""
+import json
+import os
+import time
+import pandas as pd
+import pyarrow.feather as feather
+from hashing import file_sha256
+from config import *
+
+
+# Raw columns stored as categorical in the snapshot
+SNAPSHOT_CATEGORICAL_COLS = ['ever_married'] + CATEGORICAL_COLS
+
+INDEX_FILENAME = 'snapshots.json'
+
+
+def validate_raw_dataset(df):
+    """
+    Check that a raw dataset matches the expected Kaggle schema
+    Raises ValueError describing the first problem found
+    """
+    missing = [col for col in RAW_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Dataset is missing columns: {missing}")
+    if df.empty:
+        raise ValueError("Dataset is empty")
+    if not df['stroke'].isin([0, 1]).all():
+        raise ValueError("Column 'stroke' must only contain 0/1 labels")
+    if not df['ever_married'].isin(['Yes', 'No']).all():
+        raise ValueError("Column 'ever_married' must only contain 'Yes'/'No'")
+    for col in NUMERICAL_COLS:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            raise ValueError(f"Column '{col}' is not numeric")
+
+
+def _atomic_write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_index(cache_dir):
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return {'latest': None, 'snapshots': {}}
+    with open(index_path) as f:
+        return json.load(f)
+
+
+def snapshot_path(content_hash, cache_dir=DATA_CACHE_DIR):
+    """Path of the Feather snapshot for a given content hash"""
+    return os.path.join(cache_dir, f'stroke-{content_hash[:16]}.feather')
+
+
+def import_csv(csv_path, cache_dir=DATA_CACHE_DIR):
+    """
+    Import a raw CSV into the store (validated and converted only once)
+    Returns: content hash of the CSV
+    """
+    content_hash = file_sha256(csv_path)
+    path = snapshot_path(content_hash, cache_dir)
+    index = _read_index(cache_dir)
+
+    if not os.path.exists(path):
+        print(f"Building dataset snapshot from '{csv_path}'...")
+        data = pd.read_csv(csv_path)
+        validate_raw_dataset(data)
+        for col in SNAPSHOT_CATEGORICAL_COLS:
+            data[col] = data[col].astype('category')
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        # Uncompressed so the snapshot can be memory-mapped on load
+        feather.write_feather(data, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+        index['snapshots'][content_hash] = {
+            'file': os.path.basename(path),
+            'source': os.path.abspath(csv_path),
+            'rows': int(len(data)),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+
+    index['latest'] = content_hash
+    _atomic_write_json(os.path.join(cache_dir, INDEX_FILENAME), index)
+    return content_hash
+
+
+def latest_snapshot(cache_dir=DATA_CACHE_DIR):
+    """Return the content hash of the most recently imported snapshot, or None"""
+    return _read_index(cache_dir)['latest']
+
+
+def load_snapshot(content_hash, cache_dir=DATA_CACHE_DIR):
+    """Load a snapshot through a memory map (no CSV parsing)"""
+    path = snapshot_path(content_hash, cache_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Dataset snapshot not found: {path}")
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def _download_raw_csv():
+    """Download the raw CSV with kagglehub and return its local path"""
+    import kagglehub
+
+    print("Downloading dataset from Kaggle...")
+    path = kagglehub.dataset_download(KAGGLE_DATASET)
+    return os.path.join(path, DATASET_FILENAME)
+
+
+def is_offline():
+    """True when the STROKE_OFFLINE environment switch is set"""
+    return os.environ.get(OFFLINE_ENV_VAR, '0').lower() in ('1', 'true', 'yes')
+
+
+def get_dataset(offline=None, csv_path=None, cache_dir=DATA_CACHE_DIR):
+    """
+    Resolve and load the dataset through the local store
+    Returns: (DataFrame, content hash)
+    """
+    if offline is None:
+        offline = is_offline()
+    if csv_path is None:
+        csv_path = os.environ.get(DATASET_CSV_ENV_VAR)
+
+    if csv_path:
+        content_hash = import_csv(csv_path, cache_dir)
+    elif offline:
+        content_hash = latest_snapshot(cache_dir)
+        if content_hash is None:
+            raise FileNotFoundError(
+                f"Offline mode: no dataset snapshot in '{cache_dir}'. "
+                f"Run once online or set {DATASET_CSV_ENV_VAR} to a local CSV."
+            )
+        print(f"Offline mode: using dataset snapshot {content_hash[:16]}")
+    else:
+        content_hash = import_csv(_download_raw_csv(), cache_dir)
+
+    return load_snapshot(content_hash, cache_dir), content_hash
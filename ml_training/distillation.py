@@ -0,0 +1,239 @@
+"""
+Distillation of a trained DSE into a small student model
+The student (one shallow gradient-boosted regressor) is fitted on the DSE's
+stroke probabilities over the training rows plus synthetic rows, saved next
+to the DSE as student_<suffix>.pkl and used by the API's 'fast' tier
+"""
+import os
+import shutil
+import time
+import numpy as np
+import config
+from artifact_store import save_artifact, load_artifact, arrays_dir
+from config import (
+    VARIANTS, MODEL_DIRS, SEED, NUMERICAL_COLS, CATEGORICAL_COLS,
+    DECISION_THRESHOLD, DISTILL_ENV_VAR
+)
+
+
+# Config values that change what the distillation produces
+DISTILL_CONFIG_KEYS = [
+    'SEED', 'DISTILL_SYNTHETIC_FACTOR', 'DISTILL_SWAP_PROB', 'DISTILL_NOISE',
+    'DISTILL_ESTIMATORS', 'DISTILL_MAX_DEPTH', 'DISTILL_LEARNING_RATE'
+]
+
+
+def is_distill():
+    """True when the STROKE_DISTILL environment switch (or config) enables it"""
+    default = '1' if config.DISTILL_STUDENT else '0'
+    return os.environ.get(DISTILL_ENV_VAR, default).lower() in ('1', 'true', 'yes')
+
+
+def student_path(folder_name, suffix):
+    return os.path.join(folder_name, f'student_{suffix}.pkl')
+
+
+def remove_student(folder_name, suffix):
+    """Delete a variant's student and its arrays (its DSE was replaced)"""
+    path = student_path(folder_name, suffix)
+    if os.path.exists(path):
+        os.remove(path)
+    shutil.rmtree(arrays_dir(path), ignore_errors=True)
+
+
+def _dse_digests(manifest, suffix):
+    """Manifest hashes of the DSE pickle and its arrays folder"""
+    dse_file = f'dse_stroke_prediction_{suffix}.pkl'
+    arrays = os.path.basename(arrays_dir(dse_file)) + os.sep
+    return {
+        name: digest for name, digest in manifest.get('artifacts', {}).items()
+        if name == dse_file or name.startswith(arrays)
+    }
+
+
+def _student_key(manifest, suffix):
+    """Content key of a student distilled from the manifest's DSE with this config"""
+    from manifest import content_key
+    return content_key({
+        'dse': _dse_digests(manifest, suffix),
+        'config': {k: getattr(config, k) for k in DISTILL_CONFIG_KEYS}
+    })
+
+
+def student_is_current(folder_name, suffix):
+    """
+    True when the manifest records the saved student as distilled from the
+    DSE now in the folder (a retrained or unrecorded DSE has no student)
+    """
+    from manifest import read_manifest
+
+    manifest = read_manifest(folder_name)
+    if manifest is None or not os.path.exists(student_path(folder_name, suffix)):
+        return False
+    dse = _dse_digests(manifest, suffix)
+    return bool(dse) and (manifest.get('student') or {}).get('dse') == dse
+
+
+def record_student(folder_name, suffix, report):
+    """Record the saved student, and the DSE it was distilled from, in the manifest"""
+    from manifest import read_manifest, update_manifest
+    from hashing import file_sha256
+
+    manifest = read_manifest(folder_name)
+    path = student_path(folder_name, suffix)
+    update_manifest(folder_name, 'student', {
+        'key': _student_key(manifest, suffix),
+        'dse': _dse_digests(manifest, suffix),
+        'file': os.path.basename(path),
+        'sha256': file_sha256(path),
+        'report': report
+    })
+
+
+class StudentModel:
+    """Regressor of the DSE's stroke probability, exposed as a classifier"""
+
+    def __init__(self, regressor, classes):
+        self.regressor = regressor
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X):
+        p1 = np.clip(self.regressor.predict(X), 0.0, 1.0)
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, X):
+        p1 = self.predict_proba(X)[:, 1]
+        return np.where(p1 > DECISION_THRESHOLD, self.classes_[1], self.classes_[0])
+
+
+def _feature_groups(columns):
+    """Column index groups swapped together: one per field (one-hot groups intact)"""
+    groups, grouped = [], set()
+    for field in CATEGORICAL_COLS:
+        members = [i for i, col in enumerate(columns) if col.startswith(f'{field}_')]
+        if members:
+            groups.append(members)
+            grouped.update(members)
+    groups += [[i] for i in range(len(columns)) if i not in grouped]
+    return groups
+
+
+def synthetic_samples(X, n_samples, seed=SEED):
+    """
+    MUNGE-style synthetic rows: copies of random training rows where each
+    feature group is swapped, with probability DISTILL_SWAP_PROB, for the
+    values of another random row, and numerical columns get Gaussian noise
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    values = X.to_numpy(dtype=np.float64)
+    base = values[rng.integers(len(values), size=n_samples)]
+    donors = values[rng.integers(len(values), size=n_samples)]
+    for group in _feature_groups(list(X.columns)):
+        swap = rng.random(n_samples) < config.DISTILL_SWAP_PROB
+        base[np.ix_(swap, group)] = donors[np.ix_(swap, group)]
+    numeric = [i for i, col in enumerate(X.columns) if col in NUMERICAL_COLS]
+    scale = values[:, numeric].std(axis=0) * config.DISTILL_NOISE
+    base[:, numeric] += rng.normal(size=(n_samples, len(numeric))) * scale
+    return pd.DataFrame(base, columns=X.columns)
+
+
+def train_student(dse_model, X_train):
+    """Fit the student on the DSE's probabilities over real + synthetic rows"""
+    from sklearn.ensemble import GradientBoostingRegressor
+    import pandas as pd
+
+    n_synthetic = int(len(X_train) * config.DISTILL_SYNTHETIC_FACTOR)
+    X = pd.concat([X_train, synthetic_samples(X_train, n_synthetic)], ignore_index=True)
+    targets = dse_model.predict_proba(X)[:, 1]
+    regressor = GradientBoostingRegressor(
+        n_estimators=config.DISTILL_ESTIMATORS,
+        max_depth=config.DISTILL_MAX_DEPTH,
+        learning_rate=config.DISTILL_LEARNING_RATE,
+        subsample=0.8,
+        random_state=SEED
+    )
+    regressor.fit(X, targets)
+    print(f"Student fitted on {len(X_train)} training + {n_synthetic} synthetic rows")
+    return StudentModel(regressor, dse_model.classes_)
+
+
+def _median_latency(model, X, rows=50):
+    """Median seconds of a single-row predict_proba"""
+    times = []
+    for i in range(min(rows, len(X))):
+        row = X.iloc[i:i + 1]
+        start = time.perf_counter()
+        model.predict_proba(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def fidelity_report(student, dse_model, X_test, y_test):
+    """Fidelity gap to the DSE on the test set and single-row latency gain"""
+    from sklearn.metrics import roc_auc_score
+
+    teacher = dse_model.predict_proba(X_test)[:, 1]
+    pupil = student.predict_proba(X_test)[:, 1]
+    gap = np.abs(teacher - pupil)
+    report = {
+        'mean_abs_gap': float(gap.mean()),
+        'max_abs_gap': float(gap.max()),
+        'label_agreement': float(np.mean((teacher > DECISION_THRESHOLD) == (pupil > DECISION_THRESHOLD))),
+        'dse_auc': float(roc_auc_score(y_test, teacher)),
+        'student_auc': float(roc_auc_score(y_test, pupil)),
+        'dse_latency_ms': _median_latency(dse_model, X_test) * 1000,
+        'student_latency_ms': _median_latency(student, X_test) * 1000
+    }
+    report['speedup'] = report['dse_latency_ms'] / report['student_latency_ms']
+
+    print("\n" + "="*50)
+    print("STUDENT MODEL (DISTILLED DSE)")
+    print("="*50)
+    print(f"Mean |p_student - p_dse|: {report['mean_abs_gap']:.4f} (max {report['max_abs_gap']:.4f})")
+    print(f"Label agreement:          {report['label_agreement']*100:.2f}%")
+    print(f"AUC:                      {report['student_auc']:.4f} (DSE {report['dse_auc']:.4f})")
+    print(f"Single-row latency:       {report['student_latency_ms']:.2f}ms "
+          f"(DSE {report['dse_latency_ms']:.2f}ms, {report['speedup']:.0f}x faster)")
+    return report
+
+
+def distill_variant(variant, dse_model=None, data=None):
+    """
+    Distill a variant's saved DSE into its student unless the manifest shows
+    the student is already up to date; records it in the manifest
+    Returns: the fidelity report (the stored one when skipped)
+    """
+    from manifest import read_manifest
+    from hashing import file_sha256
+
+    imputation, balance = VARIANTS[variant]
+    suffix = f'{balance}_{imputation}'
+    folder_name = MODEL_DIRS[variant]
+    manifest = read_manifest(folder_name)
+    if manifest is None:
+        raise FileNotFoundError(f"No trained artifacts in '{folder_name}'")
+
+    dse_file = f'dse_stroke_prediction_{suffix}.pkl'
+    key = _student_key(manifest, suffix)
+    path = student_path(folder_name, suffix)
+    student_entry = manifest.get('student') or {}
+    if (student_entry.get('key') == key and student_is_current(folder_name, suffix)
+            and file_sha256(path) == student_entry.get('sha256')):
+        print(f"⏭️  Student in '{folder_name}' is up to date")
+        return student_entry['report']
+
+    if dse_model is None:
+        dse_model = load_artifact(os.path.join(folder_name, dse_file))
+    if data is None:
+        from pipeline import prepare_variant_data
+        data = prepare_variant_data(variant)
+    X_train, X_test, y_train, y_test = data[:4]
+
+    student = train_student(dse_model, X_train)
+    report = fidelity_report(student, dse_model, X_test, y_test)
+    save_artifact(student, path)
+    print(f"Student saved at: '{path}'")
+    record_student(folder_name, suffix, report)
+    return report
@@ -0,0 +1,265 @@
+"""
+Inference engine for the Dense Stacking Ensemble
+Flattens a fitted DSE (nested soft Voting / Stacking classifiers) into an
+explicit graph: every distinct base learner is evaluated once per request,
+each level of the graph runs as one step on a thread pool, and every
+meta-learner consumes a single stacked feature matrix. Results match the
+nested estimator's predict_proba exactly. With config.TREE_ENGINE the tree
+models (base learners and stacking meta-learners) are evaluated by the
+packed NumPy evaluator of tree_engine.py instead, within its tolerance
+"""
+import os
+import threading
+import joblib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from tree_engine import compile_tree_models
+from artifact_store import save_artifact, load_artifact
+from hashing import file_sha256
+from config import INFERENCE_THREADS, TREE_ENGINE, TREE_ENGINE_MAX_ROWS, TREE_ENGINE_TOLERANCE
+
+
+_EXECUTOR = None
+_EXECUTOR_PID = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor():
+    """Process-wide thread pool shared by all engines (recreated after fork)"""
+    global _EXECUTOR, _EXECUTOR_PID
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR_PID != os.getpid():
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=INFERENCE_THREADS, thread_name_prefix='dse-engine'
+            )
+            _EXECUTOR_PID = os.getpid()
+    return _EXECUTOR
+
+
+class _Node:
+    """Graph node: a base learner ('leaf') or a soft voting / stacking combiner"""
+
+    def __init__(self, kind, estimator, children=(), methods=(), level=0):
+        self.kind = kind
+        self.estimator = estimator
+        self.children = list(children)
+        self.methods = list(methods)
+        self.level = level
+        # Packed meta-learner of a stacking node (tree_engine), if compiled
+        self.packed = None
+
+
+class DSEGraph:
+    """Flattened, deduplicated evaluation graph of a fitted DSE"""
+
+    def __init__(self, model, root, leaves, levels, packed=None, packed_leaves=(), packs=None):
+        self.model = model
+        self.classes_ = model.classes_
+        self.root = root
+        self.leaves = leaves
+        # levels[0]: (leaf, method) tasks; levels[1:]: combiner nodes
+        self.levels = levels
+        # Tree-model leaves evaluated together by one PackedTrees
+        self.packed = packed
+        self.packed_leaves = list(packed_leaves)
+        # Compiled PackedTrees as compile_dse_graph(packs=...) takes them back
+        self.packs = packs
+
+    def _map(self, func, items):
+        if INFERENCE_THREADS <= 1 or len(items) == 1:
+            return [func(item) for item in items]
+        return list(_get_executor().map(func, items))
+
+    def predict_proba(self, X):
+        """Class probabilities, evaluating each distinct learner once"""
+        outputs = {}
+        X_values = None
+
+        # Level 0: every distinct base learner in one concurrent step, the
+        # packed tree models as a single task (small batches only: for large
+        # ones the libraries' own batch loops are as fast)
+        use_packed = len(X) <= TREE_ENGINE_MAX_ROWS
+        packed_ids = {id(leaf) for leaf in self.packed_leaves} if use_packed else set()
+        tasks = [task for task in self.levels[0]
+                 if not (id(task[0]) in packed_ids and task[1] == 'predict_proba')]
+        if self.packed is not None and use_packed:
+            tasks.append((None, 'packed'))
+        results = self._map(self._run_task(X), tasks)
+        for (leaf, method), result in zip(tasks, results):
+            if leaf is None:
+                for packed_leaf, proba in zip(self.packed_leaves, result):
+                    outputs[(id(packed_leaf), 'predict_proba')] = proba
+            else:
+                outputs[(id(leaf), method)] = result
+
+        # Combiners, level by level
+        for nodes in self.levels[1:]:
+            if any(node.kind == 'stacking' and node.estimator.passthrough for node in nodes):
+                if X_values is None:
+                    X_values = np.asarray(X)
+            results = self._map(lambda node: self._combine(node, outputs, X_values, use_packed), nodes)
+            for node, result in zip(nodes, results):
+                outputs[(id(node), 'predict_proba')] = result
+
+        return outputs[(id(self.root), 'predict_proba')]
+
+    def _run_task(self, X):
+        def run(task):
+            leaf, method = task
+            if leaf is None:
+                return self.packed.predict_proba(X)
+            return getattr(leaf.estimator, method)(X)
+        return run
+    
+    @staticmethod
+    def _combine(node, outputs, X_values, use_packed=False):
+        preds = [outputs[(id(child), method)] for child, method in zip(node.children, node.methods)]
+        if node.kind == 'voting':
+            return np.average(np.asarray(preds), axis=0, weights=node.estimator._weights_not_none)
+
+        # Stacking: the meta-learner's single stacked feature matrix,
+        # built as StackingClassifier.transform builds it
+        binary = len(node.estimator.classes_) == 2
+        X_meta = []
+        for pred, method in zip(preds, node.methods):
+            if pred.ndim == 1:
+                X_meta.append(pred.reshape(-1, 1))
+            elif method == 'predict_proba' and binary:
+                X_meta.append(pred[:, 1:])
+            else:
+                X_meta.append(pred)
+        if node.estimator.passthrough:
+            X_meta.append(X_values)
+        if node.packed is not None and use_packed:
+            return node.packed.predict_proba(np.hstack(X_meta))[0]
+        return node.estimator.final_estimator_.predict_proba(np.hstack(X_meta))
+
+
+def compile_dse_graph(model, packs=None):
+    """
+    Flatten a fitted DSE into a DSEGraph
+    Identical learners (the same object, or equal fitted state in artifacts
+    where each sub-ensemble holds its own copy) become one leaf; packs are
+    tree models compiled earlier for this model (graph.packs, e.g. loaded
+    from an engine artifact), compiled here when None or not matching
+    Returns None when the model has a structure the graph doesn't reproduce
+    """
+    # Imported here so the API starts without sklearn (unpickling loads it anyway)
+    from sklearn.ensemble import StackingClassifier, VotingClassifier
+
+    leaves = []
+    by_id = {}
+    by_content = {}
+    composites = {}
+    tasks = []
+    combiners = []
+
+    def leaf(estimator, method):
+        node = by_id.get(id(estimator))
+        if node is None:
+            digest = joblib.hash(estimator)
+            node = by_content.get(digest)
+            if node is None:
+                node = _Node('leaf', estimator)
+                by_content[digest] = node
+                leaves.append(node)
+            by_id[id(estimator)] = node
+        if (node, method) not in tasks:
+            tasks.append((node, method))
+        return node
+
+    def visit(estimator, method='predict_proba'):
+        if id(estimator) in composites:
+            return composites[id(estimator)] if method == 'predict_proba' else None
+        if isinstance(estimator, VotingClassifier):
+            if estimator.voting != 'soft' or method != 'predict_proba':
+                return None
+            children = [visit(est) for est in estimator.estimators_]
+            methods = ['predict_proba'] * len(children)
+        elif isinstance(estimator, StackingClassifier):
+            if method != 'predict_proba' or not hasattr(estimator, 'final_estimator_'):
+                return None
+            if any(isinstance(est, str) for est in estimator.estimators_):
+                return None  # 'drop' entries
+            methods = list(estimator.stack_method_)
+            children = [visit(est, meth) for est, meth in zip(estimator.estimators_, methods)]
+        else:
+            return leaf(estimator, method)
+
+        if any(child is None for child in children):
+            return None
+        node = _Node(
+            'voting' if isinstance(estimator, VotingClassifier) else 'stacking',
+            estimator, children, methods,
+            level=1 + max(child.level for child in children)
+        )
+        combiners.append(node)
+        composites[id(estimator)] = node
+        return node
+
+    if not isinstance(model, (StackingClassifier, VotingClassifier)):
+        return None
+    root = visit(model)
+    if root is None:
+        return None
+
+    levels = [tasks]
+    for level in range(1, root.level + 1):
+        levels.append([node for node in combiners if node.level == level])
+    if not TREE_ENGINE:
+        return DSEGraph(model, root, leaves, levels)
+
+    # Pack the tree models; the ones that don't compile or verify stay as they are
+    packed_leaves = [leaf for leaf, method in tasks if method == 'predict_proba']
+    stacking = [node for node in combiners if node.kind == 'stacking']
+    if not _packs_match(packs, model, packed_leaves, stacking):
+        packs = {
+            'leaves': compile_tree_models(
+                [leaf.estimator for leaf in packed_leaves], model.n_features_in_
+            ),
+            'meta': [
+                compile_tree_models([node.estimator.final_estimator_],
+                                    node.estimator.final_estimator_.n_features_in_)[0]
+                for node in stacking
+            ]
+        }
+    packed, indices = packs['leaves']
+    for node, node_packed in zip(stacking, packs['meta']):
+        node.packed = node_packed
+    return DSEGraph(model, root, leaves, levels, packed,
+                    [packed_leaves[i] for i in indices], packs)
+
+
+def _packs_match(packs, model, packed_leaves, stacking):
+    """True when precompiled packs have the shape of this model's graph"""
+    if not packs:
+        return False
+    packed, indices = packs['leaves']
+    return (len(packs['meta']) == len(stacking)
+            and all(i < len(packed_leaves) for i in indices)
+            and (packed is None or packed.n_features == model.n_features_in_))
+
+
+def save_tree_packs(graph, path, model_path, fmt=None):
+    """
+    Save a graph's compiled tree models as an artifact tied to the model
+    file they were compiled from (memory-mapped by every loading process)
+    Returns: list of the written file paths
+    """
+    return save_artifact({
+        'model_sha256': file_sha256(model_path),
+        'tolerance': TREE_ENGINE_TOLERANCE,
+        **graph.packs
+    }, path, fmt)
+
+
+def load_tree_packs(path, model_path):
+    """Tree models compiled for this model file, or None when absent or stale"""
+    if not TREE_ENGINE or not os.path.exists(path):
+        return None
+    packs = load_artifact(path)
+    if (packs.get('model_sha256') != file_sha256(model_path)
+            or packs.get('tolerance') != TREE_ENGINE_TOLERANCE):
+        print(f"⚠️  {os.path.basename(path)} is stale; compiling the tree engine")
+        return None
+    return packs
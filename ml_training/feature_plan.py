@@ -0,0 +1,112 @@
+"""
+Compiled feature plan for inference preprocessing
+Built once from the fitted scaler, encoder and model columns: patients are
+written straight into a preallocated NumPy matrix with the same values the
+pandas preprocessing path produces
+"""
+import numpy as np
+from config import NUMERICAL_COLS, CATEGORICAL_COLS
+
+
+EVER_MARRIED_MAP = {'Yes': 1, 'No': 0}
+
+
+class FeaturePlan:
+    """Column index maps, category-to-slot tables and scaling vectors"""
+
+    def __init__(self, model_columns, numeric, ever_married, passthrough,
+                 categorical, handle_unknown):
+        self.model_columns = list(model_columns)
+        self.n_features = len(self.model_columns)
+        # (field, column index, mean, scale) of the scaled numerical fields
+        self.numeric_fields = [field for field, _, _, _ in numeric]
+        self.numeric_idx = np.array([idx for _, idx, _, _ in numeric], dtype=np.intp)
+        self.mean = np.array([mean for _, _, mean, _ in numeric], dtype=np.float64)
+        self.scale = np.array([scale for _, _, _, scale in numeric], dtype=np.float64)
+        self.ever_married = ever_married
+        self.passthrough = passthrough
+        self.categorical = categorical
+        self.handle_unknown = handle_unknown
+
+    def transform(self, records):
+        """
+        Write patient records into a (n_records, n_features) float64 matrix
+        Columns the records don't provide stay 0, as in the pandas path
+        """
+        out = np.zeros((len(records), self.n_features), dtype=np.float64)
+        raw_numeric = np.empty((len(records), len(self.numeric_fields)), dtype=np.float64)
+
+        for r, record in enumerate(records):
+            row = out[r]
+            for j, field in enumerate(self.numeric_fields):
+                value = record[field]
+                raw_numeric[r, j] = np.nan if value is None else float(value)
+            if self.ever_married is not None:
+                row[self.ever_married] = EVER_MARRIED_MAP.get(record['ever_married'], np.nan)
+            for field, idx in self.passthrough:
+                value = record.get(field, 0)
+                row[idx] = np.nan if value is None else float(value)
+            for field, slots in self.categorical:
+                value = record[field]
+                slot = slots.get(value)
+                if slot is not None:
+                    if slot >= 0:
+                        row[slot] = 1.0
+                elif self.handle_unknown == 'error':
+                    raise ValueError(
+                        f"Found unknown categories [{value!r}] in column '{field}' during transform"
+                    )
+
+        # Same operations as StandardScaler.transform (X -= mean_; X /= scale_)
+        raw_numeric -= self.mean
+        raw_numeric /= self.scale
+        out[:, self.numeric_idx] = raw_numeric
+        return out
+
+
+def compile_feature_plan(scaler, encoder, model_columns):
+    """
+    Compile the fitted preprocessing into a FeaturePlan
+    Returns None when the artifacts use options the plan doesn't reproduce
+    (the caller then keeps the pandas path)
+    """
+    # Imported here so the API starts without sklearn (unpickling loads it anyway)
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+    if type(scaler) is not StandardScaler or type(encoder) is not OneHotEncoder:
+        return None
+    if list(getattr(scaler, 'feature_names_in_', NUMERICAL_COLS)) != NUMERICAL_COLS:
+        return None
+    if encoder.drop is not None or encoder.handle_unknown not in ('ignore', 'error'):
+        return None
+    if encoder.min_frequency is not None or encoder.max_categories is not None:
+        return None
+
+    column_idx = {col: i for i, col in enumerate(model_columns)}
+    n = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n)
+
+    numeric = [
+        (field, column_idx[field], mean[j], scale[j])
+        for j, field in enumerate(NUMERICAL_COLS) if field in column_idx
+    ]
+    # Encoded values that aren't model columns are dropped (slot -1)
+    encoded_names = encoder.get_feature_names_out(CATEGORICAL_COLS)
+    categorical, k = [], 0
+    for field, categories in zip(CATEGORICAL_COLS, encoder.categories_):
+        slots = {}
+        for category in categories:
+            slots[category] = column_idx.get(encoded_names[k], -1)
+            k += 1
+        categorical.append((field, slots))
+
+    produced = set(NUMERICAL_COLS) | set(encoded_names) | {'ever_married'}
+    passthrough = [
+        (col, i) for i, col in enumerate(model_columns)
+        if col not in produced and col not in CATEGORICAL_COLS
+    ]
+    return FeaturePlan(
+        model_columns, numeric, column_idx.get('ever_married'), passthrough,
+        categorical, encoder.handle_unknown
+    )
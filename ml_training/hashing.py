@@ -0,0 +1,14 @@
+"""
+File content hashing shared by the dataset store, manifests and model
+artifacts (standard library only, so the API can import it cheaply)
+"""
+import hashlib
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
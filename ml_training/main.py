@@ -3,6 +3,7 @@ Main orchestrator for training all model variants
 Run this file to train all 10 model combinations
 """
 import argparse
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -17,10 +18,18 @@ import train_mean_smote
 import train_mice_smote
 import train_agegroup_smote
 import train_augmented_smote
+from pipeline import run_stage_matrix, artifact_status
+from manifest import read_manifest
+from distillation import is_distill, distill_variant
+from scheduler import train_variants_parallel
+from config import (
+    VARIANTS, OFFLINE_ENV_VAR, DATASET_CSV_ENV_VAR, TUNING_MODE_ENV_VAR,
+    RESUME_ENV_VAR, FORCE_RETRAIN_ENV_VAR, DISTILL_ENV_VAR, PRUNE_ENV_VAR, MODEL_DIRS
+)
 
 
-def train_all_models():
-    """Train all 10 model variants"""
+def train_all_models(jobs=1):
+    """Train all 10 model variants (concurrently when jobs > 1)"""
     
     print("\n" + "="*70)
     print(" STROKE PREDICTION MODEL TRAINING - ALL 10 VARIANTS")
@@ -28,6 +37,35 @@ def train_all_models():
     
     results = {}
     
+    # Shared data stages (load, preprocess, impute, split, SMOTE) run once,
+    # only for variants whose artifacts are stale
+    print("\n\n" + "="*70)
+    print(" PART 0: SHARED DATA PREPARATION STAGES")
+    print("="*70)
+    status = artifact_status(list(VARIANTS))
+    stale = [variant for variant, reason in status.items() if reason]
+    print(f"\n🔁 {len(stale)}/{len(status)} variants need training")
+    run_stage_matrix(stale)
+    
+    if jobs > 1:
+        print("\n\n" + "="*70)
+        print(f" PARALLEL TRAINING: {jobs} JOBS")
+        print("="*70)
+        results = {
+            variant: read_manifest(MODEL_DIRS[variant])['metrics']
+            for variant, reason in status.items() if not reason
+        }
+        if stale:
+            results.update(train_variants_parallel(stale, jobs))
+        if is_distill():
+            # Stale variants were distilled by their workers
+            for variant, reason in status.items():
+                if not reason:
+                    distill_variant(variant)
+        results = {variant: results[variant] for variant in VARIANTS}
+        print_training_summary(results)
+        return results
+    
     # IMBALANCED VARIANTS
     print("\n\n" + "="*70)
     print(" PART 1: IMBALANCED DATASET VARIANTS")
@@ -138,7 +176,13 @@ def train_all_models():
         print(f"❌ Error: {e}")
         results['augmented_smote'] = None
     
-    # Print summary
+    print_training_summary(results)
+    
+    return results
+
+
+def print_training_summary(results):
+    """Print metrics of every trained variant and the success count"""
     print("\n\n" + "="*70)
     print(" TRAINING SUMMARY - ALL 10 MODELS")
     print("="*70)
@@ -163,8 +207,6 @@ def train_all_models():
     print(f"✅ Successfully trained: {successful_count}/10 models")
     print(f"❌ Failed: {failed_count}/10 models")
     print("="*70)
-    
-    return results
 
 
 def train_single_model(variant):
@@ -211,11 +253,70 @@ def main():
         default='all',
         help='Model variant to train (default: all). Options: all, drop_imbalanced, mean_imbalanced, mice_imbalanced, agegroup_imbalanced, augmented_imbalanced, drop_smote, mean_smote, mice_smote, agegroup_smote, augmented_smote'
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Train this many variants concurrently; cores are split between them (default: 1)'
+    )
+    parser.add_argument(
+        '--tuning',
+        choices=['random', 'halving'],
+        default=None,
+        help='Hyperparameter tuning mode (default: config.TUNING_MODE)'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Never touch the network; use the latest local dataset snapshot'
+    )
+    parser.add_argument(
+        '--dataset-csv',
+        type=str,
+        default=None,
+        help='Import a local copy of the raw Kaggle CSV instead of downloading it'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue interrupted training from the last completed step checkpoints'
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Retrain even when the artifact manifest shows nothing changed'
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help='Drop base learners from the DSE to fit config.PRUNE_LATENCY_BUDGET_MS'
+    )
+    parser.add_argument(
+        '--distill',
+        action='store_true',
+        help="Also distill each DSE into a fast student model (API tier 'fast')"
+    )
     
     args = parser.parse_args()
     
+    # Dataset store switches are read by load_dataset() in every variant
+    if args.offline:
+        os.environ[OFFLINE_ENV_VAR] = '1'
+    if args.dataset_csv:
+        os.environ[DATASET_CSV_ENV_VAR] = os.path.abspath(args.dataset_csv)
+    if args.tuning:
+        os.environ[TUNING_MODE_ENV_VAR] = args.tuning
+    if args.resume:
+        os.environ[RESUME_ENV_VAR] = '1'
+    if args.force:
+        os.environ[FORCE_RETRAIN_ENV_VAR] = '1'
+    if args.prune:
+        os.environ[PRUNE_ENV_VAR] = '1'
+    if args.distill:
+        os.environ[DISTILL_ENV_VAR] = '1'
+    
     if args.variant == 'all':
-        results = train_all_models()
+        results = train_all_models(jobs=args.jobs)
     else:
         results = train_single_model(args.variant)
     
@@ -0,0 +1,102 @@
+"""
+Content-addressed manifests for model artifact folders
+Each folder records what produced its artifacts (dataset, preprocessing,
+param grids, model definitions, library versions) and the hash of every
+saved file, so unchanged variants can be skipped instead of retrained
+"""
+import hashlib
+import json
+import os
+import time
+import numpy as np
+from hashing import file_sha256
+
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def content_key(payload):
+    """Stable SHA-256 of a JSON-serializable payload (e.g. a fingerprint dict)"""
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _json_metrics(metrics):
+    """JSON-safe copy of the evaluate_final_model metrics"""
+    return {
+        name: value.tolist() if isinstance(value, np.ndarray) else float(value)
+        for name, value in metrics.items()
+    }
+
+
+def manifest_path(folder_name):
+    return os.path.join(folder_name, MANIFEST_FILENAME)
+
+
+def read_manifest(folder_name):
+    """Return the manifest of an artifact folder, or None"""
+    path = manifest_path(folder_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(folder_name, variant, fingerprint, artifact_paths, metrics):
+    """Write the manifest after all artifacts of a variant were saved"""
+    manifest = {
+        'variant': variant,
+        'key': content_key(fingerprint),
+        'fingerprint': fingerprint,
+        'artifacts': {
+            os.path.relpath(path, folder_name): file_sha256(path) for path in artifact_paths
+        },
+        'metrics': _json_metrics(metrics),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    path = _write(folder_name, manifest)
+    print(f"Manifest saved at: '{path}'")
+    return manifest
+
+
+def update_manifest(folder_name, section, value):
+    """Set one extra section (e.g. the distilled student) of an existing manifest"""
+    manifest = read_manifest(folder_name)
+    if manifest is None:
+        raise FileNotFoundError(f"No manifest in '{folder_name}'")
+    manifest[section] = value
+    _write(folder_name, manifest)
+    return manifest
+
+
+def _write(folder_name, manifest):
+    path = manifest_path(folder_name)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def stale_reason(folder_name, fingerprint):
+    """
+    Why an artifact folder must be rebuilt for this fingerprint
+    Returns: None when the manifest matches and every artifact is intact
+    """
+    manifest = read_manifest(folder_name)
+    if manifest is None:
+        return 'no manifest'
+    if manifest.get('key') != content_key(fingerprint):
+        previous = manifest.get('fingerprint', {})
+        changed = [name for name in fingerprint if previous.get(name) != fingerprint[name]]
+        return f"changed: {', '.join(changed) or 'manifest format'}"
+    for filename, digest in manifest['artifacts'].items():
+        path = os.path.join(folder_name, filename)
+        if not os.path.exists(path):
+            return f'missing {filename}'
+        if file_sha256(path) != digest:
+            return f'modified {filename}'
+    return None
@@ -0,0 +1,48 @@
+"""
+Process memory reporting (RSS, and PSS / shared pages on Linux)
+PSS splits shared pages between the processes that map them, so the sum
+of the workers' PSS is what a pre-fork server really uses
+"""
+import os
+import resource
+
+
+def _read_smaps_rollup(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])  # kB
+    return fields
+
+
+def process_memory(pid=None):
+    """
+    Memory of a process in MB: rss, pss and shared (None where unavailable)
+    """
+    pid = pid or os.getpid()
+    try:
+        fields = _read_smaps_rollup(pid)
+        return {
+            'rss_mb': fields.get('Rss', 0) / 1024,
+            'pss_mb': fields.get('Pss', 0) / 1024,
+            'shared_mb': (fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024
+        }
+    except OSError:
+        pass
+    if pid == os.getpid():
+        # Peak RSS (KB on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1024**2 if os.uname().sysname == 'Darwin' else 1024
+        return {'rss_mb': maxrss / scale, 'pss_mb': None, 'shared_mb': None}
+    return {'rss_mb': None, 'pss_mb': None, 'shared_mb': None}
+
+
+def format_memory(memory):
+    """One-line summary of process_memory() output"""
+    parts = [f"RSS {memory['rss_mb']:.0f} MB"] if memory['rss_mb'] is not None else []
+    if memory['pss_mb'] is not None:
+        parts.append(f"PSS {memory['pss_mb']:.0f} MB")
+        parts.append(f"shared {memory['shared_mb']:.0f} MB")
+    return ', '.join(parts) or 'unavailable'
@@ -0,0 +1,113 @@
+"""
+Dynamic micro-batching for single-patient predictions
+Concurrent requests for the same model are queued, gathered for up to
+max_wait_ms or max_rows, scored with one vectorized predict_proba call and
+each result is handed back to its caller. A request whose batch doesn't
+come back within timeout seconds is scored directly instead
+"""
+import os
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from config import MICRO_BATCH_MAX_ROWS, MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_TIMEOUT
+
+
+class MicroBatcher:
+    """Per-model (and tier) request queues drained by one collector thread each"""
+
+    def __init__(self, registry, max_rows=MICRO_BATCH_MAX_ROWS, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+                 timeout=MICRO_BATCH_TIMEOUT):
+        self.registry = registry
+        self.max_rows = max(1, max_rows)
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queues = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch': 0, 'fallbacks': 0,
+                      'errors': 0, 'timeouts': 0}
+
+    def predict(self, model_id, data, threshold=None, tier=None):
+        """Queue one patient and block until its result (or error) is ready"""
+        future = Future()
+        self._queue(model_id, tier or 'full').put((data, threshold, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # The collector is stuck: don't leave the caller waiting on it
+            with self._lock:
+                self.stats['timeouts'] += 1
+            return self.registry.get(model_id).predict(data, threshold, tier)
+
+    def _queue(self, model_id, tier):
+        with self._lock:
+            # Collector threads don't survive a fork: start fresh in each worker
+            if self._pid != os.getpid():
+                self._queues = {}
+                self._pid = os.getpid()
+            q, collector = self._queues.get((model_id, tier), (None, None))
+            if collector is None or not collector.is_alive():
+                # Requests still queued for a dead collector are picked up by the new one
+                q = q or queue.Queue()
+                collector = threading.Thread(
+                    target=self._collect, args=(model_id, tier, q),
+                    name=f'micro-batch-{model_id}-{tier}', daemon=True
+                )
+                collector.start()
+                self._queues[(model_id, tier)] = (q, collector)
+            return q
+
+    def _collect(self, model_id, tier, q):
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._run(model_id, tier, batch)
+            except Exception as e:
+                # Fail the batch's unanswered requests but keep the collector alive
+                with self._lock:
+                    self.stats['errors'] += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run(self, model_id, tier, batch):
+        with self._lock:
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        try:
+            service = self.registry.get(model_id)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        try:
+            processed = service.preprocess_records([data for data, _, _ in batch])
+            thresholds = np.array([
+                service.threshold if threshold is None else threshold
+                for _, threshold, _ in batch
+            ])
+            labels, probabilities = service.predict_proba_with_labels(processed, thresholds, tier)
+        except Exception:
+            # Isolate whatever broke the vectorized call to its own request
+            with self._lock:
+                self.stats['fallbacks'] += 1
+            for data, threshold, future in batch:
+                try:
+                    future.set_result(service.predict(data, threshold, tier))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for (_, threshold, future), label, probability in zip(batch, labels, probabilities):
+            future.set_result(service._build_result(label, probability, threshold, tier))
@@ -0,0 +1,188 @@
+"""
+Lazy model registry for the prediction API
+Variants are registered by metadata only; a StrokePredictionService is
+loaded on first use and at most N models / M bytes stay resident, with
+least recently used models evicted first
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from predict_service import StrokePredictionService, TIERS
+from distillation import student_is_current
+from artifact_store import arrays_dir
+from memory_stats import process_memory, format_memory
+from config import MAX_RESIDENT_MODELS, MAX_RESIDENT_BYTES, PRELOAD_WORKERS
+
+
+def artifact_paths(model_dir, model_suffix):
+    """Paths of the four artifacts a StrokePredictionService loads"""
+    return [
+        os.path.join(model_dir, f'{prefix}_{model_suffix}.pkl')
+        for prefix in ('dse_stroke_prediction', 'scaler', 'encoder', 'model_columns')
+    ]
+
+
+def artifact_bytes(path):
+    """Size of an artifact on disk, memory-mapped .npy arrays included"""
+    folder = arrays_dir(path)
+    arrays = [os.path.join(folder, name) for name in os.listdir(folder)] if os.path.isdir(folder) else []
+    return os.path.getsize(path) + sum(os.path.getsize(array) for array in arrays)
+
+
+class ModelRegistry:
+    """Thread-safe LRU of loaded prediction services"""
+
+    def __init__(self, max_models=MAX_RESIDENT_MODELS, max_bytes=MAX_RESIDENT_BYTES, cache=None):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        # Optional PredictionCache shared by the loaded services
+        self.cache = cache
+        self._entries = {}
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def register(self, model_id, model_dir, model_suffix):
+        """Register a variant without loading it (artifacts must exist)"""
+        paths = artifact_paths(model_dir, model_suffix)
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Artifact not found: {missing[0]}")
+        # Compiled tree engine, loaded with the DSE when it was saved
+        engine = os.path.join(model_dir, f'engine_{model_suffix}.pkl')
+        if os.path.exists(engine):
+            paths.append(engine)
+        # Distilled student serving the 'fast' tier, when one was trained from this DSE
+        has_student = student_is_current(model_dir, model_suffix)
+        if has_student:
+            paths.append(os.path.join(model_dir, f'student_{model_suffix}.pkl'))
+        self._entries[model_id] = {
+            'dir': model_dir,
+            'suffix': model_suffix,
+            'tiers': list(TIERS) if has_student else ['full'],
+            # Resident size is approximated by the artifact size on disk
+            'bytes': sum(artifact_bytes(path) for path in paths)
+        }
+        self._load_locks[model_id] = threading.Lock()
+
+    def clear(self):
+        """Forget every registered and loaded model (used before a reload)"""
+        with self._lock:
+            self._entries.clear()
+            self._resident.clear()
+            self._load_locks.clear()
+        if self.cache is not None:
+            self.cache.clear()
+
+    def snapshot(self):
+        """Registered and loaded models, to restore() when a reload fails"""
+        with self._lock:
+            return dict(self._entries), OrderedDict(self._resident), dict(self._load_locks)
+
+    def restore(self, state):
+        """Bring back the models of a snapshot()"""
+        entries, resident, load_locks = state
+        with self._lock:
+            self._entries = dict(entries)
+            self._resident = OrderedDict(resident)
+            self._load_locks = dict(load_locks)
+
+    def __contains__(self, model_id):
+        return model_id in self._entries
+
+    def tiers(self, model_id):
+        """Inference tiers a variant can serve ('fast'/'cascade' need a distilled student)"""
+        return self._entries[model_id]['tiers']
+
+    def is_resident(self, model_id):
+        return model_id in self._resident
+
+    def resident_services(self):
+        """Snapshot of the loaded services (without touching LRU order)"""
+        with self._lock:
+            return dict(self._resident)
+
+    def resident_bytes(self):
+        return sum(self._entries[model_id]['bytes'] for model_id in self._resident)
+
+    def get(self, model_id):
+        """Return the service of a variant, loading it on first use"""
+        with self._lock:
+            service = self._resident.get(model_id)
+            if service is not None:
+                self._resident.move_to_end(model_id)
+                self.stats['hits'] += 1
+                return service
+
+        # One loader per variant; other variants keep being served meanwhile
+        with self._load_locks[model_id]:
+            with self._lock:
+                service = self._resident.get(model_id)
+                if service is not None:
+                    self._resident.move_to_end(model_id)
+                    self.stats['hits'] += 1
+                    return service
+
+            entry = self._entries[model_id]
+            start = time.time()
+            if self.cache is not None:
+                # Results of a previously loaded copy of the artifacts are stale
+                self.cache.invalidate(model_id)
+            service = StrokePredictionService(
+                model_dir=entry['dir'], model_suffix=entry['suffix'],
+                cache=self.cache, model_id=model_id
+            )
+            print(f"📦 Loaded model '{model_id}' in {time.time() - start:.2f}s "
+                  f"({entry['bytes'] / 1024**2:.1f} MB; process {format_memory(process_memory())})")
+
+            with self._lock:
+                self._resident[model_id] = service
+                self.stats['loads'] += 1
+                self._evict()
+        return service
+
+    def preload(self, model_ids=None, workers=PRELOAD_WORKERS):
+        """
+        Load several variants concurrently (up to the residency limits)
+        and print per-artifact load times and the total time to ready
+        Returns: dict of model_id -> per-artifact load times (None on failure)
+        """
+        model_ids = list(self._entries) if model_ids is None else list(model_ids)
+        if self.max_models and len(model_ids) > self.max_models:
+            print(f"⚠️  Preloading the first {self.max_models} of {len(model_ids)} models "
+                  f"(MAX_RESIDENT_MODELS)")
+            model_ids = model_ids[:self.max_models]
+
+        def load(model_id):
+            try:
+                return self.get(model_id).load_times
+            except Exception as e:
+                print(f"❌ Failed to load '{model_id}': {e}")
+                return None
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            report = dict(zip(model_ids, executor.map(load, model_ids)))
+        elapsed = time.time() - start
+
+        print("\nArtifact load times:")
+        for model_id, load_times in report.items():
+            if load_times:
+                for filename, seconds in load_times.items():
+                    print(f"  {model_id:<22} {filename:<50} {seconds:6.2f}s")
+        print(f"⏱️  {sum(1 for t in report.values() if t)}/{len(report)} models ready in {elapsed:.2f}s "
+              f"({format_memory(process_memory())})")
+        return report
+
+    def _evict(self):
+        """Drop least recently used models until within the limits (keeps the newest)"""
+        while len(self._resident) > 1 and (
+            (self.max_models and len(self._resident) > self.max_models)
+            or (self.max_bytes and self.resident_bytes() > self.max_bytes)
+        ):
+            model_id, _ = self._resident.popitem(last=False)
+            self.stats['evictions'] += 1
+            print(f"♻️  Evicted model '{model_id}' (least recently used)")
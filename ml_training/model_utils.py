@@ -5,7 +5,17 @@ import numpy as np
 import pandas as pd
 import joblib
 import os
-from sklearn.model_selection import StratifiedKFold, RandomizedSearchCV
+import shutil
+import tempfile
+import time
+import warnings
+from contextlib import contextmanager
+from joblib import Parallel, delayed, parallel_config
+from sklearn.base import clone
+from sklearn.dummy import DummyClassifier
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils import Bunch
+from sklearn.model_selection import StratifiedKFold, ParameterSampler, train_test_split
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, 
     f1_score, roc_auc_score, confusion_matrix
@@ -16,16 +26,23 @@ from sklearn.ensemble import (
     RandomForestClassifier, GradientBoostingClassifier,
     StackingClassifier, VotingClassifier
 )
-from lightgbm import LGBMClassifier
+from lightgbm import LGBMClassifier, early_stopping as lgb_early_stopping
 from xgboost import XGBClassifier
 from catboost import CatBoostClassifier
 from ngboost import NGBClassifier
 from imblearn.ensemble import BalancedBaggingClassifier
+from tuning_store import TuningStore, dataset_fingerprint
 from config import *
 
 
+def get_n_jobs():
+    """Thread budget per estimator (STROKE_N_JOBS overrides config.N_JOBS)"""
+    return int(os.environ.get(N_JOBS_ENV_VAR, N_JOBS))
+
+
 def get_base_models():
     """Return dictionary of base classification models"""
+    n_jobs = get_n_jobs()
     models = {
         'LR-AGD': LogisticRegression(solver='saga', max_iter=100, random_state=SEED),
         
@@ -37,7 +54,8 @@ def get_base_models():
         
         'Random Forest': RandomForestClassifier(
             n_estimators=100,
-            random_state=SEED
+            random_state=SEED,
+            n_jobs=n_jobs
         ),
         
         'Gradient Boosting': GradientBoostingClassifier(
@@ -48,25 +66,29 @@ def get_base_models():
         'CatBoost': CatBoostClassifier(
             iterations=100,
             random_state=SEED,
-            verbose=0
+            verbose=0,
+            thread_count=n_jobs
         ),
         
         'LightGBM': LGBMClassifier(
             n_estimators=100,
             random_state=SEED,
-            verbose=-1
+            verbose=-1,
+            n_jobs=n_jobs
         ),
         
         'XGBoost': XGBClassifier(
             n_estimators=100,
             random_state=SEED,
-            eval_metric='logloss'
+            eval_metric='logloss',
+            n_jobs=n_jobs
         ),
         
         'Balanced Bagging': BalancedBaggingClassifier(
             estimator=RandomForestClassifier(random_state=SEED),
             n_estimators=5,
-            random_state=SEED
+            random_state=SEED,
+            n_jobs=n_jobs
         ),
         
 
@@ -74,51 +96,110 @@ def get_base_models():
     return models
 
 
-def evaluate_model_kfold(model, X, y, k=K_FOLD, model_name="Model"):
+def _single_threaded(model):
+    """Copy of model whose own thread pools (n_jobs / thread_count) use one core"""
+    model = clone(model)
+    params = {
+        name: 1 for name in model.get_params()
+        if name.split('__')[-1] in ('n_jobs', 'thread_count')
+    }
+    return model.set_params(**params)
+
+
+def _fit_score_fold(model, X, y, columns, train_idx, val_idx):
+    """Fit a fresh copy of model on one CV fold and score it on the held-out part"""
+    model = _single_threaded(model)
+    X_fold_train = pd.DataFrame(X[train_idx], columns=columns)
+    X_fold_val = pd.DataFrame(X[val_idx], columns=columns)
+    y_fold_train, y_fold_val = y[train_idx], y[val_idx]
+    
+    # Train model
+    model.fit(X_fold_train, y_fold_train)
+    
+    # Predict
+    y_pred = model.predict(X_fold_val)
+    y_pred_proba = model.predict_proba(X_fold_val)[:, 1] if hasattr(model, 'predict_proba') else y_pred
+    
+    # Calculate metrics
+    scores = {
+        'accuracy': accuracy_score(y_fold_val, y_pred),
+        'precision': precision_score(y_fold_val, y_pred, zero_division=0),
+        'recall': recall_score(y_fold_val, y_pred, zero_division=0),
+        'f1': f1_score(y_fold_val, y_pred, zero_division=0)
+    }
+    try:
+        scores['auc'] = roc_auc_score(y_fold_val, y_pred_proba)
+    except:
+        scores['auc'] = 0
+    return scores
+
+
+@contextmanager
+def shared_training_matrix(X, y):
     """
-    Evaluate model using k-fold cross validation
+    Dump (X, y) once to a temporary file and yield read-only memory maps of it,
+    so process pool workers share the pages instead of receiving a pickled copy
     """
+    folder = tempfile.mkdtemp(prefix='stroke_cv_')
+    try:
+        path = os.path.join(folder, 'training_matrix.joblib')
+        joblib.dump((X, y), path)
+        yield joblib.load(path, mmap_mode='r')
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def evaluate_models_kfold(named_models, X, y, k=K_FOLD, n_jobs=None):
+    """
+    Evaluate several models using k-fold cross validation
+    Every (model, fold) pair runs as one task on a process pool; results are
+    identical to fitting the folds one after another
+    Returns: list of result dicts, in the order of named_models
+    """
+    n_jobs = get_n_jobs() if n_jobs is None else n_jobs
     skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=SEED)
+    splits = list(skf.split(X, y))
+    columns = X.columns
+    X_values = X.to_numpy(dtype=np.float64)
+    y_values = y.to_numpy()
     
-    accuracy_scores = []
-    precision_scores = []
-    recall_scores = []
-    f1_scores = []
-    auc_scores = []
+    if n_jobs == 1:
+        fold_scores = [
+            _fit_score_fold(model, X_values, y_values, columns, train_idx, val_idx)
+            for _, model in named_models
+            for train_idx, val_idx in splits
+        ]
+    else:
+        with shared_training_matrix(X_values, y_values) as (X_shared, y_shared), \
+                parallel_config(backend='loky', inner_max_num_threads=1):
+            fold_scores = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_score_fold)(model, X_shared, y_shared, columns, train_idx, val_idx)
+                for _, model in named_models
+                for train_idx, val_idx in splits
+            )
     
-    for train_idx, val_idx in skf.split(X, y):
-        X_fold_train, X_fold_val = X.iloc[train_idx], X.iloc[val_idx]
-        y_fold_train, y_fold_val = y.iloc[train_idx], y.iloc[val_idx]
-        
-        # Train model
-        model.fit(X_fold_train, y_fold_train)
-        
-        # Predict
-        y_pred = model.predict(X_fold_val)
-        y_pred_proba = model.predict_proba(X_fold_val)[:, 1] if hasattr(model, 'predict_proba') else y_pred
-        
-        # Calculate metrics
-        accuracy_scores.append(accuracy_score(y_fold_val, y_pred))
-        precision_scores.append(precision_score(y_fold_val, y_pred, zero_division=0))
-        recall_scores.append(recall_score(y_fold_val, y_pred, zero_division=0))
-        f1_scores.append(f1_score(y_fold_val, y_pred, zero_division=0))
-        
-        try:
-            auc_scores.append(roc_auc_score(y_fold_val, y_pred_proba))
-        except:
-            auc_scores.append(0)
-    
-    results = {
-        'Model': model_name,
-        'Accuracy': np.mean(accuracy_scores),
-        'Precision': np.mean(precision_scores),
-        'Recall': np.mean(recall_scores),
-        'F1-Score': np.mean(f1_scores),
-        'AUC': np.mean(auc_scores),
-        'Accuracy_std': np.std(accuracy_scores)
-    }
+    all_results = []
+    for i, (model_name, _) in enumerate(named_models):
+        folds = fold_scores[i * k:(i + 1) * k]
+        accuracy_scores = [s['accuracy'] for s in folds]
+        all_results.append({
+            'Model': model_name,
+            'Accuracy': np.mean(accuracy_scores),
+            'Precision': np.mean([s['precision'] for s in folds]),
+            'Recall': np.mean([s['recall'] for s in folds]),
+            'F1-Score': np.mean([s['f1'] for s in folds]),
+            'AUC': np.mean([s['auc'] for s in folds]),
+            'Accuracy_std': np.std(accuracy_scores)
+        })
     
-    return results
+    return all_results
+
+
+def evaluate_model_kfold(model, X, y, k=K_FOLD, model_name="Model", n_jobs=None):
+    """
+    Evaluate model using k-fold cross validation
+    """
+    return evaluate_models_kfold([(model_name, model)], X, y, k=k, n_jobs=n_jobs)[0]
 
 
 def train_all_models(X_train, y_train):
@@ -126,27 +207,16 @@ def train_all_models(X_train, y_train):
     Train all base models and return results
     """
     models = get_base_models()
-    all_results = []
     
-    # Train baseline
-    print("Training Baseline Logistic Regression...")
+    # Baseline and all models share one pool of (model, fold) tasks
     baseline_model = LogisticRegression(random_state=SEED, max_iter=1000)
-    baseline_results = evaluate_model_kfold(
-        baseline_model, X_train, y_train, 
-        k=K_FOLD, model_name="Baseline LR"
-    )
-    all_results.append(baseline_results)
-    print(f"Baseline Accuracy: {baseline_results['Accuracy']:.4f}")
-    
-    # Train all models
-    for model_name, model in models.items():
-        print(f"\nTraining {model_name}...")
-        results = evaluate_model_kfold(
-            model, X_train, y_train,
-            k=K_FOLD, model_name=model_name
-        )
-        all_results.append(results)
-        print(f"Accuracy: {results['Accuracy']:.4f}")
+    named_models = [("Baseline LR", baseline_model)] + list(models.items())
+    print(f"Training {len(named_models)} models x {K_FOLD} folds "
+          f"(n_jobs={get_n_jobs()})...")
+    all_results = evaluate_models_kfold(named_models, X_train, y_train, k=K_FOLD)
+    
+    for results in all_results:
+        print(f"{results['Model']} Accuracy: {results['Accuracy']:.4f}")
     
     # Create results DataFrame
     results_df = pd.DataFrame(all_results)
@@ -155,38 +225,484 @@ def train_all_models(X_train, y_train):
     return results_df, models
 
 
-def fine_tune_top_models(top_models, models_dict, X_train, y_train):
+def get_tuning_mode():
+    """Tuning mode: 'random' or 'halving' (STROKE_TUNING_MODE overrides config)"""
+    return os.environ.get(TUNING_MODE_ENV_VAR, TUNING_MODE)
+
+
+def _fit_with_early_stopping(model, model_name, X, y):
     """
-    Fine-tune top performing models using RandomizedSearchCV
+    Fit model; boosting libraries stop early on a stratified holdout of the rows
+    Returns: (fitted model, boosting rounds actually used or None)
     """
+    if model_name == 'Gradient Boosting':
+        model.set_params(
+            n_iter_no_change=EARLY_STOPPING_ROUNDS,
+            validation_fraction=EARLY_STOPPING_FRACTION
+        )
+        model.fit(X, y)
+        return model, model.n_estimators_
+    
+    if model_name not in ('XGBoost', 'LightGBM', 'CatBoost'):
+        model.fit(X, y)
+        return model, None
+    
+    X_fit, X_stop, y_fit, y_stop = train_test_split(
+        X, y, test_size=EARLY_STOPPING_FRACTION, stratify=y, random_state=SEED
+    )
+    if model_name == 'XGBoost':
+        model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        model.fit(X_fit, y_fit, eval_set=[(X_stop, y_stop)], verbose=False)
+        return model, model.best_iteration + 1
+    if model_name == 'LightGBM':
+        # eval_set works on every supported LightGBM (newer ones deprecate it)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model.fit(
+                X_fit, y_fit, eval_set=[(X_stop, y_stop)],
+                callbacks=[lgb_early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)]
+            )
+        return model, model.best_iteration_ or model.n_estimators
+    model.fit(X_fit, y_fit, eval_set=(X_stop, y_stop), early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    return model, model.get_best_iteration() + 1
+
+
+def _trial_fold_score(model, model_name, params, early_stopping, X, y, columns, train_idx, val_idx):
+    """Fit one candidate on one CV fold; return (f1, boosting rounds, fit time)"""
+    model = _single_threaded(model).set_params(**params)
+    X_fold_train = pd.DataFrame(X[train_idx], columns=columns)
+    start = time.time()
+    try:
+        if early_stopping:
+            model, rounds = _fit_with_early_stopping(model, model_name, X_fold_train, y[train_idx])
+        else:
+            model.fit(X_fold_train, y[train_idx])
+            rounds = None
+    except Exception:
+        # Failed fits score NaN, like error_score=np.nan in the sklearn searches
+        return np.nan, None, time.time() - start
+    fit_time = time.time() - start
+    y_pred = model.predict(pd.DataFrame(X[val_idx], columns=columns))
+    return f1_score(y[val_idx], y_pred, zero_division=0), rounds, fit_time
+
+
+def _run_trials(model, model_name, trial_params, splits, X, y, columns, n_jobs,
+                early_stopping=False, resource=0, study=None):
+    """
+    Cross-validate candidate params on a process pool
+    Trials already in the study store are reused; new ones are recorded as soon
+    as all their folds finish, so an interrupted search resumes where it stopped
+    Returns: one entry dict per candidate, in order
+    """
+    entries = [None] * len(trial_params)
+    pending = []
+    for i, params in enumerate(trial_params):
+        cached = study['store'].lookup(study['key'], params, resource) if study else None
+        if cached is not None:
+            entries[i] = dict(cached, params=params, cached=True)
+        else:
+            pending.append(i)
+    
+    cv = len(splits)
+    results = Parallel(n_jobs=n_jobs, return_as='generator')(
+        delayed(_trial_fold_score)(
+            model, model_name, trial_params[i], early_stopping, X, y, columns, train_idx, val_idx
+        )
+        for i in pending
+        for train_idx, val_idx in splits
+    )
+    
+    pending_iter = iter(pending)
+    folds = []
+    for result in results:
+        folds.append(result)
+        if len(folds) < cv:
+            continue
+        i = next(pending_iter)
+        fold_scores = [score for score, _, _ in folds]
+        rounds = [r for _, r, _ in folds if r is not None]
+        entry = {
+            'params': trial_params[i],
+            'score': float(np.mean(fold_scores)),
+            'fold_scores': fold_scores,
+            'rounds': int(np.median(rounds)) if rounds else None,
+            'fit_time': float(sum(t for _, _, t in folds)),
+            'cached': False
+        }
+        if study:
+            study['store'].record(
+                study['key'], study['variant'], model_name, study['dataset'],
+                study['mode'], entry['params'], resource, fold_scores,
+                entry['rounds'], entry['fit_time']
+            )
+        entries[i] = entry
+        folds = []
+    
+    return entries
+
+
+def _rank_trials(entries):
+    """Entries sorted best first (NaN scores last, ties keep candidate order)"""
+    return sorted(entries, key=lambda e: -e['score'] if not np.isnan(e['score']) else np.inf)
+
+
+def _warm_start_candidates(study, param_grid):
+    """Best known params from earlier studies that fit the current grid's keys"""
+    if not study:
+        return []
+    warm = []
+    for params in study['store'].best_known_params(study['variant'], study['model_name'], study['key']):
+        params = {k: v for k, v in params.items() if k in param_grid}
+        if set(params) == set(param_grid):
+            warm.append(params)
+    return warm
+
+
+def _with_candidates(warm, sampled):
+    """Warm-start candidates first, then sampled ones, without duplicates"""
+    candidates = []
+    for params in warm + sampled:
+        if params not in candidates:
+            candidates.append(params)
+    return candidates
+
+
+def random_search(model, model_name, param_grid, X, y, n_iter=10, cv=3, n_jobs=None, study=None):
+    """
+    Randomized search scored like RandomizedSearchCV(scoring='f1', cv=cv),
+    with trials persisted to and reused from the study store
+    Returns: dict with best_params, best_score, n_fits, n_cached, elapsed, history
+    """
+    n_jobs = get_n_jobs() if n_jobs is None else n_jobs
+    start = time.time()
+    candidates = _with_candidates(
+        _warm_start_candidates(study, param_grid),
+        list(ParameterSampler(param_grid, n_iter=n_iter, random_state=SEED))
+    )
+    y_values = np.asarray(y)
+    X_values = X.to_numpy(dtype=np.float64)
+    splits = list(StratifiedKFold(n_splits=cv).split(X_values, y_values))
+    
+    with shared_training_matrix(X_values, y_values) as (X_shared, y_shared), \
+            parallel_config(backend='loky', inner_max_num_threads=1):
+        entries = _run_trials(
+            model, model_name, candidates, splits, X_shared, y_shared, X.columns,
+            n_jobs, study=study
+        )
+    
+    best = _rank_trials(entries)[0]
+    n_cached = sum(e['cached'] for e in entries)
+    return {
+        'best_params': dict(best['params']),
+        'best_score': best['score'],
+        'n_fits': (len(entries) - n_cached) * cv,
+        'n_cached': n_cached,
+        'elapsed': time.time() - start,
+        'history': entries
+    }
+
+
+def successive_halving_search(model, model_name, param_grid, X, y, cv=3, n_jobs=None, study=None):
+    """
+    Budget-aware successive halving over a parameter grid
+    
+    Candidates sampled from param_grid are scored (F1, stratified cv) on a small
+    resource, the best 1/HALVING_FACTOR move on to a HALVING_FACTOR times larger
+    resource, until one remains or TUNING_BUDGET (fits / seconds) runs out.
+    The resource is n_estimators or a stratified row sample (HALVING_RESOURCE).
+    Returns: dict with best_params, best_score, n_fits, n_cached, elapsed, history
+    """
+    n_jobs = get_n_jobs() if n_jobs is None else n_jobs
+    resource = HALVING_RESOURCE.get(model_name, 'n_samples')
+    grid = dict(param_grid)
+    y_values = np.asarray(y)
+    
+    if resource == 'n_estimators':
+        max_resource = max(grid.pop('n_estimators', [model.get_params()['n_estimators']]))
+        min_resource = min(HALVING_MIN_RESOURCE['n_estimators'], max_resource)
+    else:
+        max_resource = len(y_values)
+        min_resource = min(int(HALVING_MIN_RESOURCE['n_samples'] * max_resource), max_resource)
+    
+    n_grid = int(np.prod([len(values) for values in grid.values()])) if grid else 1
+    candidates = _with_candidates(
+        _warm_start_candidates(study, grid),
+        list(ParameterSampler(grid, n_iter=min(HALVING_CANDIDATES, n_grid), random_state=SEED))
+    )
+    n_rungs = 1 + min(
+        int(np.floor(np.log(max_resource / min_resource) / np.log(HALVING_FACTOR))),
+        int(np.ceil(np.log(len(candidates)) / np.log(HALVING_FACTOR)))
+    )
+    
+    max_fits = TUNING_BUDGET.get('max_fits')
+    max_seconds = TUNING_BUDGET.get('max_seconds')
+    X_values = X.to_numpy(dtype=np.float64)
+    start = time.time()
+    n_fits = 0
+    n_cached = 0
+    history = []
+    ranked = None
+    
+    with shared_training_matrix(X_values, y_values) as (X_shared, y_shared), \
+            parallel_config(backend='loky', inner_max_num_threads=1):
+        for rung in range(n_rungs):
+            amount = int(max_resource / HALVING_FACTOR ** (n_rungs - 1 - rung))
+            
+            if max_seconds is not None and time.time() - start >= max_seconds:
+                print(f"  Time budget reached before rung {rung + 1}/{n_rungs}")
+                break
+            if max_fits is not None:
+                affordable = (max_fits - n_fits) // cv
+                if affordable < 1:
+                    print(f"  Fit budget reached before rung {rung + 1}/{n_rungs}")
+                    break
+                candidates = candidates[:affordable]
+            
+            rows = np.arange(len(y_values))
+            if resource == 'n_estimators':
+                rung_params = [dict(params, n_estimators=amount) for params in candidates]
+            else:
+                rung_params = candidates
+                if amount < len(y_values):
+                    rows, _ = train_test_split(
+                        rows, train_size=amount, stratify=y_values, random_state=SEED
+                    )
+                    rows = np.sort(rows)
+            splits = [
+                (rows[train_idx], rows[val_idx])
+                for train_idx, val_idx in StratifiedKFold(n_splits=cv).split(rows, y_values[rows])
+            ]
+            
+            entries = _run_trials(
+                model, model_name, rung_params, splits, X_shared, y_shared, X.columns,
+                n_jobs, early_stopping=True, resource=amount, study=study
+            )
+            rung_cached = sum(e['cached'] for e in entries)
+            n_cached += rung_cached
+            n_fits += (len(entries) - rung_cached) * cv
+            for entry in entries:
+                history.append(dict(entry, rung=rung, resource=amount))
+            
+            ranked = _rank_trials(entries)
+            print(f"  Rung {rung + 1}/{n_rungs}: {len(rung_params)} candidates x "
+                  f"{resource}={amount}, best F1 {ranked[0]['score']:.4f}")
+            
+            n_keep = max(1, int(np.ceil(len(ranked) / HALVING_FACTOR)))
+            candidates = [candidates[rung_params.index(e['params'])] for e in ranked[:n_keep]]
+            if len(ranked) == 1:
+                break
+    
+    if ranked is None:
+        raise RuntimeError(f"Tuning budget too small to evaluate any {model_name} candidate")
+    
+    best = ranked[0]
+    best_params = dict(best['params'])
+    if best['rounds'] is not None:
+        # Early stopping decides how many boosting rounds the final model gets
+        best_params['n_estimators'] = best['rounds']
+    
+    return {
+        'best_params': best_params,
+        'best_score': best['score'],
+        'n_fits': n_fits,
+        'n_cached': n_cached,
+        'elapsed': time.time() - start,
+        'history': history
+    }
+
+
+def fine_tune_top_models(top_models, models_dict, X_train, y_train, mode=None, variant=None):
+    """
+    Fine-tune top performing models with a randomized search ('random' mode)
+    or budget-aware successive halving ('halving' mode)
+    When a variant is given, trials are persisted in the SQLite study store
+    (TUNING_DB_PATH) keyed by variant, model name and dataset fingerprint
+    """
+    mode = mode or get_tuning_mode()
     tuned_models = {}
+    store = TuningStore() if variant else None
+    dataset = dataset_fingerprint(X_train, y_train) if variant else None
     
     for model_name in top_models:
         if model_name in PARAM_GRIDS and model_name in models_dict:
-            print(f"\nFine-tuning {model_name}...")
+            print(f"\nFine-tuning {model_name} ({mode})...")
+            model = models_dict[model_name]
             
-            random_search = RandomizedSearchCV(
-                models_dict[model_name],
-                PARAM_GRIDS[model_name],
-                n_iter=10,
-                cv=3,
-                scoring='f1',
-                random_state=SEED,
-                n_jobs=-1
-            )
+            study = None
+            if store:
+                study = {
+                    'store': store,
+                    'key': TuningStore.study_key(variant, model_name, dataset, mode, model),
+                    'variant': variant,
+                    'model_name': model_name,
+                    'dataset': dataset,
+                    'mode': mode
+                }
             
-            random_search.fit(X_train, y_train)
-            tuned_models[model_name] = random_search.best_estimator_
+            search_fn = successive_halving_search if mode == 'halving' else random_search
+            search = search_fn(model, model_name, PARAM_GRIDS[model_name], X_train, y_train, study=study)
+            tuned_models[model_name] = clone(model).set_params(
+                **search['best_params']
+            ).fit(X_train, y_train)
             
-            print(f"Best parameters: {random_search.best_params_}")
-            print(f"Best CV score: {random_search.best_score_:.4f}")
+            print(f"Best parameters: {search['best_params']}")
+            print(f"Best CV score: {search['best_score']:.4f} "
+                  f"({search['n_fits']} fits, {search['n_cached']} trials reused, "
+                  f"{search['elapsed']:.1f}s)")
+    
+    if store:
+        store.close()
     
     return tuned_models
 
 
-def build_dse_ensemble(base_models_for_ensemble, meta_classifier, X_train, y_train):
+def _fit_predict_proba(model, X, y, columns, train_idx, pred_idx):
+    """Fit a fresh single-threaded copy of model on train rows, predict_proba on pred rows"""
+    model = _single_threaded(model)
+    model.fit(pd.DataFrame(X[train_idx], columns=columns), y[train_idx])
+    return model.predict_proba(pd.DataFrame(X[pred_idx], columns=columns))
+
+
+def compute_oof_cache(base_models, X, y, cv=5, n_jobs=None):
+    """
+    Fit every base learner once per fold split and cache its probabilities
+    
+    Mirrors the splits StackingClassifier(cv=cv) uses at both levels of the DSE:
+      - 'full':  learners fitted on all rows (used for inference)
+      - 'oof':   out-of-fold probabilities over the outer StratifiedKFold(cv)
+      - 'inner': per outer fold, out-of-fold probabilities over a
+                 StratifiedKFold(cv) of that fold's training rows
+    Returns: dict with 'names', 'full', 'oof', 'inner', 'splits', 'y'
+    """
+    n_jobs = get_n_jobs() if n_jobs is None else n_jobs
+    names = [name for name, _ in base_models]
+    columns = X.columns
+    X_values = X.to_numpy(dtype=np.float64)
+    y_values = LabelEncoder().fit_transform(y)
+    
+    splitter = StratifiedKFold(n_splits=cv)
+    splits = list(splitter.split(X_values, y_values))
+    inner_splits = [
+        [(train_idx[t], train_idx[v]) for t, v in splitter.split(X_values[train_idx], y_values[train_idx])]
+        for train_idx, _ in splits
+    ]
+    
+    # One task per (learner, outer fold) and (learner, outer fold, inner fold)
+    tasks = []
+    for name, model in base_models:
+        for k, (train_idx, val_idx) in enumerate(splits):
+            tasks.append((name, k, None, model, train_idx, val_idx))
+            for j, (inner_train, inner_val) in enumerate(inner_splits[k]):
+                tasks.append((name, k, j, model, inner_train, inner_val))
+    
+    print(f"Caching out-of-fold probabilities: {len(tasks)} fold fits "
+          f"for {len(names)} learners (n_jobs={n_jobs})...")
+    if n_jobs == 1:
+        probas = [
+            _fit_predict_proba(model, X_values, y_values, columns, train_idx, pred_idx)
+            for _, _, _, model, train_idx, pred_idx in tasks
+        ]
+    else:
+        with shared_training_matrix(X_values, y_values) as (X_shared, y_shared), \
+                parallel_config(backend='loky', inner_max_num_threads=1):
+            probas = Parallel(n_jobs=n_jobs)(
+                delayed(_fit_predict_proba)(model, X_shared, y_shared, columns, train_idx, pred_idx)
+                for _, _, _, model, train_idx, pred_idx in tasks
+            )
+    
+    oof = {name: np.zeros((len(y_values), 2)) for name in names}
+    inner = [
+        {name: np.zeros((len(train_idx), 2)) for name in names}
+        for train_idx, _ in splits
+    ]
+    for (name, k, j, _, _, pred_idx), proba in zip(tasks, probas):
+        if j is None:
+            oof[name][pred_idx] = proba
+        else:
+            # Position of the inner validation rows within the outer training rows
+            local_idx = np.searchsorted(splits[k][0], pred_idx)
+            inner[k][name][local_idx] = proba
+    
+    # Learners used at inference time keep their own thread settings
+    print("Fitting base learners on the full training set...")
+    full = {name: clone(model).fit(X, y_values) for name, model in base_models}
+    
+    return {
+        'names': names, 'full': full, 'oof': oof, 'inner': inner,
+        'splits': splits, 'y': y_values
+    }
+
+
+def _stack_features(probas, X=None):
+    """Meta features as StackingClassifier builds them (binary: drop column 0)"""
+    X_meta = [proba[:, 1:] for proba in probas]
+    if X is not None:
+        X_meta.append(X)
+    return np.hstack(X_meta)
+
+
+def _prefit_voting(estimators, fitted, y):
+    """Soft VotingClassifier around already fitted estimators"""
+    voting = VotingClassifier(estimators=estimators, voting='soft')
+    voting.le_ = LabelEncoder().fit(y)
+    voting.classes_ = voting.le_.classes_
+    voting.estimators_ = list(fitted)
+    voting.named_estimators_ = Bunch(**{name: est for (name, _), est in zip(estimators, fitted)})
+    if hasattr(fitted[0], 'feature_names_in_'):
+        voting.feature_names_in_ = fitted[0].feature_names_in_
+    return voting
+
+
+def _prefit_stacking(estimators, fitted, final_estimator, fitted_final, X, y, cv=5, passthrough=False):
+    """
+    StackingClassifier(cv=cv) around already fitted estimators and meta-learner
+    sklearn sets up the fitted attributes through cv='prefit' (with a throwaway
+    dummy meta-learner); the meta-learner fitted on cached OOF features replaces it
+    """
+    stacking = StackingClassifier(
+        estimators=[(name, est) for (name, _), est in zip(estimators, fitted)],
+        final_estimator=DummyClassifier(),
+        cv='prefit',
+        passthrough=passthrough
+    )
+    stacking.fit(X, y)
+    stacking.set_params(estimators=estimators, final_estimator=final_estimator, cv=cv)
+    stacking.final_estimator_ = fitted_final
+    return stacking
+
+
+def _ensemble_oof(oof_cache, names, meta_classifier, X_train):
+    """
+    Out-of-fold probabilities of the voting, blending and fusion ensembles
+    over the outer folds: an ensemble fitted on fold k uses the learners
+    fitted on fold k, whose held-out probabilities are the cached OOF rows
+    """
+    y = oof_cache['y']
+    oof = [oof_cache['oof'][name] for name in names]
+    ensemble_oof = [np.zeros((len(y), 2)) for _ in range(3)]
+    for k, (train_idx, val_idx) in enumerate(oof_cache['splits']):
+        inner = [oof_cache['inner'][k][name] for name in names]
+        held_out = [proba[val_idx] for proba in oof]
+        X_fold_train = X_train.iloc[train_idx]
+        X_fold_val = X_train.iloc[val_idx]
+        
+        ensemble_oof[0][val_idx] = np.average(np.asarray(held_out), axis=0)
+        
+        fold_blending = clone(meta_classifier).fit(_stack_features(inner), y[train_idx])
+        ensemble_oof[1][val_idx] = fold_blending.predict_proba(_stack_features(held_out))
+        
+        fold_fusion = clone(meta_classifier).fit(_stack_features(inner, X_fold_train), y[train_idx])
+        ensemble_oof[2][val_idx] = fold_fusion.predict_proba(_stack_features(held_out, X_fold_val))
+    return ensemble_oof
+
+
+def build_dse_ensemble(base_models_for_ensemble, meta_classifier, X_train, y_train, oof_cache=None):
     """
     Build Dense Stacking Ensemble (DSE) model
+    
+    Every layer is assembled from one cache of base learner out-of-fold
+    probabilities instead of refitting the learners inside each ensemble; the
+    result is equivalent to fitting the nested Voting/Stacking estimators directly
     """
     print("\n=== Building Dense Stacking Ensemble (DSE) ===")
     
@@ -195,52 +711,182 @@ def build_dse_ensemble(base_models_for_ensemble, meta_classifier, X_train, y_tra
         (name, model) for name, model in base_models_for_ensemble 
         if name != 'NGBoost'
     ]
+    names = [name for name, _ in base_models_filtered]
+    
+    if oof_cache is None:
+        oof_cache = compute_oof_cache(base_models_filtered, X_train, y_train)
+    full = [oof_cache['full'][name] for name in names]
+    oof = [oof_cache['oof'][name] for name in names]
+    y = oof_cache['y']
     
     # 1. Voting Ensemble
     print("Building Voting Ensemble...")
-    voting_ensemble = VotingClassifier(
-        estimators=base_models_filtered,
-        voting='soft'
-    )
-    voting_ensemble.fit(X_train, y_train)
+    voting_ensemble = _prefit_voting(base_models_filtered, full, y)
     
     # 2. Blending Ensemble
     print("Building Blending Ensemble...")
-    blending_ensemble = StackingClassifier(
-        estimators=base_models_filtered,
-        final_estimator=meta_classifier,
-        cv=5
+    blending_meta = clone(meta_classifier).fit(_stack_features(oof), y)
+    blending_ensemble = _prefit_stacking(
+        base_models_filtered, full, meta_classifier, blending_meta, X_train, y
     )
-    blending_ensemble.fit(X_train, y_train)
     
     # 3. Fusion Ensemble
     print("Building Fusion Ensemble...")
-    fusion_ensemble = StackingClassifier(
-        estimators=base_models_filtered,
-        final_estimator=meta_classifier,
-        cv=5,
+    fusion_meta = clone(meta_classifier).fit(_stack_features(oof, X_train), y)
+    fusion_ensemble = _prefit_stacking(
+        base_models_filtered, full, meta_classifier, fusion_meta, X_train, y,
         passthrough=True
     )
-    fusion_ensemble.fit(X_train, y_train)
     
-    # 4. Dense Stacking Ensemble (DSE)
+    # 4. Dense Stacking Ensemble (DSE), fitted on the three ensembles' OOF outputs
     print("Building DSE (Final Model)...")
+    dse_oof = _ensemble_oof(oof_cache, names, meta_classifier, X_train)
+    
     dse_base_models = [
         ('voting', voting_ensemble),
         ('blending', blending_ensemble),
         ('fusion', fusion_ensemble)
     ]
-    
-    dse_model = StackingClassifier(
-        estimators=dse_base_models,
-        final_estimator=meta_classifier,
-        cv=5
+    dse_meta = clone(meta_classifier).fit(_stack_features(dse_oof), y)
+    dse_model = _prefit_stacking(
+        dse_base_models, [voting_ensemble, blending_ensemble, fusion_ensemble],
+        meta_classifier, dse_meta, X_train, y
     )
-    dse_model.fit(X_train, y_train)
     
     return dse_model
 
 
+def is_prune():
+    """True when the STROKE_PRUNE environment switch (or config) enables pruning"""
+    default = '1' if PRUNE_ENSEMBLE else '0'
+    return os.environ.get(PRUNE_ENV_VAR, default).lower() in ('1', 'true', 'yes')
+
+
+def base_learner_latency(fitted, X, rows=PRUNE_LATENCY_ROWS):
+    """
+    Median single-row predict_proba milliseconds of each fitted learner, run
+    as the API runs it (packed NumPy trees when the tree engine compiles it)
+    """
+    from tree_engine import compile_tree_models
+    
+    sample = X.iloc[:rows]
+    latency = {}
+    for name, model in fitted.items():
+        packed = None
+        if TREE_ENGINE:
+            packed, _ = compile_tree_models([model], X.shape[1], verbose=False)
+        times = []
+        for i in range(len(sample)):
+            row = sample.iloc[i:i + 1]
+            start = time.perf_counter()
+            if packed is not None:
+                packed.predict_proba(row.to_numpy(dtype=np.float64))
+            else:
+                model.predict_proba(row)
+            times.append(time.perf_counter() - start)
+        latency[name] = float(np.median(times)) * 1000
+    return latency
+
+
+def _subset_scores(oof_cache, names, meta_classifier, X_train):
+    """
+    Out-of-fold AUC and F1 of the DSE on a learner subset: its meta-learner
+    is refitted per outer fold on the level-1 ensembles' OOF probabilities,
+    as build_dse_ensemble fits it on all of them
+    """
+    y = oof_cache['y']
+    dse_features = _stack_features(_ensemble_oof(oof_cache, names, meta_classifier, X_train))
+    proba = np.zeros(len(y))
+    for train_idx, val_idx in oof_cache['splits']:
+        fold_meta = clone(meta_classifier).fit(dse_features[train_idx], y[train_idx])
+        proba[val_idx] = fold_meta.predict_proba(dse_features[val_idx])[:, 1]
+    return {
+        'auc': float(roc_auc_score(y, proba)),
+        'f1': float(f1_score(y, proba > DECISION_THRESHOLD, zero_division=0))
+    }
+
+
+def prune_base_models(base_models, meta_classifier, X_train, y_train, oof_cache=None,
+                      budget_ms=PRUNE_LATENCY_BUDGET_MS, tolerance=PRUNE_TOLERANCE):
+    """
+    Latency-aware greedy pruning of the DSE's base learners
+    
+    Each learner's single-row inference cost and marginal contribution (the
+    drop in the DSE's out-of-fold AUC/F1 without it) are measured. Learners
+    are then removed one at a time, the most expensive whose removal keeps AUC
+    and F1 within tolerance of the full ensemble first, until the summed cost
+    fits budget_ms or no removal is acceptable. The pruned DSE is checked
+    against the tolerance once more before it is accepted; otherwise every
+    learner is kept
+    Returns: report dict ('selected' holds the kept learner names)
+    """
+    print(f"\n=== Pruning base learners (budget {budget_ms:.2f}ms/row, tolerance {tolerance}) ===")
+    base_models = [(name, model) for name, model in base_models if name != 'NGBoost']
+    names = [name for name, _ in base_models]
+    if oof_cache is None:
+        oof_cache = compute_oof_cache(base_models, X_train, y_train)
+    
+    cost = base_learner_latency({name: oof_cache['full'][name] for name in names}, X_train)
+    scores = {}
+    
+    def subset_scores(subset):
+        key = tuple(subset)
+        if key not in scores:
+            scores[key] = _subset_scores(oof_cache, list(subset), meta_classifier, X_train)
+        return scores[key]
+    
+    baseline = subset_scores(names)
+    marginal = {}
+    for name in names:
+        without = subset_scores([n for n in names if n != name])
+        marginal[name] = {metric: baseline[metric] - without[metric] for metric in baseline}
+    
+    print(f"{'Learner':<20} {'ms/row':>8} {'ΔAUC':>8} {'ΔF1':>8}")
+    for name in sorted(names, key=cost.get, reverse=True):
+        print(f"{name:<20} {cost[name]:>8.3f} {marginal[name]['auc']:>+8.4f} {marginal[name]['f1']:>+8.4f}")
+    
+    def acceptable(result):
+        return all(result[metric] >= baseline[metric] - tolerance for metric in baseline)
+    
+    selected = list(names)
+    while len(selected) > 1 and sum(cost[name] for name in selected) > budget_ms:
+        candidates = [
+            name for name in selected
+            if acceptable(subset_scores([n for n in selected if n != name]))
+        ]
+        if not candidates:
+            print("⚠️  No further learner can be dropped within the accuracy tolerance")
+            break
+        dropped = max(candidates, key=cost.get)
+        selected.remove(dropped)
+        print(f"✂️  Dropped {dropped} ({cost[dropped]:.3f}ms/row)")
+    
+    pruned = subset_scores(selected)
+    accepted = acceptable(pruned)
+    if not accepted:
+        print(f"⚠️  Pruned DSE (AUC {pruned['auc']:.4f}, F1 {pruned['f1']:.4f}) is outside the "
+              f"tolerance, keeping every learner")
+        selected = list(names)
+    
+    report = {
+        'selected': selected,
+        'dropped': [name for name in names if name not in selected],
+        'latency_ms': cost,
+        'marginal': marginal,
+        'full': {'cost_ms': sum(cost.values()), **baseline},
+        'pruned': {'cost_ms': sum(cost[name] for name in selected), **subset_scores(selected)},
+        'budget_ms': budget_ms,
+        'tolerance': tolerance,
+        'accepted': accepted,
+        'within_budget': sum(cost[name] for name in selected) <= budget_ms
+    }
+    print(f"Kept {len(selected)}/{len(names)} learners: "
+          f"{report['full']['cost_ms']:.2f} -> {report['pruned']['cost_ms']:.2f}ms/row, "
+          f"DSE OOF AUC {baseline['auc']:.4f} -> {report['pruned']['auc']:.4f}, "
+          f"F1 {baseline['f1']:.4f} -> {report['pruned']['f1']:.4f}")
+    return report
+
+
 def evaluate_final_model(dse_model, X_test, y_test):
     """
     Evaluate final DSE model and print metrics
@@ -280,30 +926,48 @@ def evaluate_final_model(dse_model, X_test, y_test):
     }
 
 
-def save_model_artifacts(dse_model, scaler, encoder, X_train, folder_name, suffix):
+def save_model_artifacts(dse_model, scaler, encoder, X_train, folder_name, suffix, fmt=None):
     """
-    Save model, scaler, encoder, and feature columns
+    Save model, scaler, encoder, feature columns and the compiled tree engine
+    in the fmt layout (default config.ARTIFACT_FORMAT, see artifact_store.py)
+    Returns: list of the saved file paths
     """
+    from artifact_store import save_artifact, arrays_dir
+    from dse_engine import compile_dse_graph, save_tree_packs
+    
     os.makedirs(folder_name, exist_ok=True)
+    saved = []
     
     # Save model
     model_path = os.path.join(folder_name, f'dse_stroke_prediction_{suffix}.pkl')
-    joblib.dump(dse_model, model_path)
+    saved += save_artifact(dse_model, model_path, fmt)
     print(f"Model saved at: '{model_path}'")
     
     # Save scaler
     scaler_path = os.path.join(folder_name, f'scaler_{suffix}.pkl')
-    joblib.dump(scaler, scaler_path)
+    saved += save_artifact(scaler, scaler_path, fmt)
     print(f"Scaler saved at: '{scaler_path}'")
     
     # Save encoder
     encoder_path = os.path.join(folder_name, f'encoder_{suffix}.pkl')
-    joblib.dump(encoder, encoder_path)
+    saved += save_artifact(encoder, encoder_path, fmt)
     print(f"Encoder saved at: '{encoder_path}'")
     
     # Save model columns
     columns_path = os.path.join(folder_name, f'model_columns_{suffix}.pkl')
-    joblib.dump(X_train.columns.tolist(), columns_path)
+    saved += save_artifact(X_train.columns.tolist(), columns_path, fmt)
     print(f"Model columns saved at: '{columns_path}'")
     
+    # Save the compiled tree engine, mapped by loading processes instead of recompiled
+    engine_path = os.path.join(folder_name, f'engine_{suffix}.pkl')
+    graph = compile_dse_graph(dse_model) if TREE_ENGINE else None
+    if graph is not None and graph.packs is not None:
+        saved += save_tree_packs(graph, engine_path, model_path, fmt)
+        print(f"Tree engine saved at: '{engine_path}'")
+    elif os.path.exists(engine_path):
+        os.remove(engine_path)
+        shutil.rmtree(arrays_dir(engine_path), ignore_errors=True)
+    
     print(f"\n✅ All artifacts saved successfully in '{folder_name}'")
+    
+    return saved
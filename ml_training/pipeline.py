@@ -0,0 +1,409 @@
+"""
+Stage graph and per-variant training pipeline for the 10-variant matrix
+Loading, preprocessing, imputation, splitting and SMOTE are named stages
+whose results are cached in memory and on disk, so a full run computes
+each shared stage exactly once; the model training steps of each variant
+are checkpointed so an interrupted run can resume, and variants whose
+artifact manifest still matches are not retrained
+"""
+import hashlib
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+import imblearn
+import lightgbm
+import xgboost
+import catboost
+import config
+from dataset_store import get_dataset
+from data_preprocessing import (
+    preprocess_basic, impute_drop, impute_mean, impute_mice,
+    impute_age_group, create_augmented_dataset,
+    prepare_train_test_split, apply_smote
+)
+from model_utils import (
+    get_base_models, train_all_models, fine_tune_top_models, get_tuning_mode,
+    is_prune, prune_base_models, compute_oof_cache, build_dse_ensemble,
+    evaluate_final_model, save_model_artifacts
+)
+from tuning_store import estimator_fingerprint
+from checkpoint import VariantCheckpoint, is_resume
+from manifest import content_key, read_manifest, write_manifest, update_manifest, stale_reason
+from distillation import is_distill, distill_variant, remove_student
+from sklearn.ensemble import RandomForestClassifier
+from config import (
+    VARIANTS, STAGE_CACHE_DIR, MODEL_DIRS, SEED, FORCE_RETRAIN_ENV_VAR
+)
+
+
+# Bump when a stage function changes behaviour to invalidate disk caches
+STAGE_CACHE_VERSION = 1
+
+IMPUTATIONS = ['drop', 'mean', 'mice', 'agegroup', 'augmented']
+
+
+class Stage:
+    """A named step with upstream dependencies and the config values it reads"""
+
+    def __init__(self, name, func, deps=(), config_keys=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.config_keys = list(config_keys)
+
+
+def _build_stages():
+    """Define the shared data preparation stages"""
+    stages = [
+        Stage('basic', preprocess_basic, ['dataset'],
+              ['NUMERICAL_COLS', 'CATEGORICAL_COLS']),
+        Stage('impute_drop', lambda basic: impute_drop(basic[0]), ['basic']),
+        Stage('impute_mean', lambda basic: impute_mean(basic[0]), ['basic']),
+        Stage('impute_mice', lambda basic: impute_mice(basic[0])[0], ['basic'],
+              ['SEED']),
+        Stage('impute_agegroup', lambda basic: impute_age_group(basic[0], basic[2]),
+              ['basic'],
+              ['NUMERICAL_COLS', 'ORIGINAL_AGE_BOUNDARIES', 'AGE_GROUP_LABELS']),
+        Stage('impute_augmented', create_augmented_dataset,
+              ['impute_mean', 'impute_mice', 'impute_agegroup'],
+              ['IMPORTANT_FEATURES']),
+    ]
+    for imputation in IMPUTATIONS:
+        stages.append(Stage(
+            f'split_{imputation}', prepare_train_test_split,
+            [f'impute_{imputation}'], ['TEST_SIZE', 'SEED']
+        ))
+        stages.append(Stage(
+            f'smote_{imputation}',
+            lambda split: apply_smote(split[0], split[2]),
+            [f'split_{imputation}'], ['SEED']
+        ))
+    return {stage.name: stage for stage in stages}
+
+
+class StageGraph:
+    """
+    Memoized dependency graph of stages
+    Each result is keyed by a hash of its upstream keys, the config values it
+    reads and the library versions, and cached in memory and in cache_dir
+    """
+
+    def __init__(self, stages, cache_dir=STAGE_CACHE_DIR):
+        self.stages = stages
+        self.cache_dir = cache_dir
+        self._keys = {}
+        self._memory = {}
+        self._dataset = None
+        self.computed = []
+        self.loaded = []
+
+    def _load_dataset(self):
+        if self._dataset is None:
+            self._dataset = get_dataset()
+        return self._dataset
+
+    def key(self, name):
+        """Cache key of a stage (content hash of the dataset for 'dataset')"""
+        if name == 'dataset':
+            return self._load_dataset()[1]
+        if name not in self._keys:
+            stage = self.stages[name]
+            payload = {
+                'stage': name,
+                'version': STAGE_CACHE_VERSION,
+                'deps': [self.key(dep) for dep in stage.deps],
+                'config': {k: getattr(config, k) for k in stage.config_keys},
+                'libs': [pd.__version__, sklearn.__version__, imblearn.__version__]
+            }
+            blob = json.dumps(payload, sort_keys=True, default=str).encode()
+            self._keys[name] = hashlib.sha256(blob).hexdigest()
+        return self._keys[name]
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, f'{name}-{self.key(name)[:16]}.pkl')
+
+    def run(self, name):
+        """Return the result of a stage, computing its dependencies first"""
+        if name == 'dataset':
+            return self._load_dataset()[0]
+
+        key = self.key(name)
+        if key in self._memory:
+            return self._memory[key]
+
+        path = self._cache_path(name)
+        if os.path.exists(path):
+            try:
+                result = joblib.load(path)
+                print(f"♻️  Stage '{name}' loaded from cache")
+                self.loaded.append(name)
+                self._memory[key] = result
+                return result
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable cache for stage '{name}': {e}")
+
+        stage = self.stages[name]
+        inputs = [self.run(dep) for dep in stage.deps]
+        print(f"\n▶️  Running stage '{name}'...")
+        result = stage.func(*inputs)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        joblib.dump(result, tmp_path)
+        os.replace(tmp_path, path)
+
+        self.computed.append(name)
+        self._memory[key] = result
+        return result
+
+
+def variant_stages(variant):
+    """Names of the final stages a variant needs (its split, plus SMOTE)"""
+    imputation, balance = VARIANTS[variant]
+    stages = [f'split_{imputation}']
+    if balance == 'smote':
+        stages.append(f'smote_{imputation}')
+    return stages
+
+
+def prepare_variant_data(variant, graph=None):
+    """
+    Prepare train/test data for a variant through the shared stage graph
+    Returns: X_train, X_test, y_train, y_test, encoder, scaler
+    """
+    graph = graph or STAGE_GRAPH
+    imputation, balance = VARIANTS[variant]
+
+    _, encoder, scaler = graph.run('basic')
+    X_train, X_test, y_train, y_test = graph.run(f'split_{imputation}')
+    if balance == 'smote':
+        X_train, y_train = graph.run(f'smote_{imputation}')
+
+    return X_train, X_test, y_train, y_test, encoder, scaler
+
+
+def run_stage_matrix(variants, graph=None):
+    """Run every data stage needed by the given variants, each exactly once"""
+    graph = graph or STAGE_GRAPH
+    for variant in variants:
+        for name in variant_stages(variant):
+            graph.run(name)
+
+    print(f"\nStages computed: {len(graph.computed)} {graph.computed}")
+    print(f"Stages loaded from cache: {len(graph.loaded)} {graph.loaded}")
+    return graph
+
+
+# Shared per-process graph so variants trained in one run reuse stages
+STAGE_GRAPH = StageGraph(_build_stages())
+
+
+# Config values that change what the model training steps produce
+TRAINING_CONFIG_KEYS = [
+    'SEED', 'K_FOLD', 'HALVING_CANDIDATES', 'HALVING_FACTOR',
+    'HALVING_RESOURCE', 'HALVING_MIN_RESOURCE', 'TUNING_BUDGET',
+    'EARLY_STOPPING_ROUNDS', 'EARLY_STOPPING_FRACTION',
+    'TREE_ENGINE', 'TREE_ENGINE_TOLERANCE', 'ARTIFACT_FORMAT', 'ARTIFACT_MMAP_MIN_BYTES'
+]
+
+# Config values that change which learners a pruned DSE keeps
+PRUNE_CONFIG_KEYS = ['PRUNE_LATENCY_BUDGET_MS', 'PRUNE_TOLERANCE', 'PRUNE_LATENCY_ROWS']
+
+
+def default_meta_classifier():
+    """Meta-classifier of the DSE when the best base model wasn't tuned"""
+    return RandomForestClassifier(n_estimators=100, random_state=SEED)
+
+
+def _training_config():
+    """Training config hashed into the fingerprint"""
+    return {
+        'config': {k: getattr(config, k) for k in TRAINING_CONFIG_KEYS},
+        'tuning_mode': get_tuning_mode(),
+        'meta_classifier': estimator_fingerprint(default_meta_classifier()),
+        'pruning': {
+            'enabled': is_prune(),
+            **{k: getattr(config, k) for k in PRUNE_CONFIG_KEYS}
+        }
+    }
+
+
+def training_fingerprint(variant, graph=None):
+    """
+    Everything that determines a variant's trained model, as component hashes:
+    dataset, preprocessing stages, param grids, training config, model
+    definitions and library versions
+    """
+    graph = graph or STAGE_GRAPH
+    return {
+        'dataset': graph.key('dataset'),
+        'preprocessing': graph.key(variant_stages(variant)[-1]),
+        'param_grids': content_key(config.PARAM_GRIDS),
+        'training_config': content_key(_training_config()),
+        'models': content_key({
+            name: estimator_fingerprint(model)
+            for name, model in get_base_models().items()
+        }),
+        'libraries': {
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'scikit-learn': sklearn.__version__,
+            'imbalanced-learn': imblearn.__version__,
+            'lightgbm': lightgbm.__version__,
+            'xgboost': xgboost.__version__,
+            'catboost': catboost.__version__
+        }
+    }
+
+
+def is_force_retrain():
+    """True when the STROKE_FORCE_RETRAIN environment switch is set"""
+    return os.environ.get(FORCE_RETRAIN_ENV_VAR, '0').lower() in ('1', 'true', 'yes')
+
+
+def artifact_status(variants, force=None, graph=None):
+    """
+    Compare each variant's artifact manifest with its current fingerprint
+    Returns: dict of variant -> reason to retrain (None when up to date)
+    """
+    force = is_force_retrain() if force is None else force
+    status = {}
+    print("\nArtifact manifests:")
+    for variant in variants:
+        if force:
+            reason = 'forced'
+        else:
+            reason = stale_reason(MODEL_DIRS[variant], training_fingerprint(variant, graph))
+        status[variant] = reason
+        print(f"  {'🔁' if reason else '✅'} {variant:<22} {reason or 'up to date'}")
+    return status
+
+
+def train_variant(variant, resume=None, force=None):
+    """
+    Run the full training pipeline of one variant, checkpointing each step
+    Variants whose artifact manifest matches are skipped unless forced
+    Returns: dse_model (None when skipped), metrics
+    """
+    imputation, balance = VARIANTS[variant]
+    resume = is_resume() if resume is None else resume
+    force = is_force_retrain() if force is None else force
+    folder_name = MODEL_DIRS[variant]
+    fingerprint = training_fingerprint(variant)
+    
+    if not force and stale_reason(folder_name, fingerprint) is None:
+        print(f"\n⏭️  Artifacts in '{folder_name}' are up to date, skipping training")
+        if is_distill():
+            distill_variant(variant)
+        return None, read_manifest(folder_name)['metrics']
+    
+    # 1. Load, preprocess, impute, split (and SMOTE) through the stage graph
+    n_data_steps = 5 if balance == 'smote' else 4
+    if balance == 'smote':
+        print("\n[Step 1-5] Preparing data (load, preprocess, impute, split, SMOTE)...")
+    else:
+        print("\n[Step 1-4] Preparing data (load, preprocess, impute, split)...")
+    X_train, X_test, y_train, y_test, encoder, scaler = prepare_variant_data(variant)
+    print(f"Train set{' after SMOTE' if balance == 'smote' else ''}: {X_train.shape}")
+    print(f"Test set: {X_test.shape}")
+    
+    checkpoint = VariantCheckpoint(variant, content_key(fingerprint), resume=resume)
+    step = n_data_steps
+    
+    # 2. Train all models
+    step += 1
+    print(f"\n[Step {step}] Training all base models...")
+    results_df, models = checkpoint.run(
+        'base_models', lambda: train_all_models(X_train, y_train)
+    )
+    print("\n📊 Model Performance Ranking:")
+    print(results_df.to_string(index=False))
+    
+    # 3. Get best model for meta-classifier
+    best_model_name = results_df.iloc[0]['Model']
+    print(f"\n🏆 Best performing model: {best_model_name}")
+    
+    # 4. Fine-tune top 3 models
+    step += 1
+    print(f"\n[Step {step}] Fine-tuning top 3 models...")
+    top_3_models = results_df.head(3)['Model'].tolist()
+    tuned_models = checkpoint.run(
+        'tuned_models',
+        lambda: fine_tune_top_models(top_3_models, models, X_train, y_train, variant=variant)
+    )
+    
+    # 5. Prepare models for ensemble
+    base_models_for_ensemble = []
+    for model_name, model in models.items():
+        if model_name in tuned_models:
+            base_models_for_ensemble.append((model_name, tuned_models[model_name]))
+        else:
+            base_models_for_ensemble.append((model_name, model))
+    
+    # Set meta-classifier
+    meta_classifier = default_meta_classifier()
+    if best_model_name in tuned_models:
+        meta_classifier = tuned_models[best_model_name]
+    
+    # 6. Optionally prune the learners to the inference latency budget
+    oof_cache = None
+    pruning = None
+    if is_prune():
+        step += 1
+        print(f"\n[Step {step}] Pruning base learners to the latency budget...")
+        
+        def prune():
+            nonlocal oof_cache
+            oof_cache = compute_oof_cache(base_models_for_ensemble, X_train, y_train)
+            return prune_base_models(base_models_for_ensemble, meta_classifier, X_train, y_train, oof_cache)
+        
+        pruning = checkpoint.run('pruning', prune)
+        base_models_for_ensemble = [
+            (name, model) for name, model in base_models_for_ensemble
+            if name in pruning['selected']
+        ]
+    
+    # 7. Build DSE model
+    step += 1
+    print(f"\n[Step {step}] Building Dense Stacking Ensemble...")
+    dse_model = checkpoint.run(
+        'dse_model',
+        lambda: build_dse_ensemble(base_models_for_ensemble, meta_classifier, X_train, y_train, oof_cache)
+    )
+    
+    # 8. Evaluate on test set
+    step += 1
+    print(f"\n[Step {step}] Evaluating final model...")
+    metrics = checkpoint.run(
+        'metrics', lambda: evaluate_final_model(dse_model, X_test, y_test)
+    )
+    
+    # 9. Save model artifacts
+    step += 1
+    print(f"\n[Step {step}] Saving model artifacts...")
+    artifact_paths = save_model_artifacts(
+        dse_model, scaler, encoder, X_train,
+        folder_name, f'{balance}_{imputation}'
+    )
+    # A student of the previous DSE must not keep serving the 'fast' tier
+    remove_student(folder_name, f'{balance}_{imputation}')
+    write_manifest(folder_name, variant, fingerprint, artifact_paths, metrics)
+    if pruning is not None:
+        update_manifest(folder_name, 'pruning', pruning)
+    # The artifacts are complete: step checkpoints would only go stale
+    checkpoint.clear()
+    
+    # 10. Optionally distill the DSE into a fast student model
+    if is_distill():
+        step += 1
+        print(f"\n[Step {step}] Distilling DSE into a student model...")
+        distill_variant(variant, dse_model, (X_train, X_test, y_train, y_test))
+    
+    print("\n" + "="*70)
+    print("✅ TRAINING COMPLETED SUCCESSFULLY!")
+    print("="*70)
+    
+    return dse_model, metrics
@@ -2,11 +2,53 @@
 Stroke Prediction Service
 Handles loading trained models and making predictions
 """
-import joblib
+import hashlib
 import pandas as pd
 import numpy as np
 import os
-from config import NUMERICAL_COLS, CATEGORICAL_COLS
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from feature_plan import compile_feature_plan
+from dse_engine import compile_dse_graph, load_tree_packs
+from artifact_store import load_artifact
+from distillation import student_is_current
+from prediction_cache import row_keys
+from config import NUMERICAL_COLS, CATEGORICAL_COLS, DECISION_THRESHOLD, CASCADE_BAND
+
+
+# Patient fields every prediction request must provide
+REQUIRED_FIELDS = [
+    'age', 'gender', 'hypertension', 'heart_disease',
+    'ever_married', 'work_type', 'Residence_type',
+    'avg_glucose_level', 'bmi', 'smoking_status'
+]
+
+# Fields that must hold a number
+NUMERIC_FIELDS = NUMERICAL_COLS + ['hypertension', 'heart_disease']
+
+# Inference tiers: the full DSE, its distilled student (when trained), or
+# the student escalating uncertain rows to the DSE
+TIERS = ('full', 'fast', 'cascade')
+
+
+def _is_number(value) -> bool:
+    """True for finite-or-inf numbers and numeric strings (not NaN/None/bool)"""
+    if isinstance(value, bool):
+        return False
+    try:
+        return not np.isnan(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def get_risk_level(stroke_prob: float) -> str:
+    """Risk band of a stroke probability"""
+    if stroke_prob < 0.3:
+        return 'Low'
+    elif stroke_prob < 0.6:
+        return 'Medium'
+    return 'High'
 
 
 class StrokePredictionService:
@@ -14,29 +56,87 @@ class StrokePredictionService:
     Service class for stroke prediction using trained models
     """
     
-    def __init__(self, model_dir: str, model_suffix: str):
+    def __init__(self, model_dir: str, model_suffix: str, threshold: float = None,
+                 cache=None, model_id: str = None, cascade_band: tuple = None):
         """
         Initialize the prediction service
         
         Args:
             model_dir: Directory containing model artifacts
             model_suffix: Suffix used when saving model (e.g., 'imbalanced_drop')
+            threshold: Default decision threshold (config.DECISION_THRESHOLD)
+            cache: Optional PredictionCache shared by the API's models
+            model_id: Name of the model in cache keys (default: model_suffix)
+            cascade_band: (low, high) student probabilities escalated to the
+                DSE in the 'cascade' tier (default: config.CASCADE_BAND)
         """
         self.model_dir = model_dir
         self.model_suffix = model_suffix
+        self.threshold = DECISION_THRESHOLD if threshold is None else threshold
+        self.cache = cache
+        self.model_id = model_id or model_suffix
+        low, high = CASCADE_BAND if cascade_band is None else cascade_band
+        if not 0 <= low <= high <= 1:
+            raise ValueError(f'Invalid cascade band: ({low}, {high})')
+        self.cascade_band = (low, high)
+        self.cascade_stats = {'calls': 0, 'rows': 0, 'escalated_calls': 0, 'escalated_rows': 0,
+                              'fast_seconds': 0.0, 'full_seconds': 0.0}
+        self._stats_lock = threading.Lock()
+        
+        # Load model artifacts concurrently (seconds per file in load_times)
+        self.load_times = {}
+        filenames = [
+            f'dse_stroke_prediction_{model_suffix}.pkl',
+            f'scaler_{model_suffix}.pkl',
+            f'encoder_{model_suffix}.pkl',
+            f'model_columns_{model_suffix}.pkl'
+        ]
+        with ThreadPoolExecutor(max_workers=len(filenames)) as executor:
+            artifacts = list(executor.map(self._load_artifact, filenames))
+        self.model, self.scaler, self.encoder, self.model_columns = artifacts
         
-        # Load model artifacts
-        self.model = self._load_artifact(f'dse_stroke_prediction_{model_suffix}.pkl')
-        self.scaler = self._load_artifact(f'scaler_{model_suffix}.pkl')
-        self.encoder = self._load_artifact(f'encoder_{model_suffix}.pkl')
-        self.model_columns = self._load_artifact(f'model_columns_{model_suffix}.pkl')
+        # Distilled student for the 'fast' tier (optional artifact), only
+        # when the manifest records it as distilled from this DSE
+        student_file = f'student_{model_suffix}.pkl'
+        self.student = None
+        if student_is_current(model_dir, model_suffix):
+            self.student = self._load_artifact(student_file)
+            filenames.append(student_file)
+        elif os.path.exists(os.path.join(model_dir, student_file)):
+            print(f"⚠️  {student_file} was not distilled from this DSE; 'fast'/'cascade' tiers disabled")
+        self.tiers = TIERS if self.student is not None else TIERS[:1]
+        self.artifact_version = self._artifact_version(filenames)
+        
+        # Pandas-free preprocessing (None -> fall back to the DataFrame path)
+        self.feature_plan = compile_feature_plan(self.scaler, self.encoder, self.model_columns)
+        
+        # Flattened DSE graph (None -> evaluate the nested estimator directly),
+        # reusing the tree engine compiled at training time when it is saved
+        start = time.time()
+        packs = load_tree_packs(
+            os.path.join(model_dir, f'engine_{model_suffix}.pkl'),
+            os.path.join(model_dir, filenames[0])
+        )
+        self.engine = compile_dse_graph(self.model, packs)
+        self.load_times['engine'] = time.time() - start
         
     def _load_artifact(self, filename: str):
-        """Load a pickled artifact from the model directory"""
+        """Load an artifact from the model directory (large arrays memory-mapped)"""
         filepath = os.path.join(self.model_dir, filename)
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Artifact not found: {filepath}")
-        return joblib.load(filepath)
+        start = time.time()
+        artifact = load_artifact(filepath)
+        self.load_times[filename] = time.time() - start
+        return artifact
+    
+    def _artifact_version(self, filenames: list) -> str:
+        """Short digest of the artifacts' names, sizes and modification times"""
+        digest = hashlib.sha256()
+        for filename in filenames:
+            stat = os.stat(os.path.join(self.model_dir, filename))
+            digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        return digest.hexdigest()[:16]
     
     def preprocess(self, data: dict) -> pd.DataFrame:
         """
@@ -48,9 +148,24 @@ class StrokePredictionService:
         Returns:
             Preprocessed DataFrame ready for prediction
         """
-        # Convert to DataFrame
-        df = pd.DataFrame([data])
-        
+        if self.feature_plan is None:
+            return self._transform(pd.DataFrame([data]))
+        return self._as_frame(self.feature_plan.transform([data]))
+    
+    def preprocess_records(self, records: list) -> pd.DataFrame:
+        """Preprocess several patient records into one DataFrame"""
+        if self.feature_plan is None:
+            df = pd.DataFrame.from_records(records, columns=REQUIRED_FIELDS)
+            df[NUMERIC_FIELDS] = df[NUMERIC_FIELDS].apply(pd.to_numeric)
+            return self._transform(df)
+        return self._as_frame(self.feature_plan.transform(records))
+    
+    def _as_frame(self, matrix: np.ndarray) -> pd.DataFrame:
+        """Label a feature matrix with the training columns the model expects"""
+        return pd.DataFrame(matrix, columns=self.model_columns, copy=False)
+    
+    def _transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Scale, encode and align a DataFrame of raw patient rows"""
         # Handle binary columns
         df['ever_married'] = df['ever_married'].map({'Yes': 1, 'No': 0})
         
@@ -70,22 +185,111 @@ class StrokePredictionService:
         df = df.drop(columns=CATEGORICAL_COLS)
         df = pd.concat([df, encoded_df], axis=1)
         
-        # Ensure all expected columns are present
-        for col in self.model_columns:
-            if col not in df.columns:
-                df[col] = 0
+        # Add missing expected columns and reorder to match training
+        return df.reindex(columns=self.model_columns, fill_value=0)
+    
+    def predict_proba_with_labels(self, processed: pd.DataFrame, threshold: float = None,
+                                  tier: str = None):
+        """
+        Run the model once and derive labels from the stroke probabilities
+        (threshold may also be an array with one threshold per row)
         
-        # Reorder columns to match training
-        df = df[self.model_columns]
+        Returns:
+            (labels, probabilities) for every row of processed
+        """
+        threshold = self.threshold if threshold is None else threshold
+        probabilities = self._predict_proba(processed, tier)
+        classes = self.model.classes_
+        labels = np.where(probabilities[:, 1] > threshold, classes[1], classes[0])
+        return labels, probabilities
+    
+    def tier_model(self, tier: str = None):
+        """
+        Model serving a tier (the first-stage student for 'cascade');
+        raises ValueError for unknown or untrained tiers
+        """
+        tier = tier or 'full'
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier '{tier}' (choose from {list(TIERS)})")
+        if tier not in self.tiers:
+            raise ValueError(f"Tier '{tier}' is not available: no distilled student "
+                             f"for '{self.model_id}' (train with main.py --distill)")
+        return (self.engine or self.model) if tier == 'full' else self.student
+    
+    def _predict_proba(self, processed: pd.DataFrame, tier: str = None) -> np.ndarray:
+        """Class probabilities, reusing cached rows and scoring only the rest"""
+        if tier == 'cascade':
+            return self._cascade_proba(processed)
+        model = self.tier_model(tier)
+        if self.cache is None:
+            return model.predict_proba(processed)
         
-        return df
+        keys = [(self.model_id, self.artifact_version, tier or 'full', key)
+                for key in row_keys(processed)]
+        rows = self.cache.get_many(keys)
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            subset = processed if len(missing) == len(rows) else processed.iloc[missing]
+            fresh = model.predict_proba(subset)
+            self.cache.put_many([keys[i] for i in missing], [row.copy() for row in fresh])
+            for i, row in zip(missing, fresh):
+                rows[i] = row
+        return np.vstack(rows)
     
-    def predict(self, data: dict) -> dict:
+    def _cascade_proba(self, processed: pd.DataFrame) -> np.ndarray:
+        """
+        Student probabilities, with the rows inside cascade_band (the
+        uncertain ones) replaced by the full DSE's
+        """
+        # Checked here so an untrained cascade is reported as 'cascade', not 'fast'
+        self.tier_model('cascade')
+        start = time.perf_counter()
+        probabilities = self._predict_proba(processed, 'fast')
+        fast_seconds = time.perf_counter() - start
+        
+        low, high = self.cascade_band
+        escalate = np.flatnonzero((probabilities[:, 1] >= low) & (probabilities[:, 1] <= high))
+        full_seconds = 0.0
+        if len(escalate):
+            start = time.perf_counter()
+            subset = processed if len(escalate) == len(processed) else processed.iloc[escalate]
+            probabilities[escalate] = self._predict_proba(subset, 'full')
+            full_seconds = time.perf_counter() - start
+        
+        with self._stats_lock:
+            stats = self.cascade_stats
+            stats['calls'] += 1
+            stats['rows'] += len(processed)
+            stats['escalated_calls'] += bool(len(escalate))
+            stats['escalated_rows'] += len(escalate)
+            stats['fast_seconds'] += fast_seconds
+            stats['full_seconds'] += full_seconds
+        return probabilities
+    
+    def cascade_summary(self) -> dict:
+        """Per-stage hit rates and mean latency of the 'cascade' tier"""
+        with self._stats_lock:
+            stats = dict(self.cascade_stats)
+        rows, calls = stats['rows'], stats['calls']
+        return {
+            'band': list(self.cascade_band),
+            'calls': calls,
+            'rows': rows,
+            'fast_hit_rate': (rows - stats['escalated_rows']) / rows if rows else None,
+            'escalation_rate': stats['escalated_rows'] / rows if rows else None,
+            'fast_ms_per_call': stats['fast_seconds'] * 1000 / calls if calls else None,
+            'full_ms_per_escalated_call': (stats['full_seconds'] * 1000 / stats['escalated_calls']
+                                           if stats['escalated_calls'] else None)
+        }
+    
+    def predict(self, data: dict, threshold: float = None, tier: str = None) -> dict:
         """
         Make a prediction for a single patient
         
         Args:
             data: Dictionary containing patient data
+            threshold: Decision threshold for this call (default: self.threshold)
+            tier: 'full' (DSE, default), 'fast' (distilled student) or 'cascade'
             
         Returns:
             Dictionary with prediction results
@@ -93,18 +297,17 @@ class StrokePredictionService:
         # Preprocess data
         processed = self.preprocess(data)
         
-        # Make prediction
-        prediction = self.model.predict(processed)[0]
-        probability = self.model.predict_proba(processed)[0]
+        # Make prediction (single pass through the ensemble)
+        labels, probabilities = self.predict_proba_with_labels(processed, threshold, tier)
         
+        return self._build_result(labels[0], probabilities[0], threshold, tier)
+    
+    def _build_result(self, prediction, probability, threshold: float = None,
+                      tier: str = None) -> dict:
+        """Turn a label and its class probabilities into a result dict"""
         # Calculate risk level
         stroke_prob = probability[1]
-        if stroke_prob < 0.3:
-            risk_level = 'Low'
-        elif stroke_prob < 0.6:
-            risk_level = 'Medium'
-        else:
-            risk_level = 'High'
+        risk_level = get_risk_level(stroke_prob)
         
         # Calculate confidence
         confidence = abs(stroke_prob - 0.5) * 2  # 0 to 1 scale
@@ -115,26 +318,72 @@ class StrokePredictionService:
             'no_stroke_probability': float(probability[0]),
             'risk_level': risk_level,
             'confidence': float(confidence),
+            'threshold': float(self.threshold if threshold is None else threshold),
+            'tier': tier or 'full',
             'interpretation': self._interpret_result(prediction, stroke_prob, risk_level)
         }
     
-    def predict_batch(self, patients: list) -> list:
+    def validate_record(self, data) -> str:
+        """
+        Check one raw patient record
+        
+        Returns:
+            Error message, or None when the record can be predicted
+        """
+        if not isinstance(data, dict):
+            return 'Patient record must be an object'
+        missing_fields = [f for f in REQUIRED_FIELDS if f not in data]
+        if missing_fields:
+            return f'Missing required fields: {missing_fields}'
+        for field in NUMERIC_FIELDS:
+            if not _is_number(data[field]):
+                return f"Field '{field}' must be a number, got {data[field]!r}"
+        if data['ever_married'] not in ('Yes', 'No'):
+            return f"Field 'ever_married' must be 'Yes' or 'No', got {data['ever_married']!r}"
+        return None
+    
+    def predict_batch(self, patients: list, threshold: float = None, tier: str = None) -> list:
         """
         Make predictions for multiple patients
         
+        Valid records are preprocessed into one matrix and scored with a
+        single predict_proba call; malformed records get an error entry
+        
         Args:
             patients: List of patient data dictionaries
+            threshold: Decision threshold for this call (default: self.threshold)
+            tier: 'full' (DSE, default), 'fast' (distilled student) or 'cascade'
             
         Returns:
-            List of prediction results
-        """
-        results = []
-        for patient in patients:
-            try:
-                result = self.predict(patient)
-                results.append(result)
-            except Exception as e:
-                results.append({'error': str(e)})
+            List of prediction results (same order as patients)
+        """
+        self.tier_model(tier)  # unknown / untrained tier fails the whole call
+        results = [None] * len(patients)
+        valid_rows = []
+        for i, patient in enumerate(patients):
+            error = self.validate_record(patient)
+            if error:
+                results[i] = {'error': error}
+            else:
+                valid_rows.append(i)
+        
+        if not valid_rows:
+            return results
+        
+        try:
+            processed = self.preprocess_records([patients[i] for i in valid_rows])
+            predictions, probabilities = self.predict_proba_with_labels(processed, threshold, tier)
+        except Exception:
+            # Isolate whatever broke the vectorized path to its own rows
+            for i in valid_rows:
+                try:
+                    results[i] = self.predict(patients[i], threshold, tier)
+                except Exception as e:
+                    results[i] = {'error': str(e)}
+            return results
+        
+        for i, prediction, probability in zip(valid_rows, predictions, probabilities):
+            results[i] = self._build_result(prediction, probability, threshold, tier)
         return results
     
     def _interpret_result(self, prediction: int, probability: float, risk_level: str) -> str:
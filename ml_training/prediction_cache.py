@@ -0,0 +1,84 @@
+"""
+In-process cache of prediction probabilities
+Entries are keyed by (model_id, artifact version, hash of the preprocessed
+feature row), expire after a TTL and are evicted least recently used first
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from config import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL
+
+
+def row_keys(matrix):
+    """Canonical digest of every row of a preprocessed feature matrix"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float64) + 0.0  # -0.0 -> 0.0
+    matrix[np.isnan(matrix)] = np.nan  # one NaN bit pattern
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in matrix]
+
+
+class PredictionCache:
+    """Thread-safe TTL + LRU map of feature-row keys to class probabilities"""
+
+    def __init__(self, max_entries=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'invalidated': 0}
+
+    def get_many(self, keys):
+        """Cached probabilities of each key (None for misses)"""
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl and entry[0] <= now:
+                    del self._entries[key]
+                    self.stats['expired'] += 1
+                    entry = None
+                if entry is None:
+                    self.stats['misses'] += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    values.append(entry[1])
+        return values
+
+    def put_many(self, keys, values):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, model_id):
+        """Drop every entry of a model (its artifacts are being (re)loaded)"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model_id]
+            for key in stale:
+                del self._entries[key]
+            self.stats['invalidated'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.stats['invalidated'] += len(self._entries)
+            self._entries.clear()
+
+    def summary(self):
+        """Counters plus current size and hit rate (for /api/health)"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hit_rate': self.stats['hits'] / lookups if lookups else None
+            }
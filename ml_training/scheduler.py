@@ -0,0 +1,94 @@
+"""
+Core-aware parallel scheduler for training model variants
+Trains several variants at once in worker processes and splits the CPU
+budget between them so the estimators' own thread pools don't oversubscribe
+"""
+import importlib
+import os
+import time
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import N_JOBS_ENV_VAR
+
+
+# Thread pool size variables read by OpenMP / BLAS / numexpr at load time
+THREAD_ENV_VARS = [
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'
+]
+
+
+def split_cpu_budget(jobs, n_tasks, total_cores=None):
+    """
+    Split the available cores between concurrent variants
+    Returns: (number of worker processes, threads per worker)
+    """
+    total_cores = total_cores or os.cpu_count() or 1
+    workers = max(1, min(jobs, n_tasks, total_cores))
+    threads = max(1, total_cores // workers)
+    return workers, threads
+
+
+@contextmanager
+def _thread_limits_env(threads):
+    """
+    Set the thread limits while workers are spawned: children inherit the
+    environment, so OpenMP/BLAS pick the limits up before their first import
+    """
+    names = THREAD_ENV_VARS + [N_JOBS_ENV_VAR]
+    previous = {name: os.environ.get(name) for name in names}
+    for name in names:
+        os.environ[name] = str(threads)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _train_variant(variant):
+    """Worker entry point: run one train_<variant>.py script"""
+    from threadpoolctl import threadpool_limits
+
+    module = importlib.import_module(f'train_{variant}')
+    start = time.time()
+    with threadpool_limits(limits=int(os.environ[N_JOBS_ENV_VAR])):
+        _, metrics = module.main()
+    return metrics, time.time() - start
+
+
+def train_variants_parallel(variants, jobs):
+    """
+    Train variants concurrently in `jobs` worker processes
+    Returns: dict of variant -> metrics (None when training failed)
+    """
+    workers, threads = split_cpu_budget(jobs, len(variants))
+    print(f"\nScheduling {len(variants)} variants on {workers} workers "
+          f"x {threads} threads ({os.cpu_count()} cores)")
+
+    results = {variant: None for variant in variants}
+    # spawn so workers start clean and honour the thread limits
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        with _thread_limits_env(threads):
+            futures = {
+                executor.submit(_train_variant, variant): variant
+                for variant in variants
+            }
+        for done, future in enumerate(as_completed(futures), 1):
+            variant = futures[future]
+            print(f"\n[{done}/{len(variants)}] Finished: {variant}")
+            print("-"*70)
+            try:
+                metrics, elapsed = future.result()
+                results[variant] = metrics
+                print(f"✅ {variant} trained in {elapsed/60:.1f} min")
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                results[variant] = None
+
+    return results
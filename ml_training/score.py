@@ -0,0 +1,191 @@
+"""
+Offline bulk scoring of patient files
+Reads a CSV or Parquet file in chunks, scores each chunk with a trained
+variant in a process pool and writes probability, label and risk level to
+Parquet; memory stays bounded by the chunks in flight, not the input size
+
+Usage:
+    python score.py registry.csv -o scores.parquet --variant mean_smote --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from predict_service import StrokePredictionService, get_risk_level
+from memory_stats import process_memory, format_memory
+from config import MODEL_DIRS, VARIANTS, SCORE_CHUNK_ROWS
+
+
+# Service of the current process (loaded once per pool worker)
+_SERVICE = None
+
+
+def _init_worker(variant):
+    global _SERVICE
+    imputation, balance = VARIANTS[variant]
+    start = time.time()
+    _SERVICE = StrokePredictionService(MODEL_DIRS[variant], f'{balance}_{imputation}')
+    print(f"🔧 Process {os.getpid()} loaded '{variant}' in {time.time() - start:.2f}s "
+          f"({format_memory(process_memory())})")
+
+
+def _is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def iter_chunks(path, chunk_rows=SCORE_CHUNK_ROWS, id_column=None):
+    """
+    Yield DataFrames of at most chunk_rows rows from a CSV or Parquet file
+    CSV ids are read as strings: their inferred type could differ per chunk
+    """
+    if _is_parquet(path):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows,
+                               dtype={id_column: str} if id_column else None)
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
+
+
+def score_chunk(df, threshold=None, id_column=None):
+    """
+    Score one chunk in the current process
+    Returns: DataFrame with probability, prediction, risk_level and error
+    """
+    service = _SERVICE
+    records = df.to_dict('records')
+    errors = [service.validate_record(record) for record in records]
+    valid_rows = [i for i, error in enumerate(errors) if error is None]
+
+    probability = np.full(len(records), np.nan)
+    prediction = np.full(len(records), -1, dtype=np.int64)
+    if valid_rows:
+        try:
+            processed = service.preprocess_records([records[i] for i in valid_rows])
+            labels, probabilities = service.predict_proba_with_labels(processed, threshold)
+            probability[valid_rows] = probabilities[:, 1]
+            prediction[valid_rows] = labels
+        except Exception:
+            # Isolate whatever broke the vectorized path to its own rows
+            for i in valid_rows:
+                try:
+                    result = service.predict(records[i], threshold)
+                    probability[i], prediction[i] = result['probability'], result['prediction']
+                except Exception as e:
+                    errors[i] = str(e)
+
+    out = pd.DataFrame({
+        'probability': probability,
+        'prediction': prediction,
+        'risk_level': [None if np.isnan(p) else get_risk_level(p) for p in probability],
+        'error': errors
+    })
+    if id_column:
+        out.insert(0, id_column, df[id_column].to_numpy())
+    return out
+
+
+def _output_schema(input_path, id_column):
+    """Result schema; the id column keeps the Parquet input's type (strings for CSV)"""
+    fields = [
+        pa.field('probability', pa.float64()),
+        pa.field('prediction', pa.int64()),
+        pa.field('risk_level', pa.string()),
+        pa.field('error', pa.string())
+    ]
+    if id_column:
+        id_type = pa.string()
+        if _is_parquet(input_path):
+            id_type = pq.ParquetFile(input_path).schema_arrow.field(id_column).type
+        fields.insert(0, pa.field(id_column, id_type))
+    return pa.schema(fields)
+
+
+def score_file(input_path, output_path, variant, workers=None, chunk_rows=SCORE_CHUNK_ROWS,
+               threshold=None, id_column='id'):
+    """
+    Score a CSV/Parquet file into a Parquet file of results
+    Chunks are scored by `workers` processes (inline when 1), at most two
+    per worker in flight, and written in input order
+    Returns: (rows scored, rows with errors)
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(input_path, chunk_rows, id_column)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError(f'No rows in {input_path}')
+    if id_column not in first.columns:
+        id_column = None
+    schema = _output_schema(input_path, id_column)
+
+    print(f"🧮 Scoring {input_path} with '{variant}' ({workers} workers, {chunk_rows:,} rows/chunk)")
+    start = time.time()
+    rows = errors = 0
+
+    def write(writer, result):
+        nonlocal rows, errors
+        writer.write_table(pa.Table.from_pandas(result, schema=schema, preserve_index=False))
+        rows += len(result)
+        errors += int(result['error'].notna().sum())
+        elapsed = time.time() - start
+        print(f"  {rows:>12,} rows | {rows / elapsed:>9,.0f} rows/s | {errors:,} errors | {elapsed:7.1f}s")
+
+    with pq.ParquetWriter(output_path, schema) as writer:
+        if workers <= 1:
+            _init_worker(variant)
+            for chunk in _prepend(first, chunks):
+                write(writer, score_chunk(chunk, threshold, id_column))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(variant,)) as executor:
+                pending = deque()
+                for chunk in _prepend(first, chunks):
+                    pending.append(executor.submit(score_chunk, chunk, threshold, id_column))
+                    if len(pending) >= 2 * workers:
+                        write(writer, pending.popleft().result())
+                while pending:
+                    write(writer, pending.popleft().result())
+
+    elapsed = time.time() - start
+    print(f"✅ {rows:,} rows scored in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), "
+          f"{errors:,} errors -> {output_path}")
+    return rows, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV/Parquet patient file offline')
+    parser.add_argument('input', help='CSV or Parquet file of patients')
+    parser.add_argument('-o', '--output', required=True, help='Parquet file to write')
+    parser.add_argument('--variant', required=True, choices=list(VARIANTS),
+                        help='Trained model variant to score with')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Scoring processes (default: all cores; 1 scores inline)')
+    parser.add_argument('--chunk-rows', type=int, default=SCORE_CHUNK_ROWS,
+                        help=f'Rows per chunk (default: {SCORE_CHUNK_ROWS})')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='Decision threshold (default: config.DECISION_THRESHOLD)')
+    parser.add_argument('--id-column', default='id',
+                        help="Input column copied to the output when present (default: 'id')")
+    args = parser.parse_args()
+
+    if args.threshold is not None and not 0 < args.threshold < 1:
+        parser.error('--threshold must be between 0 and 1')
+    if not os.path.exists(args.input):
+        print(f"❌ Input not found: {args.input}")
+        sys.exit(1)
+    score_file(args.input, args.output, args.variant, args.workers, args.chunk_rows,
+               args.threshold, args.id_column)
+
+
+if __name__ == '__main__':
+    main()
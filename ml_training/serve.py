@@ -0,0 +1,165 @@
+"""
+Production server for the stroke prediction API
+Pre-fork gunicorn runner: models are loaded once in the master before the
+workers fork, so every worker shares their memory pages copy-on-write
+
+Usage:
+    python serve.py --workers 4 --bind 0.0.0.0:5000
+
+Graceful reload (reload models, replace workers without dropping requests):
+    kill -HUP <master pid>
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from gunicorn.app.base import BaseApplication
+import api_server
+from memory_stats import process_memory, format_memory
+from config import (
+    SERVER_BIND, SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT,
+    SERVER_MAX_RESIDENT_MODELS, SERVER_MAX_RESIDENT_BYTES,
+    MICRO_BATCH_MAX_ROWS, MICRO_BATCH_MAX_WAIT_MS
+)
+
+
+# Patient used to check each worker's models before it accepts traffic
+HEALTHCHECK_PATIENT = {
+    'age': 67, 'gender': 'Male', 'hypertension': 0, 'heart_disease': 1,
+    'ever_married': 'Yes', 'work_type': 'Private', 'Residence_type': 'Urban',
+    'avg_glucose_level': 228.69, 'bmi': 36.6, 'smoking_status': 'formerly smoked'
+}
+
+# Gunicorn exit code telling the master a worker cannot boot
+WORKER_BOOT_ERROR = 3
+
+
+def load_models():
+    """
+    (Re)discover and preload the models in the master process; models that
+    fail to load are not served
+    Raises RuntimeError when no model is found or none loads
+    """
+    start = time.time()
+    api_server.MODELS.clear()
+    api_server.REGISTRY.clear()
+    if api_server.auto_discover_models() == 0:
+        raise RuntimeError("No models found. Train models first: python main.py")
+    report = api_server.REGISTRY.preload(list(api_server.MODELS))
+    for model_id, load_times in report.items():
+        if load_times is None:
+            print(f"⚠️  Not serving '{model_id}': it failed to load")
+            del api_server.MODELS[model_id]
+    if not api_server.MODELS:
+        raise RuntimeError("No model could be loaded")
+
+    # Keep the garbage collector from writing to the shared model pages
+    gc.collect()
+    gc.freeze()
+    print(f"⏱️  Master ready in {time.time() - start:.2f}s ({format_memory(process_memory())})")
+
+
+def on_reload(server):
+    """
+    SIGHUP: reload models in the master; gunicorn then replaces the workers
+    A failed reload keeps the current models (exiting here would stop the master)
+    """
+    server.log.info("Reloading models before replacing workers")
+    models = dict(api_server.MODELS)
+    registry = api_server.REGISTRY.snapshot()
+    gc.unfreeze()
+    try:
+        load_models()
+    except Exception as e:
+        server.log.error(f"Model reload failed, keeping the current models: {e}")
+        api_server.MODELS.clear()
+        api_server.MODELS.update(models)
+        api_server.REGISTRY.restore(registry)
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    """Check every served model answers before the worker takes requests"""
+    for model_id in api_server.MODELS:
+        try:
+            api_server.REGISTRY.get(model_id).predict(dict(HEALTHCHECK_PATIENT))
+        except Exception as e:
+            worker.log.error(f"Health check failed for model '{model_id}': {e}")
+            sys.exit(WORKER_BOOT_ERROR)
+    worker.log.info(f"Worker {os.getpid()} ready: {format_memory(process_memory())}")
+
+
+class StrokeAPIServer(BaseApplication):
+    """Gunicorn application serving api_server.app with preloaded models"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return api_server.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Production stroke prediction API server')
+    parser.add_argument('--bind', default=SERVER_BIND,
+                        help=f'Address to listen on (default: {SERVER_BIND})')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS,
+                        help=f'Number of worker processes (default: {SERVER_WORKERS})')
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS,
+                        help=f'Threads per worker (default: {SERVER_THREADS})')
+    parser.add_argument('--timeout', type=int, default=SERVER_TIMEOUT,
+                        help=f'Restart workers silent for this many seconds (default: {SERVER_TIMEOUT})')
+    parser.add_argument('--max-models', type=int, default=SERVER_MAX_RESIDENT_MODELS,
+                        help='Models kept loaded per process (default: 0, all of them)')
+    parser.add_argument('--max-memory-mb', type=int, default=SERVER_MAX_RESIDENT_BYTES // 1024**2,
+                        help='Artifact MB kept loaded per process (default: 0, no limit)')
+    parser.add_argument('--micro-batch', action='store_true',
+                        help='Batch concurrent /api/predict calls per model (use with --threads > 1)')
+    parser.add_argument('--batch-rows', type=int, default=MICRO_BATCH_MAX_ROWS,
+                        help=f'Max rows per micro-batch (default: {MICRO_BATCH_MAX_ROWS})')
+    parser.add_argument('--batch-wait-ms', type=float, default=MICRO_BATCH_MAX_WAIT_MS,
+                        help=f'Max added latency per micro-batch (default: {MICRO_BATCH_MAX_WAIT_MS} ms)')
+    args = parser.parse_args()
+
+    print("="*70)
+    print(" STROKE PREDICTION API SERVER - PRODUCTION (PRE-FORK)")
+    print("="*70)
+    # Models beyond a limit would be loaded (and evicted) by each worker on its own
+    api_server.REGISTRY.max_models = args.max_models
+    api_server.REGISTRY.max_bytes = args.max_memory_mb * 1024**2
+    try:
+        load_models()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.micro_batch:
+        # Requests are only batched within a worker: its threads feed the queues
+        if args.threads <= 1:
+            print("⚠️  --micro-batch needs --threads > 1 to see concurrent requests")
+        api_server.enable_micro_batching(args.batch_rows, args.batch_wait_ms)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'graceful_timeout': args.timeout,
+        # Models are already loaded; the app module is imported before forking
+        'preload_app': True,
+        'on_reload': on_reload,
+        'post_worker_init': post_worker_init,
+        'accesslog': '-',
+    }
+    print(f"\nStarting {args.workers} workers x {args.threads} threads on {args.bind}")
+    StrokeAPIServer(options).run()
+
+
+if __name__ == '__main__':
+    main()
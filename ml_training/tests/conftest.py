@@ -0,0 +1,129 @@
+"""
+Shared fixtures: a small DSE fitted on synthetic patients and saved as a
+regular model folder, so the fast inference paths can be checked against
+the reference estimators without the Kaggle dataset
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ML_TRAINING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_TRAINING_DIR)
+# One thread per estimator: no loky worker processes in the fixtures
+os.environ.setdefault('STROKE_N_JOBS', '1')
+
+MODEL_SUFFIX = 'imbalanced_synthetic'
+
+
+def synthetic_patients(n, seed=0):
+    """Raw patient records (with id and stroke columns) like the Kaggle CSV"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'id': np.arange(n),
+        'gender': rng.choice(['Male', 'Female'], n),
+        'age': rng.uniform(1, 90, n).round(1),
+        'hypertension': rng.integers(0, 2, n),
+        'heart_disease': rng.integers(0, 2, n),
+        'ever_married': rng.choice(['Yes', 'No'], n),
+        'work_type': rng.choice(['Private', 'Self-employed', 'Govt_job', 'children', 'Never_worked'], n),
+        'Residence_type': rng.choice(['Urban', 'Rural'], n),
+        'avg_glucose_level': rng.uniform(55, 270, n).round(2),
+        'bmi': rng.normal(28, 6, n).round(1),
+        'smoking_status': rng.choice(['formerly smoked', 'never smoked', 'smokes', 'Unknown'], n),
+    })
+    risk = 0.05 * (df['age'] - 60) + 0.015 * (df['avg_glucose_level'] - 120) + df['heart_disease']
+    df['stroke'] = (risk + rng.normal(0, 1, n) > 0.5).astype(int)
+    return df
+
+
+def patient_records(n, seed=1):
+    """Request bodies for the prediction service"""
+    return synthetic_patients(n, seed).drop(columns=['id', 'stroke']).to_dict('records')
+
+
+def _small_base_models():
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    from imblearn.ensemble import BalancedBaggingClassifier
+    from lightgbm import LGBMClassifier
+    from xgboost import XGBClassifier
+    from catboost import CatBoostClassifier
+
+    return [
+        ('LR-AGD', LogisticRegression(max_iter=200, random_state=0)),
+        ('Neural Network', MLPClassifier(hidden_layer_sizes=(8,), max_iter=300, random_state=0)),
+        ('Random Forest', RandomForestClassifier(n_estimators=15, random_state=0, n_jobs=1)),
+        ('Gradient Boosting', GradientBoostingClassifier(n_estimators=15, random_state=0)),
+        ('CatBoost', CatBoostClassifier(iterations=15, random_state=0, verbose=0,
+                                        thread_count=1, allow_writing_files=False)),
+        ('LightGBM', LGBMClassifier(n_estimators=15, random_state=0, verbose=-1, n_jobs=1)),
+        ('XGBoost', XGBClassifier(n_estimators=15, random_state=0, n_jobs=1)),
+        ('Balanced Bagging', BalancedBaggingClassifier(
+            estimator=RandomForestClassifier(n_estimators=5, random_state=0),
+            n_estimators=3, random_state=0, n_jobs=1
+        )),
+    ]
+
+
+@pytest.fixture(scope='session')
+def trained(tmp_path_factory):
+    """Fitted DSE, its training split and the folder its artifacts were saved to"""
+    import warnings
+    from sklearn.ensemble import RandomForestClassifier
+    from data_preprocessing import preprocess_basic, impute_mean, prepare_train_test_split
+    from model_utils import build_dse_ensemble, save_model_artifacts
+
+    warnings.filterwarnings('ignore')
+    df, encoder, scaler = preprocess_basic(synthetic_patients(500))
+    X_train, X_test, y_train, y_test = prepare_train_test_split(impute_mean(df))
+    meta = RandomForestClassifier(n_estimators=15, random_state=0)
+    dse = build_dse_ensemble(_small_base_models(), meta, X_train, y_train)
+
+    model_dir = str(tmp_path_factory.mktemp('models'))
+    save_model_artifacts(dse, scaler, encoder, X_train, model_dir, MODEL_SUFFIX)
+    return {
+        'dse': dse, 'scaler': scaler, 'encoder': encoder,
+        'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test,
+        'model_dir': model_dir, 'suffix': MODEL_SUFFIX
+    }
+
+
+@pytest.fixture(scope='session')
+def service(trained):
+    from predict_service import StrokePredictionService
+    return StrokePredictionService(trained['model_dir'], trained['suffix'])
+
+
+@pytest.fixture
+def api(trained):
+    """Flask test client serving the synthetic model as 'synthetic'"""
+    import api_server
+
+    api_server.MODELS['synthetic'] = {
+        'name': 'Synthetic', 'description': 'DSE fitted on synthetic patients',
+        'dir': trained['model_dir'], 'suffix': trained['suffix']
+    }
+    api_server.REGISTRY.register('synthetic', trained['model_dir'], trained['suffix'])
+    yield api_server.app.test_client()
+    api_server.MODELS.clear()
+    api_server.REGISTRY.clear()
+    api_server.BATCHER = None
+
+
+@pytest.fixture(scope='session')
+def mmap_model_dir(trained, tmp_path_factory):
+    """The synthetic model saved with every artifact's arrays in .arrays folders"""
+    from artifact_store import save_artifact
+    folder = str(tmp_path_factory.mktemp('mmap_models'))
+    artifacts = {
+        'dse_stroke_prediction': trained['dse'], 'scaler': trained['scaler'],
+        'encoder': trained['encoder'], 'model_columns': list(trained['X_train'].columns)
+    }
+    for prefix, artifact in artifacts.items():
+        save_artifact(artifact, os.path.join(folder, f'{prefix}_{MODEL_SUFFIX}.pkl'), 'mmap',
+                      min_bytes=64)
+    return folder
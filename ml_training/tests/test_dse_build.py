@@ -0,0 +1,44 @@
+"""
+DSE construction: the ensemble assembled from cached out-of-fold
+probabilities must be the nested Voting/Stacking estimator fitted directly
+"""
+import numpy as np
+import pytest
+
+from conftest import _small_base_models
+
+TOLERANCE = 1e-12
+
+
+@pytest.fixture(scope='module')
+def direct_dse(trained):
+    """The DSE as nested sklearn estimators, each fitting its own folds"""
+    from sklearn.ensemble import RandomForestClassifier, StackingClassifier, VotingClassifier
+    base = _small_base_models()
+    meta = RandomForestClassifier(n_estimators=15, random_state=0)
+    dse = StackingClassifier([
+        ('voting', VotingClassifier(base, voting='soft')),
+        ('blending', StackingClassifier(base, final_estimator=meta, cv=5)),
+        ('fusion', StackingClassifier(base, final_estimator=meta, cv=5, passthrough=True)),
+    ], final_estimator=meta, cv=5)
+    return dse.fit(trained['X_train'], trained['y_train'])
+
+
+def test_cached_dse_matches_direct_fit(trained, direct_dse):
+    X = trained['X_test']
+    np.testing.assert_allclose(trained['dse'].predict_proba(X), direct_dse.predict_proba(X),
+                               rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize('level', range(3))
+def test_cached_ensembles_match_direct_fit(trained, direct_dse, level):
+    X = trained['X_test']
+    cached, direct = trained['dse'].estimators_[level], direct_dse.estimators_[level]
+    np.testing.assert_allclose(cached.predict_proba(X), direct.predict_proba(X),
+                               rtol=0, atol=TOLERANCE)
+
+
+def test_meta_features_match_direct_fit(trained, direct_dse):
+    X = trained['X_test']
+    np.testing.assert_allclose(trained['dse'].transform(X), direct_dse.transform(X),
+                               rtol=0, atol=TOLERANCE)
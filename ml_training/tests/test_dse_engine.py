@@ -0,0 +1,88 @@
+"""
+Flattened DSE engine: every evaluation path (plain graph, packed tree
+models, packs reloaded from the engine artifact) must give the fitted
+StackingClassifier's own predict_proba
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import TREE_ENGINE_MAX_ROWS, TREE_ENGINE_TOLERANCE
+
+# Packed tree models are only kept when they agree within this tolerance
+TOLERANCE = TREE_ENGINE_TOLERANCE
+
+
+def _rows(trained, n, seed=0):
+    """n rows spread around the training data"""
+    rng = np.random.default_rng(seed)
+    X = trained['X_train']
+    picked = X.to_numpy()[rng.integers(0, len(X), n)]
+    noise = rng.normal(0, 0.5, picked.shape) * (X.std().to_numpy() > 0)
+    return pd.DataFrame(picked + noise, columns=X.columns)
+
+
+def _assert_matches(graph, dse, X):
+    expected = dse.predict_proba(X)
+    np.testing.assert_allclose(graph.predict_proba(X), expected, rtol=0, atol=TOLERANCE)
+
+
+@pytest.fixture(scope='module')
+def graph(trained):
+    from dse_engine import compile_dse_graph
+    return compile_dse_graph(trained['dse'])
+
+
+def test_graph_deduplicates_base_learners(graph):
+    # The base models are shared by the blending, fusion and DSE stacks
+    assert len(graph.leaves) == 8
+    assert graph.packed is not None
+    assert len(graph.packed_leaves) >= 1
+
+
+# Past TREE_ENGINE_MAX_ROWS the libraries' own batch path replaces the packed trees
+@pytest.mark.parametrize('n_rows', [1, 17, TREE_ENGINE_MAX_ROWS + 1])
+def test_graph_matches_dse(graph, trained, n_rows):
+    _assert_matches(graph, trained['dse'], _rows(trained, n_rows))
+
+
+def test_graph_matches_dse_on_test_split(graph, trained):
+    _assert_matches(graph, trained['dse'], trained['X_test'])
+
+
+def test_graph_without_tree_engine(trained, monkeypatch):
+    import dse_engine
+    monkeypatch.setattr(dse_engine, 'TREE_ENGINE', False)
+    graph = dse_engine.compile_dse_graph(trained['dse'])
+    assert graph.packed is None
+    _assert_matches(graph, trained['dse'], _rows(trained, 32, seed=1))
+
+
+def test_saved_packs_reload_and_go_stale(graph, trained, tmp_path):
+    from dse_engine import compile_dse_graph, save_tree_packs, load_tree_packs
+    suffix = trained['suffix']
+    model_path = os.path.join(trained['model_dir'], f'dse_stroke_prediction_{suffix}.pkl')
+    packs_path = str(tmp_path / f'engine_{suffix}.pkl')
+    save_tree_packs(graph, packs_path, model_path)
+
+    packs = load_tree_packs(packs_path, model_path)
+    assert packs is not None
+    reloaded = compile_dse_graph(trained['dse'], packs)
+    assert reloaded.packs is packs
+    _assert_matches(reloaded, trained['dse'], _rows(trained, 32, seed=2))
+
+    # Packs compiled for another model file are not used
+    other_model = str(tmp_path / 'other.pkl')
+    shutil.copy(model_path, other_model)
+    with open(other_model, 'ab') as f:
+        f.write(b'\0')
+    assert load_tree_packs(packs_path, other_model) is None
+
+
+def test_service_uses_the_engine(service, trained):
+    X = trained['X_test']
+    np.testing.assert_allclose(service._predict_proba(X, 'full'), trained['dse'].predict_proba(X),
+                               rtol=0, atol=TOLERANCE)
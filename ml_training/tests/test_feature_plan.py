@@ -0,0 +1,51 @@
+"""
+Feature plan: the compiled NumPy preprocessing must produce the same
+matrix, bit for bit, as the pandas scaler/encoder path it replaces
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import patient_records
+
+
+def _pandas_path(service, records):
+    from predict_service import REQUIRED_FIELDS, NUMERIC_FIELDS
+    df = pd.DataFrame.from_records(records, columns=REQUIRED_FIELDS)
+    df[NUMERIC_FIELDS] = df[NUMERIC_FIELDS].apply(pd.to_numeric)
+    return service._transform(df).to_numpy(dtype=np.float64)
+
+
+def _assert_bitwise_equal(actual, expected):
+    assert actual.shape == expected.shape
+    assert actual.dtype == expected.dtype == np.float64
+    # Same bits, NaNs included (array_equal would accept -0.0 == 0.0)
+    assert actual.tobytes() == np.ascontiguousarray(expected).tobytes()
+
+
+def test_plan_matches_pandas_path(service):
+    records = patient_records(200, seed=7)
+    records[0]['bmi'] = None
+    records[1]['age'] = '54'
+    records[2]['avg_glucose_level'] = 0
+    _assert_bitwise_equal(service.feature_plan.transform(records), _pandas_path(service, records))
+
+
+@pytest.mark.parametrize('index', range(5))
+def test_single_record_matches_pandas_path(service, index):
+    record = patient_records(5, seed=8)[index]
+    processed = service.preprocess(dict(record))
+    assert list(processed.columns) == list(service.model_columns)
+    _assert_bitwise_equal(processed.to_numpy(), _pandas_path(service, [record]))
+
+
+def test_unknown_category_handling_matches(service):
+    record = dict(patient_records(1, seed=9)[0], work_type='Astronaut')
+    if service.encoder.handle_unknown == 'error':
+        with pytest.raises(ValueError):
+            service.feature_plan.transform([record])
+        with pytest.raises(ValueError):
+            _pandas_path(service, [record])
+    else:
+        _assert_bitwise_equal(service.feature_plan.transform([record]),
+                              _pandas_path(service, [record]))
@@ -0,0 +1,88 @@
+"""
+Micro-batching: batched results match single predictions, and a failing or
+stuck batch never leaves its callers blocked
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import patient_records
+
+
+@pytest.fixture
+def registry(trained):
+    from model_registry import ModelRegistry
+    registry = ModelRegistry()
+    registry.register('synthetic', trained['model_dir'], trained['suffix'])
+    return registry
+
+
+def test_batched_results_match_direct_predict(registry):
+    from micro_batcher import MicroBatcher
+    batcher = MicroBatcher(registry, max_rows=8, max_wait_ms=20)
+    records = patient_records(24)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        batched = list(pool.map(lambda record: batcher.predict('synthetic', dict(record)), records))
+
+    service = registry.get('synthetic')
+    for record, result in zip(records, batched):
+        direct = service.predict(dict(record))
+        assert result['prediction'] == direct['prediction']
+        assert result['probability'] == pytest.approx(direct['probability'], abs=1e-12)
+    assert batcher.stats['requests'] == len(records)
+    assert batcher.stats['max_batch'] > 1
+
+
+def test_batch_error_reaches_every_caller(registry, monkeypatch):
+    from micro_batcher import MicroBatcher
+    batcher = MicroBatcher(registry, max_rows=4, max_wait_ms=20, timeout=30)
+
+    def broken_run(model_id, tier, batch):
+        raise RuntimeError('batch failed')
+
+    monkeypatch.setattr(batcher, '_run', broken_run)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher.predict, 'synthetic', dict(record))
+                   for record in patient_records(4)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match='batch failed'):
+                future.result(timeout=10)
+
+    # The collector survived the error and serves the next batch
+    monkeypatch.undo()
+    assert batcher.predict('synthetic', patient_records(1)[0])['prediction'] in (0, 1)
+    assert batcher.stats['errors'] >= 1
+
+
+def test_stuck_batch_falls_back_to_direct_predict(registry, monkeypatch):
+    from micro_batcher import MicroBatcher
+    batcher = MicroBatcher(registry, max_rows=4, max_wait_ms=1, timeout=0.2)
+    release = threading.Event()
+    monkeypatch.setattr(batcher, '_run', lambda model_id, tier, batch: release.wait(10))
+
+    record = patient_records(1)[0]
+    try:
+        result = batcher.predict('synthetic', dict(record))
+    finally:
+        release.set()
+    assert result == registry.get('synthetic').predict(dict(record))
+    assert batcher.stats['timeouts'] == 1
+
+
+def test_api_predict_with_micro_batching(api):
+    import api_server
+    api_server.enable_micro_batching(max_rows=8, max_wait_ms=20)
+    records = patient_records(8, seed=3)
+
+    def post(record):
+        return api.post('/api/predict', json={**record, 'model_id': 'synthetic'})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(post, records))
+
+    service = api_server.REGISTRY.get('synthetic')
+    for record, response in zip(records, responses):
+        assert response.status_code == 200
+        assert response.get_json()['prediction'] == service.predict(dict(record))['prediction']
+    assert api_server.BATCHER.stats['requests'] == len(records)
@@ -0,0 +1,41 @@
+"""
+Model registry: resident sizes count every artifact a service loads,
+memory-mapped arrays and the tree engine included, so MAX_RESIDENT_BYTES
+evicts what it should
+"""
+import os
+
+from model_registry import ModelRegistry
+
+
+def _folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(folder) for name in names)
+
+
+def test_mmap_folder_bytes_include_arrays(trained, mmap_model_dir):
+    arrays = [name for name in os.listdir(mmap_model_dir) if name.endswith('.arrays')]
+    assert arrays  # the DSE's large arrays live outside its pickle
+    registry = ModelRegistry()
+    registry.register('synthetic', mmap_model_dir, trained['suffix'])
+    registry.get('synthetic')
+    assert registry.resident_bytes() == _folder_bytes(mmap_model_dir)
+
+
+def test_folder_bytes_include_tree_engine(trained):
+    assert os.path.exists(os.path.join(trained['model_dir'], f'engine_{trained["suffix"]}.pkl'))
+    registry = ModelRegistry()
+    registry.register('synthetic', trained['model_dir'], trained['suffix'])
+    registry.get('synthetic')
+    assert registry.resident_bytes() == _folder_bytes(trained['model_dir'])
+
+
+def test_byte_limit_evicts_mmap_models(trained, mmap_model_dir):
+    size = _folder_bytes(mmap_model_dir)
+    registry = ModelRegistry(max_models=0, max_bytes=int(size * 1.5))
+    registry.register('first', mmap_model_dir, trained['suffix'])
+    registry.register('second', mmap_model_dir, trained['suffix'])
+    registry.get('first')
+    registry.get('second')
+    assert list(registry.resident_services()) == ['second']
+    assert registry.stats['evictions'] == 1
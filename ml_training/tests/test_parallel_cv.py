@@ -0,0 +1,40 @@
+"""
+Parallel (model, fold) scheduling: cross-validation scores and out-of-fold
+probabilities with STROKE_N_JOBS=2 must equal the sequential STROKE_N_JOBS=1 run
+"""
+import numpy as np
+import pytest
+
+from conftest import _small_base_models
+from config import N_JOBS_ENV_VAR
+
+
+def _run(monkeypatch, n_jobs, fn, *args):
+    monkeypatch.setenv(N_JOBS_ENV_VAR, str(n_jobs))
+    return fn(*args)
+
+
+def test_kfold_scores_match_sequential(trained, monkeypatch):
+    from model_utils import evaluate_models_kfold
+    args = (_small_base_models(), trained['X_train'], trained['y_train'])
+    sequential = _run(monkeypatch, 1, evaluate_models_kfold, *args)
+    parallel = _run(monkeypatch, 2, evaluate_models_kfold, *args)
+    assert [r['Model'] for r in parallel] == [name for name, _ in _small_base_models()]
+    for expected, result in zip(sequential, parallel):
+        assert result == pytest.approx(expected, rel=0, abs=1e-12), expected['Model']
+
+
+def test_oof_cache_matches_sequential(trained, monkeypatch):
+    from model_utils import compute_oof_cache
+    args = (_small_base_models(), trained['X_train'], trained['y_train'])
+    sequential = _run(monkeypatch, 1, compute_oof_cache, *args)
+    parallel = _run(monkeypatch, 2, compute_oof_cache, *args)
+    X = trained['X_test']
+    for name in sequential['names']:
+        np.testing.assert_allclose(parallel['oof'][name], sequential['oof'][name],
+                                   rtol=0, atol=1e-12, err_msg=name)
+        for inner, expected in zip(parallel['inner'], sequential['inner']):
+            np.testing.assert_allclose(inner[name], expected[name], rtol=0, atol=1e-12, err_msg=name)
+        np.testing.assert_allclose(parallel['full'][name].predict_proba(X),
+                                   sequential['full'][name].predict_proba(X),
+                                   rtol=0, atol=1e-12, err_msg=name)
@@ -0,0 +1,56 @@
+"""
+/api/predict-stream: one NDJSON result per input line, in input order,
+matching /api/predict-batch results and reporting bad lines in place
+"""
+import json
+
+import pytest
+
+from conftest import patient_records
+
+
+def _ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def test_stream_matches_predict_batch(api, service):
+    from config import STREAM_CHUNK_ROWS
+    records = patient_records(STREAM_CHUNK_ROWS + 20, seed=4)
+    response = api.post('/api/predict-stream?model_id=synthetic&threshold=0.3',
+                        data=_ndjson(records), content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Model-Id'] == 'synthetic'
+
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    expected = service.predict_batch(records, 0.3)
+    assert [result.pop('index') for result in results] == list(range(len(records)))
+    for result, reference in zip(results, expected):
+        assert result['prediction'] == reference['prediction']
+        assert result['probability'] == pytest.approx(reference['probability'], abs=1e-12)
+        assert result['threshold'] == 0.3
+
+
+def test_stream_reports_invalid_lines_in_order(api, service):
+    import api_server
+    records = patient_records(6, seed=5)
+    lines = [json.dumps(record) for record in records[:3]] + ['{not json', ''] + \
+            [json.dumps(record) for record in records[3:]]
+    body = '\n'.join(lines) + '\n'
+
+    # Small chunks so the bad line falls between two partly filled chunks
+    results = [json.loads(line) for line in
+               api_server._ndjson_results(service, body.encode().splitlines(), None, chunk_rows=2)]
+    assert [result['index'] for result in results] == list(range(7))
+    assert 'Invalid JSON' in results[3]['error']
+    assert all('prediction' in result for i, result in enumerate(results) if i != 3)
+
+    response = api.post('/api/predict-stream?model_id=synthetic', data=body,
+                        content_type='application/x-ndjson')
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == results
+
+
+def test_stream_rejects_bad_parameters(api):
+    assert api.post('/api/predict-stream?model_id=missing', data='').status_code == 400
+    assert api.post('/api/predict-stream?model_id=synthetic&threshold=2', data='').status_code == 400
+    assert api.post('/api/predict-stream?model_id=synthetic&tier=fast', data='').status_code == 400
@@ -0,0 +1,99 @@
+"""
+Prediction cache: TTL expiry, LRU eviction, per-model invalidation, and
+cached service results identical to freshly computed ones
+"""
+import numpy as np
+import pytest
+
+from conftest import patient_records
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import prediction_cache
+    clock = FakeClock()
+    monkeypatch.setattr(prediction_cache.time, 'monotonic', clock)
+    return clock
+
+
+def _value(x):
+    return np.array([1 - x, x])
+
+
+def test_entries_expire_after_ttl(clock):
+    from prediction_cache import PredictionCache
+    cache = PredictionCache(max_entries=10, ttl=60)
+    cache.put_many([('m', 'a')], [_value(0.2)])
+    clock.now += 59
+    assert cache.get_many([('m', 'a')])[0] is not None
+    clock.now += 1
+    assert cache.get_many([('m', 'a')]) == [None]
+    assert cache.stats['expired'] == 1
+    assert cache.summary()['size'] == 0
+
+
+def test_zero_ttl_never_expires(clock):
+    from prediction_cache import PredictionCache
+    cache = PredictionCache(max_entries=10, ttl=0)
+    cache.put_many([('m', 'a')], [_value(0.2)])
+    clock.now += 10**9
+    assert cache.get_many([('m', 'a')])[0] is not None
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    from prediction_cache import PredictionCache
+    cache = PredictionCache(max_entries=2, ttl=60)
+    cache.put_many([('m', 'a'), ('m', 'b')], [_value(0.1), _value(0.2)])
+    cache.get_many([('m', 'a')])  # 'b' is now the oldest
+    cache.put_many([('m', 'c')], [_value(0.3)])
+    hits = cache.get_many([('m', 'a'), ('m', 'b'), ('m', 'c')])
+    assert [hit is not None for hit in hits] == [True, False, True]
+    assert cache.stats['evictions'] == 1
+
+
+def test_invalidate_drops_only_that_model(clock):
+    from prediction_cache import PredictionCache
+    cache = PredictionCache(max_entries=10, ttl=60)
+    cache.put_many([('m1', 'a'), ('m1', 'b'), ('m2', 'a')], [_value(0.1)] * 3)
+    cache.invalidate('m1')
+    assert [hit is not None for hit in cache.get_many([('m1', 'a'), ('m1', 'b'), ('m2', 'a')])] \
+        == [False, False, True]
+    assert cache.stats['invalidated'] == 2
+
+
+def test_row_keys_normalise_zero_and_nan():
+    from prediction_cache import row_keys
+    nan_payload = np.frombuffer(np.uint64(0x7ff8000000000001).tobytes(), dtype=np.float64)[0]
+    keys = row_keys(np.array([[0.0, np.nan], [-0.0, nan_payload], [0.0, 1.0]]))
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2]
+
+
+def test_service_results_are_the_same_cached(trained):
+    from predict_service import StrokePredictionService
+    from prediction_cache import PredictionCache
+    cache = PredictionCache(max_entries=1000, ttl=60)
+    service = StrokePredictionService(trained['model_dir'], trained['suffix'], cache=cache,
+                                      model_id='synthetic')
+    records = patient_records(20, seed=6)
+    first = service.predict_batch(records)
+    assert (cache.stats['hits'], cache.stats['misses']) == (0, 20)
+
+    # Half the rows cached: only the other half is scored, in input order
+    mixed = records[:10] + patient_records(10, seed=60)
+    second = service.predict_batch(mixed)
+    assert cache.stats['hits'] == 10
+    assert second[:10] == first[:10]
+    uncached = StrokePredictionService(trained['model_dir'], trained['suffix'])
+    assert second == uncached.predict_batch(mixed)
+
+    cache.invalidate('synthetic')
+    assert cache.summary()['size'] == 0
@@ -0,0 +1,52 @@
+"""
+Ensemble pruning: learner subsets are scored by the DSE's own meta-learner
+out of fold, and the pruned DSE stays within tolerance of the full one
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import cross_val_predict
+
+from conftest import _small_base_models
+
+
+def _meta():
+    return RandomForestClassifier(n_estimators=15, random_state=0)
+
+
+@pytest.fixture(scope='module')
+def oof_cache(trained):
+    from model_utils import compute_oof_cache
+    return compute_oof_cache(_small_base_models(), trained['X_train'], trained['y_train'], n_jobs=1)
+
+
+def test_subsets_are_scored_by_the_dse_meta_learner(trained, oof_cache):
+    from model_utils import _ensemble_oof, _stack_features, _subset_scores
+    names = oof_cache['names'][:4]
+    X_train = trained['X_train']
+    dse_features = _stack_features(_ensemble_oof(oof_cache, names, _meta(), X_train))
+    proba = cross_val_predict(_meta(), dse_features, oof_cache['y'], cv=oof_cache['splits'],
+                              method='predict_proba')[:, 1]
+    scores = _subset_scores(oof_cache, names, _meta(), X_train)
+    assert scores['auc'] == pytest.approx(roc_auc_score(oof_cache['y'], proba), abs=1e-12)
+
+
+def test_pruned_dse_stays_within_tolerance(trained, oof_cache):
+    from model_utils import _subset_scores, prune_base_models
+    report = prune_base_models(_small_base_models(), _meta(), trained['X_train'], trained['y_train'],
+                               oof_cache, budget_ms=0, tolerance=0.05)
+    assert report['accepted'] and report['dropped']
+    assert set(report['selected']) | set(report['dropped']) == set(oof_cache['names'])
+    pruned = _subset_scores(oof_cache, report['selected'], _meta(), trained['X_train'])
+    for metric in ('auc', 'f1'):
+        assert pruned[metric] == report['pruned'][metric]
+        assert pruned[metric] >= report['full'][metric] - 0.05
+
+
+def test_nothing_is_dropped_without_tolerance(trained, oof_cache):
+    from model_utils import prune_base_models
+    report = prune_base_models(_small_base_models(), _meta(), trained['X_train'], trained['y_train'],
+                               oof_cache, budget_ms=0, tolerance=-1)
+    assert report['selected'] == oof_cache['names'] and not report['dropped']
+    assert np.isclose(report['pruned']['auc'], report['full']['auc'])
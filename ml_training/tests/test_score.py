@@ -0,0 +1,53 @@
+"""
+Offline scoring: ids keep one type across chunks whatever the first chunk
+looks like, and results match the service's own predictions
+"""
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import synthetic_patients
+
+
+@pytest.fixture
+def score(trained, monkeypatch):
+    import score
+    monkeypatch.setitem(score.VARIANTS, 'synthetic', ('synthetic', 'imbalanced'))
+    monkeypatch.setitem(score.MODEL_DIRS, 'synthetic', trained['model_dir'])
+    return score
+
+
+def _patients(n):
+    return synthetic_patients(n, seed=11).drop(columns=['stroke'])
+
+
+def test_csv_ids_of_mixed_types(score, service, tmp_path):
+    df = _patients(30).astype({'id': object})
+    # Numeric ids in the first chunk, then a code and a missing id
+    df.loc[15, 'id'] = 'P-15'
+    df.loc[25, 'id'] = None
+    df.to_csv(tmp_path / 'patients.csv', index=False)
+
+    rows, errors = score.score_file(str(tmp_path / 'patients.csv'), str(tmp_path / 'scores.parquet'),
+                                    'synthetic', workers=1, chunk_rows=10)
+    assert (rows, errors) == (30, 0)
+    result = pq.read_table(tmp_path / 'scores.parquet')
+    assert str(result.schema.field('id').type) == 'string'
+    ids = result.column('id').to_pylist()
+    assert ids[:3] == ['0', '1', '2'] and ids[15] == 'P-15' and ids[25] is None
+
+    expected = service.predict_batch(df.drop(columns=['id']).to_dict('records'))
+    assert result.column('prediction').to_pylist() == [r['prediction'] for r in expected]
+
+
+def test_parquet_ids_keep_their_type(score, tmp_path):
+    df = _patients(30)
+    df['id'] = df['id'].astype('Int64')
+    df.loc[12, 'id'] = pd.NA  # null only in a later chunk
+    df.to_parquet(tmp_path / 'patients.parquet', index=False)
+
+    score.score_file(str(tmp_path / 'patients.parquet'), str(tmp_path / 'scores.parquet'),
+                     'synthetic', workers=1, chunk_rows=10)
+    result = pq.read_table(tmp_path / 'scores.parquet')
+    assert str(result.schema.field('id').type) == 'int64'
+    assert result.column('id').to_pylist()[11:14] == [11, None, 13]
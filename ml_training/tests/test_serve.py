@@ -0,0 +1,101 @@
+"""
+serve.py: the master preloads every trained variant for the workers to
+share, workers check each served model before taking traffic, and a SIGHUP
+that finds no models keeps the current ones
+"""
+import gc
+import logging
+import os
+import shutil
+
+import pytest
+
+
+class FakeArbiter:
+    log = logging.getLogger('test-serve')
+
+
+class FakeWorker:
+    log = logging.getLogger('test-serve')
+
+
+@pytest.fixture
+def variant_dirs(trained, tmp_path, monkeypatch):
+    """models/<variant> folders of every variant (copies of the synthetic model)"""
+    import api_server
+    from config import VARIANTS, MODEL_DIRS
+    for variant, (imputation, balance) in VARIANTS.items():
+        folder = tmp_path / MODEL_DIRS[variant]
+        folder.mkdir(parents=True)
+        for filename in os.listdir(trained['model_dir']):
+            shutil.copy(os.path.join(trained['model_dir'], filename),
+                        folder / filename.replace(trained['suffix'], f'{balance}_{imputation}'))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api_server.REGISTRY, 'max_models', 0)
+    monkeypatch.setattr(api_server.REGISTRY, 'max_bytes', 0)
+    yield tmp_path
+    api_server.MODELS.clear()
+    api_server.REGISTRY.clear()
+    gc.unfreeze()
+
+
+def test_master_preloads_every_variant(variant_dirs):
+    import api_server
+    import serve
+    from config import VARIANTS
+    serve.load_models()
+    assert sorted(api_server.MODELS) == sorted(VARIANTS)
+    assert sorted(api_server.REGISTRY.resident_services()) == sorted(VARIANTS)
+
+
+def test_unloadable_model_is_not_served(variant_dirs):
+    import api_server
+    import serve
+    from config import VARIANTS
+    with open(variant_dirs / 'models/mean_smote/dse_stroke_prediction_smote_mean.pkl', 'wb') as f:
+        f.write(b'not a pickle')
+    serve.load_models()
+    assert sorted(api_server.MODELS) == sorted(set(VARIANTS) - {'mean_smote'})
+
+
+def test_worker_checks_models_that_are_not_resident(variant_dirs):
+    import api_server
+    import serve
+    api_server.auto_discover_models()
+    assert not api_server.REGISTRY.resident_services()
+    serve.post_worker_init(FakeWorker())
+    assert sorted(api_server.REGISTRY.resident_services()) == sorted(api_server.MODELS)
+
+    api_server.REGISTRY.clear()
+    api_server.MODELS.clear()
+    with open(variant_dirs / 'models/drop_smote/scaler_smote_drop.pkl', 'wb') as f:
+        f.write(b'not a pickle')
+    api_server.auto_discover_models()
+    with pytest.raises(SystemExit) as exit_info:
+        serve.post_worker_init(FakeWorker())
+    assert exit_info.value.code == serve.WORKER_BOOT_ERROR
+
+
+def test_load_models_raises_without_models(api, tmp_path, monkeypatch):
+    import serve
+    monkeypatch.chdir(tmp_path)  # no models/ folder here
+    with pytest.raises(RuntimeError, match='No models found'):
+        serve.load_models()
+
+
+def test_failed_reload_keeps_current_models(api, tmp_path, monkeypatch, caplog):
+    import api_server
+    import serve
+    service = api_server.REGISTRY.get('synthetic')
+    monkeypatch.chdir(tmp_path)
+
+    try:
+        with caplog.at_level(logging.ERROR, logger='test-serve'):
+            serve.on_reload(FakeArbiter())
+    finally:
+        gc.unfreeze()
+    assert 'Model reload failed' in caplog.text
+    assert list(api_server.MODELS) == ['synthetic']
+    assert api_server.REGISTRY.get('synthetic') is service
+    response = api.post('/api/predict', json={**serve.HEALTHCHECK_PATIENT, 'model_id': 'synthetic'})
+    assert response.status_code == 200
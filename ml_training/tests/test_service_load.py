@@ -0,0 +1,74 @@
+"""
+Service loading: artifacts are unpickled concurrently, so a fresh process
+must never deadlock on a library's first import, and only imports the
+libraries its artifacts reference
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ML_TRAINING_DIR
+
+FRESH_PROCESS_RUNS = 12
+
+LOAD_SCRIPT = """
+import sys
+sys.path.insert(0, {ml_dir!r})
+from predict_service import StrokePredictionService
+StrokePredictionService({model_dir!r}, {suffix!r})
+print('loaded')
+"""
+
+
+IMPORTS_SCRIPT = """
+import sys
+sys.path.insert(0, {ml_dir!r})
+from artifact_store import load_artifact
+load_artifact({path!r})
+print(sorted(name for name in ('sklearn', 'lightgbm', 'xgboost', 'catboost', 'imblearn')
+             if name in sys.modules))
+"""
+
+
+# joblib artifacts (no arrays folder) and the hooked unpickler of mmap ones
+@pytest.mark.parametrize('folder', ['model_dir', 'mmap_model_dir'])
+def test_service_loads_in_fresh_processes(trained, mmap_model_dir, folder):
+    model_dir = mmap_model_dir if folder == 'mmap_model_dir' else trained['model_dir']
+    script = LOAD_SCRIPT.format(ml_dir=ML_TRAINING_DIR, model_dir=model_dir,
+                                suffix=trained['suffix'])
+    failures = []
+    for _ in range(FRESH_PROCESS_RUNS):
+        run = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                             timeout=300)
+        if run.returncode != 0 or 'loaded' not in run.stdout:
+            failures.append(run.stderr.strip().splitlines()[-1:] or [f'exit {run.returncode}'])
+    assert not failures, f'{len(failures)}/{FRESH_PROCESS_RUNS} fresh loads failed: {failures}'
+
+
+def test_service_artifacts(service, trained):
+    assert list(service.model_columns) == list(trained['X_train'].columns)
+    assert service.feature_plan is not None
+    assert service.engine is not None
+    assert set(service.load_times) >= {f'dse_stroke_prediction_{trained["suffix"]}.pkl', 'engine'}
+
+
+@pytest.mark.parametrize('folder', ['model_dir', 'mmap_model_dir'])
+def test_only_referenced_libraries_are_imported(trained, mmap_model_dir, folder):
+    model_dir = mmap_model_dir if folder == 'mmap_model_dir' else trained['model_dir']
+    path = os.path.join(model_dir, f'scaler_{trained["suffix"]}.pkl')
+    run = subprocess.run([sys.executable, '-c', IMPORTS_SCRIPT.format(ml_dir=ML_TRAINING_DIR, path=path)],
+                         capture_output=True, text=True, timeout=300)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.strip() == "['sklearn']"
+
+
+def test_api_import_skips_the_training_modules(trained):
+    script = (f'import sys; sys.path.insert(0, {ML_TRAINING_DIR!r}); import api_server; '
+              f'from predict_service import StrokePredictionService; '
+              f'StrokePredictionService({trained["model_dir"]!r}, {trained["suffix"]!r}); '
+              f'print(sorted(m for m in ("dataset_store", "model_utils", "pipeline") if m in sys.modules))')
+    run = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=300)
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.strip().splitlines()[-1] == '[]'
@@ -0,0 +1,102 @@
+"""
+Inference tiers: 'fast' and 'cascade' need a student distilled from the
+DSE being served, and a missing one is reported under the requested tier
+"""
+import pytest
+
+from conftest import patient_records
+
+
+@pytest.mark.parametrize('tier', ['fast', 'cascade'])
+def test_untrained_tier_is_named_in_the_error(service, tier):
+    assert list(service.tiers) == ['full']
+    with pytest.raises(ValueError, match=f"Tier '{tier}' is not available"):
+        service.predict(patient_records(1)[0], tier=tier)
+    with pytest.raises(ValueError, match=f"Tier '{tier}' is not available"):
+        service.predict_batch(patient_records(3), tier=tier)
+
+
+@pytest.mark.parametrize('tier', ['fast', 'cascade'])
+def test_api_rejects_untrained_tier(api, tier):
+    response = api.post('/api/predict', json={**patient_records(1)[0], 'model_id': 'synthetic',
+                                              'tier': tier})
+    assert response.status_code == 400
+    assert f"Tier '{tier}'" in response.get_json()['error']
+
+
+@pytest.fixture(scope='module')
+def student(trained):
+    from distillation import train_student
+    return train_student(trained['dse'], trained['X_train'])
+
+
+@pytest.fixture
+def distilled_dir(trained, student, tmp_path):
+    """Model folder with a manifest and a student distilled from its DSE"""
+    from artifact_store import save_artifact
+    from distillation import student_path, record_student
+    from manifest import write_manifest
+    from model_utils import save_model_artifacts
+
+    folder, suffix = str(tmp_path), trained['suffix']
+    paths = save_model_artifacts(trained['dse'], trained['scaler'], trained['encoder'],
+                                 trained['X_train'], folder, suffix)
+    write_manifest(folder, 'synthetic', {'test': 'tiers'}, paths, {})
+    save_artifact(student, student_path(folder, suffix))
+    record_student(folder, suffix, {'agreement': 1.0})
+    return folder
+
+
+def _retrain(trained, folder, remove=True):
+    """Save the DSE again the way pipeline.train_variant does"""
+    from distillation import remove_student
+    from manifest import write_manifest
+    from model_utils import save_model_artifacts
+
+    paths = save_model_artifacts(trained['dse'], trained['scaler'], trained['encoder'],
+                                 trained['X_train'], folder, trained['suffix'])
+    if remove:
+        remove_student(folder, trained['suffix'])
+    write_manifest(folder, 'synthetic', {'test': 'retrained'}, paths, {})
+
+
+def test_current_student_enables_every_tier(trained, distilled_dir):
+    from model_registry import ModelRegistry
+    from predict_service import StrokePredictionService, TIERS
+    service = StrokePredictionService(distilled_dir, trained['suffix'])
+    assert tuple(service.tiers) == TIERS
+    assert service.predict(patient_records(1)[0], tier='cascade')['tier'] == 'cascade'
+    registry = ModelRegistry()
+    registry.register('synthetic', distilled_dir, trained['suffix'])
+    assert registry.tiers('synthetic') == list(TIERS)
+
+
+def test_retraining_removes_the_student(trained, distilled_dir):
+    import os
+    from artifact_store import arrays_dir
+    from distillation import student_path
+    from predict_service import StrokePredictionService
+    _retrain(trained, distilled_dir)
+    path = student_path(distilled_dir, trained['suffix'])
+    assert not os.path.exists(path) and not os.path.exists(arrays_dir(path))
+    assert list(StrokePredictionService(distilled_dir, trained['suffix']).tiers) == ['full']
+
+
+def test_student_of_a_previous_dse_is_not_served(trained, distilled_dir):
+    from model_registry import ModelRegistry
+    from predict_service import StrokePredictionService
+    # A student file left behind by anything but the pipeline
+    _retrain(trained, distilled_dir, remove=False)
+    assert list(StrokePredictionService(distilled_dir, trained['suffix']).tiers) == ['full']
+    registry = ModelRegistry()
+    registry.register('synthetic', distilled_dir, trained['suffix'])
+    assert registry.tiers('synthetic') == ['full']
+
+
+def test_converted_folder_keeps_its_student(trained, distilled_dir):
+    from artifact_store import convert_model_dir
+    from distillation import student_is_current
+    convert_model_dir(distilled_dir, 'joblib')
+    assert student_is_current(distilled_dir, trained['suffix'])
+    convert_model_dir(distilled_dir, 'mmap')
+    assert student_is_current(distilled_dir, trained['suffix'])
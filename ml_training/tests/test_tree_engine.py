@@ -0,0 +1,75 @@
+"""
+Packed tree evaluator: every supported tree model of the synthetic DSE must
+compile and reproduce its library's predict_proba within
+TREE_ENGINE_TOLERANCE, on ordinary rows, rows on split thresholds and NaNs
+"""
+import numpy as np
+import pytest
+
+from config import TREE_ENGINE_TOLERANCE
+
+TREE_MODELS = ['Random Forest', 'Gradient Boosting', 'CatBoost', 'LightGBM', 'XGBoost',
+               'Balanced Bagging']
+
+
+@pytest.fixture(scope='module')
+def tree_models(trained):
+    # The DSE's base models are the ones its blending stack was fitted with
+    base = dict(trained['dse'].estimators_[0].named_estimators_)
+    return [base[name] for name in TREE_MODELS]
+
+
+@pytest.fixture(scope='module')
+def packed(tree_models, trained):
+    from tree_engine import compile_tree_models
+    return compile_tree_models(tree_models, trained['X_train'].shape[1])
+
+
+def _assert_matches(packed, models, X):
+    from tree_engine import _original_proba
+    for model, proba in zip(models, packed.predict_proba(X)):
+        np.testing.assert_allclose(proba, _original_proba(model, X), rtol=0,
+                                   atol=TREE_ENGINE_TOLERANCE, err_msg=type(model).__name__)
+
+
+def test_every_tree_model_compiles(packed, tree_models):
+    trees, indices = packed
+    assert indices == list(range(len(tree_models)))
+    assert trees.n_models == len(tree_models)
+
+
+def test_packed_matches_libraries(packed, tree_models, trained):
+    rng = np.random.default_rng(0)
+    X = trained['X_test'].to_numpy()
+    X = np.vstack([X, X + rng.normal(0, 0.3, X.shape)])
+    _assert_matches(packed[0], tree_models, X)
+
+
+def test_packed_matches_on_split_thresholds(packed, tree_models, trained):
+    trees = packed[0]
+    n_features = trees.n_features
+    split = np.isfinite(trees.threshold)
+    # (column, threshold) of every split; float32 models read the columns past n_features
+    columns = trees.feature[split] % n_features
+    thresholds = trees.threshold[split]
+    rng = np.random.default_rng(1)
+    X = trained['X_test'].to_numpy()[:64].copy()
+    for row in X:
+        picks = rng.integers(0, len(thresholds), 4)
+        for pick, direction in zip(picks, [-np.inf, 0, np.inf, 0]):
+            value = thresholds[pick]
+            row[columns[pick]] = value if direction == 0 else np.nextafter(value, direction)
+    _assert_matches(trees, tree_models, X)
+
+
+def test_packed_matches_with_missing_values(tree_models, trained):
+    from tree_engine import compile_tree_models
+    # Only the boosting libraries accept NaN features at predict time
+    models = [model for name, model in zip(TREE_MODELS, tree_models)
+              if name in ('CatBoost', 'LightGBM', 'XGBoost')]
+    trees, indices = compile_tree_models(models, trained['X_train'].shape[1])
+    assert indices == list(range(len(models)))
+    X = trained['X_test'].to_numpy()[:64].copy()
+    rng = np.random.default_rng(3)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    _assert_matches(trees, models, X)
@@ -0,0 +1,419 @@
+"""
+Packed tree evaluator for the forests and boosters of a DSE
+Every supported tree model (sklearn RandomForest / GradientBoosting,
+imblearn BalancedBagging over forests, LightGBM, XGBoost, CatBoost) is
+compiled into one set of contiguous node arrays (feature, threshold,
+children, leaf value); a batch of rows is routed through all their trees
+at once with NumPy. Each compiled model is checked against its original
+predict_proba and left to its own library when it doesn't match
+"""
+import json
+import os
+import tempfile
+import numpy as np
+from config import TREE_ENGINE_TOLERANCE, TREE_ENGINE_BLOCK_ROWS
+
+
+# Rows of the synthetic matrix used to check compiled models
+PROBE_ROWS = 512
+
+
+class _Tree:
+    """One tree in local node indexing (left == -1 marks a leaf)"""
+
+    def __init__(self, feature, threshold, left, right, nan_left, value):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.right = np.asarray(right, dtype=np.intp)
+        self.nan_left = np.asarray(nan_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+
+    def depth(self):
+        depth = np.zeros(len(self.left), dtype=np.intp)
+        for node in range(len(self.left)):  # children come after their parent
+            if self.left[node] >= 0:
+                depth[self.left[node]] = depth[self.right[node]] = depth[node] + 1
+        return int(depth.max())
+
+
+def _sibling_order(tree):
+    """Breadth-first node order in which every right child follows its left sibling"""
+    order = [0]
+    for node in order:
+        if tree.left[node] >= 0:
+            order += [tree.left[node], tree.right[node]]
+    return np.array(order, dtype=np.intp)
+
+
+class _CompiledModel:
+    """
+    Trees of one model and how their leaf sum becomes P(class 1):
+    p1 = link(sum of leaf values / divisor + bias); float32 models compare
+    float32 inputs
+    """
+
+    def __init__(self, trees, bias=0.0, link='identity', float32=True, divisor=1.0):
+        self.trees = trees
+        self.bias = float(bias)
+        self.link = link
+        self.float32 = float32
+        self.divisor = float(divisor)
+
+
+# --- Extraction ---------------------------------------------------------------
+
+def _sklearn_tree(tree, weight=1.0, classifier=True, features=None):
+    """sklearn Tree: go left when float32(x) <= threshold"""
+    if classifier:
+        proba = tree.value[:, 0, :]
+        value = proba[:, 1] / proba.sum(axis=1)
+    else:
+        value = tree.value[:, 0, 0]
+    feature = tree.feature.copy()
+    if features is not None:
+        internal = feature >= 0
+        feature[internal] = np.asarray(features)[feature[internal]]
+    nan_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+    return _Tree(np.maximum(feature, 0), tree.threshold, tree.children_left,
+                 tree.children_right, nan_left, value * weight)
+
+
+def _forest_trees(forest, weight=1.0, features=None):
+    return [_sklearn_tree(est.tree_, weight, features=features) for est in forest.estimators_]
+
+
+def _compile_random_forest(model):
+    # Summed, then divided once as sklearn does: tied votes stay exactly 0.5
+    return _CompiledModel(_forest_trees(model), divisor=len(model.estimators_))
+
+
+def _compile_balanced_bagging(model):
+    from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+    # imblearn wraps each member in a sampler + classifier pipeline
+    forests = [
+        estimator.steps[-1][1] if hasattr(estimator, 'steps') else estimator
+        for estimator in model.estimators_
+    ]
+    if any(type(forest) not in (RandomForestClassifier, ExtraTreesClassifier)
+           or len(forest.classes_) != len(model.classes_) for forest in forests):
+        return None
+    sizes = {len(forest.estimators_) for forest in forests}
+    trees = []
+    for forest, features in zip(forests, model.estimators_features_):
+        # Mean of the members' forest means
+        weight = 1.0 if len(sizes) == 1 else 1.0 / len(forest.estimators_)
+        trees += _forest_trees(forest, weight, features)
+    divisor = len(forests) * (sizes.pop() if len(sizes) == 1 else 1)
+    return _CompiledModel(trees, divisor=divisor)
+
+
+def _compile_gradient_boosting(model):
+    from sklearn.dummy import DummyClassifier
+    if model.estimators_.shape[1] != 1 or not (model.init_ == 'zero' or isinstance(model.init_, DummyClassifier)):
+        return None
+    # The prior-based initial raw prediction is the same for every row
+    bias = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0, 0]
+    trees = [
+        _sklearn_tree(est.tree_, model.learning_rate, classifier=False)
+        for est in model.estimators_[:, 0]
+    ]
+    return _CompiledModel(trees, bias, 'sigmoid')
+
+
+def _compile_lightgbm(model):
+    booster = model.booster_
+    iteration = model.best_iteration_ or None
+    dump = booster.dump_model(num_iteration=iteration)
+    if dump['num_tree_per_iteration'] != 1 or dump.get('average_output'):
+        return None
+    if not str(dump['objective']).startswith('binary'):
+        return None
+
+    trees = []
+    for info in dump['tree_info']:
+        feature, threshold, left, right, nan_left, value = [], [], [], [], [], []
+
+        def add(node):
+            idx = len(left)
+            for array in (feature, threshold, left, right, nan_left, value):
+                array.append(0)
+            if 'leaf_value' in node:
+                left[idx] = right[idx] = -1
+                value[idx] = node['leaf_value']
+                return idx
+            if node['decision_type'] != '<=' or node['missing_type'] == 'Zero':
+                raise ValueError('unsupported split')
+            feature[idx] = node['split_feature']
+            threshold[idx] = node['threshold']
+            if node['missing_type'] == 'NaN':
+                nan_left[idx] = node['default_left']
+            else:
+                nan_left[idx] = 0.0 <= node['threshold']  # NaN is read as 0
+            left[idx] = add(node['left_child'])
+            right[idx] = add(node['right_child'])
+            return idx
+
+        try:
+            add(info['tree_structure'])
+        except ValueError:
+            return None
+        # Leaf values already include the learning rate (shrinkage)
+        trees.append(_Tree(feature, threshold, left, right, nan_left, value))
+    return _CompiledModel(trees, link='sigmoid', float32=False)
+
+
+def _compile_xgboost(model):
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw('json'))['learner']
+    if learner['objective']['name'] != 'binary:logistic':
+        return None
+    gbm = learner['gradient_booster']
+    if gbm.get('name') != 'gbtree':
+        return None
+    trees_json = gbm['model']['trees']
+    try:
+        # predict_proba stops at the best round when early stopping was used
+        best = model.best_iteration
+    except AttributeError:
+        best = None
+    if best is not None:
+        per_round = int(gbm['model']['gbtree_model_param'].get('num_parallel_tree', 1))
+        trees_json = trees_json[:(best + 1) * per_round]
+
+    trees = []
+    for tree in trees_json:
+        if any(tree['split_type']) or tree['categories']:
+            return None
+        left = np.asarray(tree['left_children'])
+        right = np.asarray(tree['right_children'])
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        leaf = left < 0
+        # XGBoost goes left when x < condition: the float32 just below it makes that x <= t
+        threshold = np.nextafter(conditions, np.float32(-np.inf)).astype(np.float64)
+        threshold[leaf] = 0.0
+        value = np.where(leaf, conditions.astype(np.float64), 0.0)
+        trees.append(_Tree(tree['split_indices'], threshold, left, right,
+                           tree['default_left'], value))
+
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    bias = np.log(base_score / (1 - base_score))
+    return _CompiledModel(trees, bias, 'sigmoid')
+
+
+def _compile_catboost(model):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.json')
+        model.save_model(path, format='json')
+        with open(path) as f:
+            dump = json.load(f)
+    features_info = dump['features_info']
+    if set(features_info) != {'float_features'} or 'oblivious_trees' not in dump:
+        return None
+    float_features = features_info['float_features']
+    scale, biases = dump['scale_and_bias']
+    if len(biases) != 1:
+        return None
+
+    trees = []
+    for oblivious in dump['oblivious_trees']:
+        splits = oblivious['splits']
+        if any(split['split_type'] != 'FloatFeature' for split in splits):
+            return None
+        # Oblivious tree -> binary tree: level k tests split k, the leaf
+        # index has bit k set when the value is above the border
+        feature, threshold, left, right, nan_left, value = [], [], [], [], [], []
+
+        def add(level, leaf_index):
+            idx = len(left)
+            for array in (feature, threshold, left, right, nan_left, value):
+                array.append(0)
+            if level == len(splits):
+                left[idx] = right[idx] = -1
+                value[idx] = scale * oblivious['leaf_values'][leaf_index]
+                return idx
+            info = float_features[splits[level]['float_feature_index']]
+            feature[idx] = info['flat_feature_index']
+            threshold[idx] = splits[level]['border']
+            # NaN reads as -inf ('AsIs' / 'Min') unless treated as the maximum
+            nan_left[idx] = info.get('nan_value_treatment') != 'Max'
+            left[idx] = add(level + 1, leaf_index)
+            right[idx] = add(level + 1, leaf_index | (1 << level))
+            return idx
+
+        add(0, 0)
+        trees.append(_Tree(feature, threshold, left, right, nan_left, value))
+    return _CompiledModel(trees, biases[0], 'sigmoid')
+
+
+def _compiler(model):
+    """Compile function for a fitted estimator type (None if unsupported)"""
+    name = f'{type(model).__module__.split(".")[0]}.{type(model).__name__}'
+    return {
+        'sklearn.RandomForestClassifier': _compile_random_forest,
+        'sklearn.ExtraTreesClassifier': _compile_random_forest,
+        'sklearn.GradientBoostingClassifier': _compile_gradient_boosting,
+        'imblearn.BalancedBaggingClassifier': _compile_balanced_bagging,
+        'lightgbm.LGBMClassifier': _compile_lightgbm,
+        'xgboost.XGBClassifier': _compile_xgboost,
+        'catboost.CatBoostClassifier': _compile_catboost
+    }.get(name)
+
+
+# --- Packed evaluation --------------------------------------------------------
+
+class PackedTrees:
+    """All trees of several models in contiguous arrays, evaluated together"""
+
+    def __init__(self, compiled, n_features):
+        self.n_features = n_features
+        self.n_models = len(compiled)
+        trees, owners = [], []
+        for m, model in enumerate(compiled):
+            trees += model.trees
+            owners += [m] * len(model.trees)
+        # Deepest trees first: after k steps only the first active[k] still move
+        depths = np.array([tree.depth() for tree in trees], dtype=np.intp)
+        order = np.argsort(-depths, kind='stable')
+        self.max_depth = int(depths.max()) if len(depths) else 0
+        self.active = [int((depths > step).sum()) for step in range(self.max_depth)]
+
+        feature, threshold, left, nan_left, value, roots = [], [], [], [], [], []
+        self.membership = np.zeros((len(trees), self.n_models))
+        offset = 0
+        for position, t in enumerate(order):
+            tree, model = trees[t], compiled[owners[t]]
+            old = _sibling_order(tree)
+            new = np.empty_like(old)
+            new[old] = np.arange(len(old))
+            leaf = tree.left[old] < 0
+            # Right child = left child + 1; leaves loop onto themselves
+            # (threshold +inf, NaN goes left) so finished rows stay put
+            nodes = np.arange(len(old)) + offset
+            left.append(np.where(leaf, nodes, new[tree.left[old]] + offset))
+            feature.append(np.where(leaf, 0, tree.feature[old] + (n_features if model.float32 else 0)))
+            threshold.append(np.where(leaf, np.inf, tree.threshold[old]))
+            nan_left.append(tree.nan_left[old] | leaf)
+            value.append(np.where(leaf, tree.value[old], 0.0))
+            roots.append(offset)
+            self.membership[position, owners[t]] = 1.0
+            offset += len(old)
+
+        self.feature = np.concatenate(feature)
+        self.threshold = np.concatenate(threshold)
+        self.left = np.concatenate(left)
+        self.nan_left = np.concatenate(nan_left)
+        self.value = np.concatenate(value)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.divisor = np.array([model.divisor for model in compiled])
+        self.bias = np.array([model.bias for model in compiled])
+        self.sigmoid = np.array([model.link == 'sigmoid' for model in compiled])
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def decision(self, X):
+        """(n_rows, n_models) leaf sums plus bias, before each model's link"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'Expected {self.n_features} features, got {X.shape}')
+        # float64 columns, then the same values rounded through float32
+        X_all = np.hstack([X, X.astype(np.float32).astype(np.float64)])
+        out = np.empty((len(X), self.n_models))
+        for start in range(0, len(X), TREE_ENGINE_BLOCK_ROWS):
+            block = X_all[start:start + TREE_ENGINE_BLOCK_ROWS]
+            n = len(block)
+            # Column-major values: feature f of row r is at f * n + r
+            values = np.ascontiguousarray(block.T).ravel()
+            rows = np.arange(n)
+            offsets = self.feature * n
+            has_nan = np.isnan(block).any()
+            # (n_trees, n) current node of every row in every tree
+            idx = np.repeat(self.roots[:, None], n, axis=1)
+            for active in self.active:
+                moving = idx[:active]
+                x = values[offsets[moving] + rows]
+                go_right = ~(x <= self.threshold[moving])
+                if has_nan:
+                    go_right &= ~(np.isnan(x) & self.nan_left[moving])
+                idx[:active] = self.left[moving] + go_right
+            out[start:start + n] = self.value[idx].T @ self.membership
+        return out / self.divisor + self.bias
+
+    def predict_proba(self, X):
+        """List with one (n_rows, 2) probability array per model"""
+        raw = self.decision(X)
+        p1 = np.where(self.sigmoid, 1.0 / (1.0 + np.exp(-raw)), raw)
+        return [np.column_stack([1.0 - p1[:, m], p1[:, m]]) for m in range(self.n_models)]
+
+
+def _probe(compiled, n_features, rows=PROBE_ROWS, seed=0):
+    """Rows whose values sit on, just below and just above the models' split thresholds"""
+    rng = np.random.default_rng(seed)
+    candidates = [[0.0, 1.0] for _ in range(n_features)]
+    for model in compiled:
+        for tree in model.trees:
+            internal = tree.left >= 0
+            for f, t in zip(tree.feature[internal], tree.threshold[internal]):
+                candidates[f].append(t)
+    X = np.empty((rows, n_features))
+    for f, values in enumerate(candidates):
+        values = np.unique(values)
+        if len(values) > 64:
+            values = rng.choice(values, 64, replace=False)
+        values = np.concatenate([
+            values, np.nextafter(values, -np.inf), np.nextafter(values, np.inf),
+            values - 1e-4 * (np.abs(values) + 1), values + 1e-4 * (np.abs(values) + 1)
+        ])
+        X[:, f] = rng.choice(values, rows)
+    return X
+
+
+def _original_proba(model, X):
+    names = getattr(model, 'feature_names_in_', None)
+    if names is not None:
+        import pandas as pd
+        X = pd.DataFrame(X, columns=names)
+    return model.predict_proba(X)
+
+
+def compile_tree_models(models, n_features, tolerance=TREE_ENGINE_TOLERANCE, verbose=True):
+    """
+    Pack every supported tree model of a list into one PackedTrees
+    A compiled model is kept only when its probabilities on a probe matrix
+    match the original predict_proba within tolerance
+    Returns: (PackedTrees or None, indices of the packed models)
+    """
+    compiled, indices = [], []
+    for i, model in enumerate(models):
+        compile_model = _compiler(model)
+        if compile_model is None or len(getattr(model, 'classes_', ())) != 2:
+            continue
+        try:
+            result = compile_model(model)
+        except Exception as e:
+            result = None
+            if verbose:
+                print(f"⚠️  Could not compile {type(model).__name__}: {e}")
+        if result is not None:
+            compiled.append(result)
+            indices.append(i)
+    if not compiled:
+        return None, []
+
+    packed = PackedTrees(compiled, n_features)
+    X = _probe(compiled, n_features)
+    keep = []
+    for position, (i, proba) in enumerate(zip(indices, packed.predict_proba(X))):
+        error = np.abs(proba - _original_proba(models[i], X)).max()
+        if error <= tolerance:
+            keep.append(position)
+        elif verbose:
+            print(f"⚠️  Compiled {type(models[i]).__name__} differs by {error:.2e}; using the original")
+    if not keep:
+        return None, []
+    if len(keep) < len(compiled):
+        compiled = [compiled[p] for p in keep]
+        packed = PackedTrees(compiled, n_features)
+    return packed, [indices[p] for p in keep]
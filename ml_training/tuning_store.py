@@ -0,0 +1,142 @@
+"""
+Persistent hyperparameter search store
+Tuning trials (params, fold scores, fit time) are saved to a local SQLite
+database so reruns skip finished trials, resume after a crash and warm-start
+from the best parameters found in earlier studies
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+from config import TUNING_DB_PATH
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    study TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    params TEXT NOT NULL,
+    resource INTEGER NOT NULL,
+    score REAL,
+    fold_scores TEXT NOT NULL,
+    rounds INTEGER,
+    fit_time REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (study, params, resource)
+)
+"""
+
+
+def _to_builtin(value):
+    """JSON-safe version of numpy scalars found in parameter grids"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def canonical_params(params):
+    """Stable JSON encoding of a parameter dict (used as the trial key)"""
+    return json.dumps({k: _to_builtin(v) for k, v in params.items()}, sort_keys=True)
+
+
+def dataset_fingerprint(X, y):
+    """Content hash of a training matrix and its labels"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, X.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def estimator_fingerprint(model):
+    """Hash of an estimator's constructor params, ignoring thread settings"""
+    params = {
+        name: repr(value) for name, value in model.get_params().items()
+        if name.split('__')[-1] not in ('n_jobs', 'thread_count')
+    }
+    blob = json.dumps([type(model).__name__, params], sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class TuningStore:
+    """SQLite-backed store of tuning trials"""
+
+    def __init__(self, path=TUNING_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Several training workers may share the database (main.py --jobs)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    @staticmethod
+    def study_key(variant, model_name, dataset, mode, model):
+        """Study identifier: variant, model, dataset fingerprint, mode and base estimator"""
+        blob = json.dumps([variant, model_name, dataset, mode, estimator_fingerprint(model)])
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def lookup(self, study, params, resource=0):
+        """Return a finished trial as a dict, or None"""
+        row = self.conn.execute(
+            'SELECT score, fold_scores, rounds, fit_time FROM trials '
+            'WHERE study = ? AND params = ? AND resource = ?',
+            (study, canonical_params(params), resource)
+        ).fetchone()
+        if row is None:
+            return None
+        score, fold_scores, rounds, fit_time = row
+        return {
+            'score': np.nan if score is None else score,
+            'fold_scores': json.loads(fold_scores),
+            'rounds': rounds,
+            'fit_time': fit_time
+        }
+
+    def record(self, study, variant, model_name, dataset, mode, params, resource,
+               fold_scores, rounds, fit_time):
+        """Save one finished trial (committed immediately so a crash loses nothing)"""
+        score = float(np.mean(fold_scores))
+        self.conn.execute(
+            'INSERT OR REPLACE INTO trials (study, variant, model_name, dataset, mode, '
+            'params, resource, score, fold_scores, rounds, fit_time, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (study, variant, model_name, dataset, mode, canonical_params(params),
+             resource, None if np.isnan(score) else score,
+             json.dumps([None if np.isnan(s) else float(s) for s in fold_scores]),
+             rounds, float(fit_time), time.strftime('%Y-%m-%dT%H:%M:%S'))
+        )
+        self.conn.commit()
+
+    def best_known_params(self, variant, model_name, exclude_study=None, limit=3):
+        """
+        Best parameters from earlier studies of the same variant and model
+        (each study's highest-resource trials), used to warm-start new searches
+        """
+        rows = self.conn.execute(
+            'SELECT params, score FROM trials t WHERE variant = ? AND model_name = ? '
+            'AND study != ? AND score IS NOT NULL AND resource = '
+            '(SELECT MAX(resource) FROM trials WHERE study = t.study) '
+            'ORDER BY score DESC, created_at DESC',
+            (variant, model_name, exclude_study or '')
+        ).fetchall()
+        best, seen = [], set()
+        for params, _ in rows:
+            if params not in seen:
+                seen.add(params)
+                best.append(json.loads(params))
+            if len(best) == limit:
+                break
+        return best
+
+    def close(self):
+        self.conn.close()